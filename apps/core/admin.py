@@ -8,6 +8,7 @@ from django.contrib.auth.models import Group as DjangoGroup
 from django.contrib.contenttypes.admin import GenericTabularInline
 from django.utils.html import format_html
 
+from apps.core.pagination import EstimatedCountMixin
 from apps.store.admin import ProductAdmin, ProductImageInline
 from apps.store.models import Product
 from apps.tags.models import TaggedItem
@@ -34,7 +35,7 @@ admin.site.unregister(DjangoGroup)
 
 # Register your models here.
 @admin.register(User)
-class UserAdmin(BaseUserAdmin):
+class UserAdmin(EstimatedCountMixin, BaseUserAdmin):
     list_display = ["username", "email", "first_name", "last_name", "is_staff", "is_superuser"]
     list_filter = ["is_staff", "is_superuser", "is_active"]
     search_fields = ["username", "email"]
@@ -59,7 +60,7 @@ class UserAdmin(BaseUserAdmin):
 
 
 @admin.register(Group)
-class GroupAdmin(BaseGroupAdmin):
+class GroupAdmin(EstimatedCountMixin, BaseGroupAdmin):
     list_display = ["name"]
     search_fields = ["name"]
 
@@ -0,0 +1,202 @@
+import asyncio
+import logging
+import threading
+from hashlib import md5
+from time import monotonic, time
+from urllib.parse import urlencode
+
+import httpx
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+
+class ServiceUnavailable(Exception):
+    """A third-party service failed, or its circuit is open."""
+
+
+class CircuitBreaker:
+    """
+    Opens after `failures` consecutive failures, so calls fail fast instead
+    of waiting on a service that is down. After `reset_after` seconds one
+    trial call is let through: success closes the circuit, failure opens it
+    for another `reset_after`. State is kept per worker process.
+    """
+
+    def __init__(self, failures, reset_after):
+        self.failures = failures
+        self.reset_after = reset_after
+        self.lock = threading.Lock()
+        self.failed = 0
+        self.opened_at = None
+        self.trial = False
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if self.trial or monotonic() - self.opened_at >= self.reset_after:
+            return "half-open"
+        return "open"
+
+    def allow(self):
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if self.trial or monotonic() - self.opened_at < self.reset_after:
+                return False
+            self.trial = True
+            return True
+
+    def record_success(self):
+        with self.lock:
+            self.failed = 0
+            self.opened_at = None
+            self.trial = False
+
+    def end_trial(self):
+        # A trial call that was cancelled or failed some other way says
+        # nothing about the service, so the next call gets to try instead.
+        with self.lock:
+            self.trial = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failed += 1
+            if self.trial or self.failed >= self.failures:
+                self.opened_at = monotonic()
+            self.trial = False
+
+
+class ServiceClient:
+    """
+    Async client of one third-party service. Requests share a pooled
+    httpx.AsyncClient, are bounded by HTTP_CLIENT_TIMEOUT and go through a
+    CircuitBreaker. Transport errors and 5xx responses raise
+    ServiceUnavailable; other responses are returned as they are, except by
+    get_json, which raises it for 4xx responses too.
+    """
+
+    def __init__(self, name, base_url):
+        self.name = name
+        self.base_url = base_url
+        self.timeout = httpx.Timeout(settings.HTTP_CLIENT_TIMEOUT)
+        self.limits = httpx.Limits(
+            max_connections=settings.HTTP_CLIENT_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.HTTP_CLIENT_MAX_CONNECTIONS,
+        )
+        self.breaker = CircuitBreaker(
+            settings.HTTP_CIRCUIT_FAILURES, settings.HTTP_CIRCUIT_RESET_AFTER
+        )
+        # A connection pool belongs to the event loop that opened it. Under
+        # ASGI that is the worker's one loop; under WSGI every async view
+        # runs in a new loop, so the pool is only reused within a request.
+        self.loop = None
+        self.client = None
+        # Cache key -> running revalidation task, one per key
+        self.revalidating = {}
+
+    def pool(self):
+        loop = asyncio.get_running_loop()
+        if self.loop is not loop:
+            if self.client is not None:
+                self.close(self.client, self.loop)
+            self.loop = loop
+            self.client = httpx.AsyncClient(
+                base_url=self.base_url, timeout=self.timeout, limits=self.limits
+            )
+        return self.client
+
+    @staticmethod
+    def close(client, loop):
+        # Connections can only be closed on the loop that opened them. A
+        # WSGI request's loop is closed by now, and its sockets are closed
+        # when the dropped client is collected.
+        if not loop.is_closed():
+            asyncio.run_coroutine_threadsafe(client.aclose(), loop)
+
+    async def request(self, method, path, **kwargs):
+        if not self.breaker.allow():
+            raise ServiceUnavailable(f"{self.name}: circuit open")
+        try:
+            response = await self.pool().request(method, path, **kwargs)
+            if response.is_server_error:
+                self.breaker.record_failure()
+                raise ServiceUnavailable(f"{self.name}: HTTP {response.status_code}")
+            self.breaker.record_success()
+            return response
+        except httpx.TransportError as error:
+            self.breaker.record_failure()
+            raise ServiceUnavailable(f"{self.name}: {error!r}") from error
+        finally:
+            self.breaker.end_trial()
+
+    def cache_key(self, path, params):
+        raw = path + "?" + urlencode(sorted((params or {}).items()))
+        return f"http:{self.name}:{md5(raw.encode()).hexdigest()}"
+
+    async def get_json(self, path, fresh_for, stale_for, params=None):
+        """
+        GET path as JSON, stale-while-revalidate: a response younger than
+        fresh_for seconds is served from the cache; one up to stale_for
+        seconds older is served too, while a background task refetches it.
+        A stale response is also served when the refetch fails.
+        """
+        key = self.cache_key(path, params)
+        entry = await cache.aget(key)
+        if entry is None:
+            return await self.fetch_json(key, path, fresh_for, stale_for, params)
+        if time() - entry["fetched_at"] >= fresh_for:
+            self.revalidate(key, path, fresh_for, stale_for, params)
+        return entry["data"]
+
+    async def fetch_json(self, key, path, fresh_for, stale_for, params):
+        response = await self.request("GET", path, params=params)
+        # A 4xx says nothing about the service's health, so the breaker
+        # ignores it, but callers still only have ServiceUnavailable to handle.
+        if response.is_error:
+            raise ServiceUnavailable(f"{self.name}: HTTP {response.status_code}")
+        try:
+            data = response.json()
+        except ValueError as error:
+            raise ServiceUnavailable(f"{self.name}: invalid JSON") from error
+        await cache.aset(
+            key, {"data": data, "fetched_at": time()}, fresh_for + stale_for
+        )
+        return data
+
+    def revalidate(self, key, path, fresh_for, stale_for, params):
+        # The task outlives the request only under ASGI; a WSGI worker's
+        # per-request loop cancels it, and the next request tries again.
+        if key in self.revalidating:
+            return
+        refetch = self.refetch(key, path, fresh_for, stale_for, params)
+        task = asyncio.create_task(refetch)
+        self.revalidating[key] = task
+        task.add_done_callback(lambda task: self.revalidating.pop(key, None))
+
+    async def refetch(self, key, path, fresh_for, stale_for, params):
+        # One refetch across workers; the lock expires with the timeout.
+        lock = f"{key}:revalidating"
+        if not await cache.aadd(lock, 1, settings.HTTP_CLIENT_TIMEOUT + 1):
+            return
+        try:
+            await self.fetch_json(key, path, fresh_for, stale_for, params)
+        except ServiceUnavailable as error:
+            logger.warning("Serving stale %s response: %s", self.name, error)
+        finally:
+            await cache.adelete(lock)
+
+
+services = {}
+
+
+def get_service(name):
+    """The ServiceClient of a HTTP_SERVICES entry, shared by the process."""
+    service = services.get(name)
+    if service is None:
+        service = services.setdefault(
+            name, ServiceClient(name, settings.HTTP_SERVICES[name])
+        )
+    return service
@@ -0,0 +1,161 @@
+import threading
+from bisect import bisect_left
+from contextvars import ContextVar
+from time import perf_counter
+
+from django_redis.cache import RedisCache
+
+# Upper bounds of the histogram buckets, +Inf is implied
+SECONDS_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Registry:
+    """
+    Histograms and counters kept in process memory and rendered in the
+    Prometheus text format. Every worker process has its own registry, so
+    scrape each worker or aggregate by instance.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {}
+        self.counters = {}
+        self.help = {}
+
+    def describe(self, name, help):
+        self.help[name] = help
+
+    def observe(self, name, labels, value, buckets):
+        key = (name, labels)
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def increment(self, name, labels, amount=1):
+        key = (name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def clear(self):
+        with self.lock:
+            self.histograms.clear()
+            self.counters.clear()
+
+    def render(self):
+        with self.lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted(
+                (
+                    key,
+                    histogram.buckets,
+                    list(histogram.counts),
+                    histogram.sum,
+                    histogram.count,
+                )
+                for key, histogram in self.histograms.items()
+            )
+        lines = []
+        described = set()
+
+        def describe(name, type):
+            if name not in described:
+                described.add(name)
+                lines.append(f"# HELP {name} {self.help.get(name, name)}")
+                lines.append(f"# TYPE {name} {type}")
+
+        for (name, labels), value in counters:
+            describe(name, "counter")
+            lines.append(f"{name}{{{format_labels(labels)}}} {value}")
+        for (name, labels), buckets, counts, total, count in histograms:
+            describe(name, "histogram")
+            cumulative = 0
+            for bound, bucket_count in zip([*buckets, "+Inf"], counts):
+                cumulative += bucket_count
+                bucket_labels = format_labels((*labels, ("le", str(bound))))
+                lines.append(f"{name}_bucket{{{bucket_labels}}} {cumulative}")
+            lines.append(f"{name}_sum{{{format_labels(labels)}}} {total}")
+            lines.append(f"{name}_count{{{format_labels(labels)}}} {count}")
+        return "\n".join(lines) + "\n"
+
+
+def format_labels(labels):
+    return ",".join(
+        '{}="{}"'.format(name, str(value).replace("\\", "\\\\").replace('"', '\\"'))
+        for name, value in labels
+    )
+
+
+registry = Registry()
+registry.describe("http_requests_total", "Requests by view, method and status.")
+registry.describe("http_request_duration_seconds", "Request latency by view.")
+registry.describe("db_queries_per_request", "SQL queries per sampled request.")
+registry.describe("db_seconds_per_request", "SQL time per sampled request.")
+registry.describe("render_seconds_per_request", "Response rendering time.")
+registry.describe("cache_hits_total", "Cache keys found, by view.")
+registry.describe("cache_misses_total", "Cache keys not found, by view.")
+
+
+class RequestMetrics:
+    """What a sampled request spent on SQL, the cache and rendering."""
+
+    __slots__ = ("queries", "db_seconds", "cache_hits", "cache_misses", "render")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.render = None
+
+    def __call__(self, execute, sql, params, many, context):
+        # A connection.execute_wrapper around every query of the request
+        start = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db_seconds += perf_counter() - start
+
+
+current_request = ContextVar("current_request_metrics", default=None)
+
+MISSING = object()
+
+
+class InstrumentedRedisCache(RedisCache):
+    """django_redis cache that counts hits and misses of sampled requests."""
+
+    def get(self, key, default=None, version=None, client=None):
+        value = super().get(key, MISSING, version=version, client=client)
+        metrics = current_request.get()
+        if metrics is not None:
+            if value is MISSING:
+                metrics.cache_misses += 1
+            else:
+                metrics.cache_hits += 1
+        return default if value is MISSING else value
+
+    def get_many(self, keys, version=None, client=None):
+        keys = list(keys)
+        values = super().get_many(keys, version=version, client=client)
+        metrics = current_request.get()
+        if metrics is not None:
+            metrics.cache_hits += len(values)
+            metrics.cache_misses += len(keys) - len(values)
+        return values
@@ -0,0 +1,100 @@
+from contextlib import ExitStack
+from random import random
+from time import perf_counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+
+from apps.core.metrics import (
+    COUNT_BUCKETS,
+    SECONDS_BUCKETS,
+    RequestMetrics,
+    current_request,
+    registry,
+)
+
+
+class MetricsMiddleware:
+    """
+    Records request counts and latency per resolved view for every request.
+    A METRICS_SAMPLE_RATE share of requests also gets its SQL queries, SQL
+    time, cache hits and misses and rendering time recorded, since wrapping
+    every query costs more than timing the request.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        # Sync-only, it would make Django run the whole chain below it, async
+        # views included, in a thread under ASGI.
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        start = perf_counter()
+        metrics = None
+        with ExitStack() as stack:
+            if random() < settings.METRICS_SAMPLE_RATE:
+                metrics = RequestMetrics()
+                token = current_request.set(metrics)
+                stack.callback(current_request.reset, token)
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(metrics))
+            response = self.get_response(request)
+        self.record(request, response, perf_counter() - start, metrics)
+        return response
+
+    async def __acall__(self, request):
+        # Queries run on the connections of sync_to_async threads, which
+        # execute wrappers installed on this thread don't reach, so only
+        # latency is recorded.
+        start = perf_counter()
+        response = await self.get_response(request)
+        self.record(request, response, perf_counter() - start, None)
+        return response
+
+    def process_template_response(self, request, response):
+        # DRF renders Responses after the view returns, time that part too.
+        metrics = current_request.get()
+        if metrics is not None:
+            start = perf_counter()
+
+            def rendered(response):
+                metrics.render = perf_counter() - start
+
+            response.add_post_render_callback(rendered)
+        return response
+
+    def record(self, request, response, seconds, metrics):
+        match = getattr(request, "resolver_match", None)
+        # URL names keep the label set small, unlike raw paths.
+        view = (match.view_name or match._func_path) if match else "unresolved"
+        labels = (("view", view),)
+        registry.increment(
+            "http_requests_total",
+            (*labels, ("method", request.method), ("status", response.status_code)),
+        )
+        registry.observe(
+            "http_request_duration_seconds", labels, seconds, SECONDS_BUCKETS
+        )
+        if metrics is None:
+            return
+        registry.observe(
+            "db_queries_per_request", labels, metrics.queries, COUNT_BUCKETS
+        )
+        registry.observe(
+            "db_seconds_per_request", labels, metrics.db_seconds, SECONDS_BUCKETS
+        )
+        if metrics.render is not None:
+            registry.observe(
+                "render_seconds_per_request", labels, metrics.render, SECONDS_BUCKETS
+            )
+        if metrics.cache_hits:
+            registry.increment("cache_hits_total", labels, metrics.cache_hits)
+        if metrics.cache_misses:
+            registry.increment("cache_misses_total", labels, metrics.cache_misses)
@@ -5,4 +5,6 @@ from apps.store.signals import order_created
 
 @receiver(order_created)
 def on_order_created(sender, **kwargs):
+    # Delivered from the outbox after checkout commits, possibly more than
+    # once; kwargs["idempotency_key"] identifies the event.
     print(kwargs["order"])
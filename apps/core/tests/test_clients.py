@@ -0,0 +1,199 @@
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from time import sleep, time
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+
+from apps.core import clients
+from apps.core.clients import ServiceUnavailable, get_service
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        server.hits.append(self.path)
+        sleep(server.delay)
+        body = server.body or json.dumps(server.payload).encode()
+        self.send_response(server.status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def stub(settings):
+    """
+    A local server standing in for httpbin; set status, payload, delay, or
+    body to send raw bytes instead of the payload.
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.hits = []
+    server.status = 200
+    server.payload = {"origin": "stub"}
+    server.body = None
+    server.delay = 0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    settings.HTTP_SERVICES = {"httpbin": f"http://127.0.0.1:{server.server_port}"}
+    settings.HTTP_CLIENT_TIMEOUT = 1
+    settings.HTTP_CIRCUIT_FAILURES = 2
+    settings.HTTP_CIRCUIT_RESET_AFTER = 30
+    clients.services.clear()
+    cache.clear()
+    yield server
+    server.shutdown()
+    server.server_close()
+    clients.services.clear()
+
+
+def get_json(path="/data", fresh_for=60, stale_for=60):
+    async def fetch():
+        service = get_service("httpbin")
+        data = await service.get_json(path, fresh_for=fresh_for, stale_for=stale_for)
+        # Let background revalidations finish before the loop closes
+        await asyncio.gather(*service.revalidating.values())
+        return data
+
+    return async_to_sync(fetch)()
+
+
+def cache_entry(path, data, age):
+    service = get_service("httpbin")
+    cache.set(service.cache_key(path, None), {"data": data, "fetched_at": time() - age})
+
+
+class TestServiceClient:
+    def test_if_response_is_fresh_it_is_served_from_cache(self, stub):
+        assert get_json() == {"origin": "stub"}
+        assert get_json() == {"origin": "stub"}
+
+        assert len(stub.hits) == 1
+
+    def test_if_response_is_stale_it_is_served_and_revalidated(self, stub):
+        cache_entry("/data", {"origin": "old"}, age=90)
+
+        assert get_json() == {"origin": "old"}
+        assert get_json() == {"origin": "stub"}
+        assert len(stub.hits) == 1
+
+    def test_if_revalidation_fails_stale_response_is_kept(self, stub):
+        stub.status = 500
+        cache_entry("/data", {"origin": "old"}, age=90)
+
+        assert get_json() == {"origin": "old"}
+        assert get_json() == {"origin": "old"}
+
+    def test_if_service_fails_without_cache_it_is_unavailable(self, stub):
+        stub.status = 502
+
+        with pytest.raises(ServiceUnavailable):
+            get_json()
+
+    def test_if_service_rejects_request_it_is_unavailable(self, stub):
+        stub.status = 404
+
+        with pytest.raises(ServiceUnavailable, match="HTTP 404"):
+            get_json()
+        assert get_service("httpbin").breaker.state == "closed"
+
+    def test_if_response_is_not_json_it_is_unavailable(self, stub):
+        stub.body = b"<html>"
+
+        with pytest.raises(ServiceUnavailable, match="invalid JSON"):
+            get_json()
+
+    def test_if_service_is_too_slow_it_is_unavailable(self, stub, settings):
+        settings.HTTP_CLIENT_TIMEOUT = 0.1
+        clients.services.clear()
+        stub.delay = 0.5
+
+        with pytest.raises(ServiceUnavailable):
+            get_json()
+
+    def test_if_service_keeps_failing_circuit_opens(self, stub):
+        stub.status = 500
+        for _ in range(2):
+            with pytest.raises(ServiceUnavailable):
+                get_json()
+
+        with pytest.raises(ServiceUnavailable, match="circuit open"):
+            get_json()
+        assert len(stub.hits) == 2
+        assert get_service("httpbin").breaker.state == "open"
+
+    def test_if_trial_call_succeeds_circuit_closes(self, stub):
+        stub.status = 500
+        breaker = get_service("httpbin").breaker
+        for _ in range(2):
+            with pytest.raises(ServiceUnavailable):
+                get_json()
+        breaker.reset_after = 0
+        stub.status = 200
+
+        assert get_json() == {"origin": "stub"}
+        assert breaker.state == "closed"
+
+    def test_if_loop_changes_old_pool_is_closed(self, stub):
+        service = get_service("httpbin")
+        loop = asyncio.new_event_loop()
+        thread = threading.Thread(target=loop.run_forever, daemon=True)
+        thread.start()
+
+        async def pool():
+            return service.pool()
+
+        old = asyncio.run_coroutine_threadsafe(pool(), loop).result()
+        new = async_to_sync(pool)()
+        # Let the old loop run the close it was handed
+        asyncio.run_coroutine_threadsafe(asyncio.sleep(0), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+
+        assert new is not old
+        assert old.is_closed
+
+    def test_if_trial_call_is_cancelled_next_call_is_tried(self, stub):
+        stub.status = 500
+        breaker = get_service("httpbin").breaker
+        for _ in range(2):
+            with pytest.raises(ServiceUnavailable):
+                get_json()
+        breaker.reset_after = 0
+        stub.status = 200
+        stub.delay = 0.5
+
+        async def cancelled_trial():
+            service = get_service("httpbin")
+            with pytest.raises(asyncio.TimeoutError):
+                await asyncio.wait_for(service.get_json("/data", 60, 60), 0.1)
+
+        async_to_sync(cancelled_trial)()
+        stub.delay = 0
+
+        assert get_json() == {"origin": "stub"}
+        assert breaker.state == "closed"
+
+
+class TestSayHello:
+    def test_if_httpbin_answers_its_payload_is_rendered(self, client, stub):
+        response = client.get("/api/v1/hello/")
+
+        assert response.status_code == 200
+        assert b"stub" in response.content
+        assert stub.hits == ["/delay/3"]
+
+    def test_if_httpbin_is_down_returns_503(self, client, stub):
+        stub.status = 500
+
+        response = client.get("/api/v1/hello/")
+
+        assert response.status_code == 503
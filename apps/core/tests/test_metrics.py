@@ -0,0 +1,80 @@
+import pytest
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.core.cache import cache
+from django.http import HttpResponse
+from model_bakery import baker
+
+from apps.core.metrics import registry
+from apps.core.middleware import MetricsMiddleware
+from apps.store.models import Product
+
+
+@pytest.fixture(autouse=True)
+def clear_metrics(settings):
+    settings.METRICS_SAMPLE_RATE = 1
+    settings.METRICS_TOKEN = "secret"
+    cache.clear()
+    registry.clear()
+
+
+def scrape(api_client):
+    return api_client.get(
+        "/api/v1/metrics/", HTTP_AUTHORIZATION="Bearer secret"
+    ).content.decode()
+
+
+@pytest.mark.django_db
+class TestMetrics:
+    def test_if_view_is_requested_its_queries_and_latency_are_exported(
+        self, api_client
+    ):
+        product = baker.make(Product, unit_price=10)
+        api_client.get(f"/api/v1/store/products/{product.id}/")
+
+        metrics = scrape(api_client)
+
+        view = 'view="store:product-detail"'
+        assert f'http_requests_total{{{view},method="GET",status="200"}} 1' in metrics
+        assert f"http_request_duration_seconds_count{{{view}}} 1" in metrics
+        assert f'db_queries_per_request_bucket{{{view},le="0"}} 0' in metrics
+        assert f"cache_misses_total{{{view}}}" in metrics
+
+    def test_if_request_is_not_sampled_only_latency_is_exported(
+        self, api_client, settings
+    ):
+        settings.METRICS_SAMPLE_RATE = 0
+        api_client.get("/api/v1/store/collections/")
+
+        metrics = scrape(api_client)
+
+        view = 'view="store:collection-list"'
+        assert f"http_request_duration_seconds_count{{{view}}} 1" in metrics
+        assert "db_queries_per_request" not in metrics
+
+    def test_if_chain_is_async_only_latency_is_exported(self, api_client, rf):
+        async def get_response(request):
+            return HttpResponse()
+
+        middleware = MetricsMiddleware(get_response)
+        async_to_sync(middleware)(rf.get("/"))
+
+        metrics = scrape(api_client)
+
+        assert iscoroutinefunction(middleware)
+        view = 'view="unresolved"'
+        assert f"http_request_duration_seconds_count{{{view}}} 1" in metrics
+        assert "db_queries_per_request" not in metrics
+
+    def test_if_token_is_set_scrape_requires_it(self, api_client):
+        denied = api_client.get("/api/v1/metrics/")
+        allowed = api_client.get("/api/v1/metrics/", HTTP_AUTHORIZATION="Bearer secret")
+
+        assert denied.status_code == 401
+        assert allowed.status_code == 200
+
+    def test_if_token_is_not_set_metrics_are_not_served(self, api_client, settings):
+        settings.METRICS_TOKEN = ""
+
+        response = api_client.get("/api/v1/metrics/")
+
+        assert response.status_code == 404
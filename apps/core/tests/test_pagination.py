@@ -0,0 +1,107 @@
+from contextlib import contextmanager
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from model_bakery import baker
+
+from apps.core import pagination
+from apps.core.pagination import EstimatedCountPaginator
+from apps.store.models import Collection, Order
+
+User = get_user_model()
+
+
+class StubConnection:
+    """A database connection whose every query returns `row`."""
+
+    def __init__(self, row, vendor):
+        self.row = row
+        self.vendor = vendor
+        self.executed = []
+
+    @contextmanager
+    def cursor(self):
+        yield self
+
+    def execute(self, sql, params):
+        self.executed.append(sql)
+
+    def fetchone(self):
+        return self.row
+
+
+@pytest.fixture
+def database(monkeypatch):
+    def answer(row, vendor="postgresql"):
+        stub = StubConnection(row, vendor)
+        monkeypatch.setattr(pagination, "connections", {"default": stub})
+        return stub
+
+    return answer
+
+
+class TestEstimate:
+    def test_if_queryset_is_unfiltered_reltuples_is_used(self, database):
+        stub = database((5_000,))
+
+        paginator = EstimatedCountPaginator(Collection.objects.all(), 10)
+
+        assert paginator.estimate() == 5_000
+        assert "pg_class" in stub.executed[0]
+
+    def test_if_table_was_never_analyzed_there_is_no_estimate(self, database):
+        database((-1,))
+
+        paginator = EstimatedCountPaginator(Collection.objects.all(), 10)
+
+        assert paginator.estimate() is None
+
+    def test_if_queryset_is_filtered_plan_rows_are_used(self, database):
+        stub = database(([{"Plan": {"Node Type": "Seq Scan", "Plan Rows": 42}}],))
+
+        paginator = EstimatedCountPaginator(Collection.objects.filter(title="a"), 10)
+
+        assert paginator.estimate() == 42
+        assert stub.executed[0].startswith("EXPLAIN (FORMAT JSON)")
+
+    def test_if_database_is_not_postgres_there_is_no_estimate(self, database):
+        stub = database((5_000,), vendor="sqlite")
+
+        paginator = EstimatedCountPaginator(Collection.objects.all(), 10)
+
+        assert paginator.estimate() is None
+        assert stub.executed == []
+
+
+@pytest.mark.django_db
+class TestEstimatedCountPaginator:
+    def test_if_estimate_is_below_threshold_rows_are_counted(self, settings):
+        settings.ADMIN_ESTIMATED_COUNT_THRESHOLD = 1_000
+        baker.make(Collection, _quantity=3)
+
+        paginator = EstimatedCountPaginator(Collection.objects.all(), 10)
+        paginator.estimate = lambda: 999
+
+        assert paginator.count == 3
+
+    def test_if_estimate_reaches_threshold_it_is_used(self, settings):
+        settings.ADMIN_ESTIMATED_COUNT_THRESHOLD = 1_000
+        baker.make(Collection, _quantity=3)
+
+        paginator = EstimatedCountPaginator(Collection.objects.all(), 10)
+        paginator.estimate = lambda: 5_000
+
+        with CaptureQueriesContext(connection) as queries:
+            assert paginator.count == 5_000
+        assert len(queries) == 0
+
+    def test_if_changelist_is_filtered_no_full_count_is_run(self, admin_client):
+        baker.make(Order, customer=baker.make(User).customer, payment_status="C")
+
+        with CaptureQueriesContext(connection) as queries:
+            admin_client.get("/admin/store/order/?payment_status__exact=C")
+
+        counts = [query for query in queries if "COUNT(" in query["sql"].upper()]
+        assert len(counts) == 1
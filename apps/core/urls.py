@@ -6,4 +6,5 @@ app_name = "core"
 
 urlpatterns = [
     path("health/", views.health_check, name="health_check"),
+    path("metrics/", views.metrics, name="metrics"),
 ]
@@ -1,5 +1,9 @@
+from django.conf import settings
 from django.shortcuts import render
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse
+from django.utils.crypto import constant_time_compare
+
+from apps.core.metrics import registry
 
 
 # Create your views here.
@@ -9,4 +13,19 @@ def home(request):
 
 def health_check(request):
     """Health check endpoint for Render and load balancers."""
-    return JsonResponse({"status": "healthy", "service": "snapbuy-api"})
\ No newline at end of file
+    return JsonResponse({"status": "healthy", "service": "snapbuy-api"})
+
+
+def metrics(request):
+    """Request metrics of this worker in the Prometheus text format."""
+    # Without a token there is nothing to check a scraper against, so the
+    # endpoint stays off rather than public
+    if not settings.METRICS_TOKEN:
+        return HttpResponse(status=404)
+    if not constant_time_compare(
+        request.headers.get("Authorization", ""), f"Bearer {settings.METRICS_TOKEN}"
+    ):
+        return HttpResponse(status=401)
+    return HttpResponse(
+        registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
@@ -1,6 +1,5 @@
 import logging
 
-import requests
 from django.conf import settings
 from django.core.cache import cache
 from django.core.mail import (BadHeaderError, EmailMessage, mail_admins,
@@ -8,26 +7,29 @@ from django.core.mail import (BadHeaderError, EmailMessage, mail_admins,
 from django.http import HttpResponse
 from django.shortcuts import render
 from django.utils.decorators import method_decorator
+from django.views import View
 from django.views.decorators.cache import cache_page
-from rest_framework.views import APIView
 from templated_mail.mail import BaseEmailMessage
 
+from apps.core.clients import ServiceUnavailable, get_service
+
 from .tasks import notify_customers
 
 logger = logging.getLogger(__name__)
 
 
 # If we have class based views
-class SayHelloView(APIView):
-    # @method_decorator(cache_page(5 * 60))
-    def get(self, request):
+class SayHelloView(View):
+    # Async, so waiting on httpbin doesn't hold a worker; the response is
+    # cached for a minute and served stale for five more while it refreshes
+    async def get(self, request):
         try:
-            logger.info("logging starts")
-            response = requests.get("https://httpbin.org/delay/3")
-            logger.info("logging ends")
-            data = response.json()
-        except requests.ConnectionError:
-            logger.critical(" the httpbin is offline")
+            data = await get_service("httpbin").get_json(
+                "/delay/3", fresh_for=60, stale_for=5 * 60
+            )
+        except ServiceUnavailable:
+            logger.critical("the httpbin is offline")
+            return render(request, "hello.html", {"name": None}, status=503)
         return render(request, "hello.html", {"name": data})
 
 
@@ -3,28 +3,141 @@ from unfold.admin import ModelAdmin
 from import_export.admin import ImportExportModelAdmin
 from unfold.contrib.import_export.forms import ExportForm, ImportForm, SelectableFieldsExportForm
 
-from django.db.models import Count
-from django.urls import reverse
+from django.db import router, transaction
+from django.db.models import Count, Value
+from django.db.models.functions import Concat
+from django.http import Http404
+from django.template.response import TemplateResponse
+from django.urls import path, reverse
 from django.utils.html import format_html, urlencode
 
-from apps.store import models
-from apps.store.models import (Address, Cart, CartItem, Collection, Customer, Order,
-                          OrderItem, Product, ProductImage, Promotion)
+from apps.core.pagination import EstimatedCountMixin
+from apps.store import jobs, models, pricing
+from apps.store.cache import invalidate_products
+from apps.store.models import (
+    Address,
+    Cart,
+    CartItem,
+    Collection,
+    Customer,
+    Order,
+    OrderItem,
+    OutboxEvent,
+    Product,
+    ProductImage,
+    Promotion,
+    TaxRate,
+)
+
+
+class BackgroundActionMixin:
+    """
+    Lets actions hand the selected rows to a jobs.JOBS function that runs
+    in Celery batches, and adds a page that follows the job's progress.
+    """
+
+    def start_job(self, request, name, queryset, description):
+        job_id = jobs.start(name, queryset, description)
+        opts = self.model._meta
+        url = reverse(f"admin:{opts.app_label}_{opts.model_name}_job", args=[job_id])
+        self.message_user(
+            request,
+            format_html(
+                '{} started in the background. <a href="{}">Follow its progress</a>.',
+                description,
+                url,
+            ),
+        )
+
+    def get_urls(self):
+        opts = self.model._meta
+        return [
+            path(
+                "jobs/<str:job_id>/",
+                self.admin_site.admin_view(self.job_view),
+                name=f"{opts.app_label}_{opts.model_name}_job",
+            ),
+            *super().get_urls(),
+        ]
+
+    def job_view(self, request, job_id):
+        progress = jobs.progress(job_id)
+        if progress is None:
+            raise Http404("Unknown or expired job")
+        context = {
+            **self.admin_site.each_context(request),
+            "title": progress["description"],
+            "opts": self.model._meta,
+            "job": progress,
+        }
+        return TemplateResponse(request, "admin/store/job_progress.html", context)
+
+
+class BulkListEditableMixin:
+    """
+    Saves the rows edited on the changelist with one bulk_update instead of
+    a save() per row. bulk_saved() then does what save() and its signals
+    would have done for them.
+    """
+
+    def changelist_view(self, request, extra_context=None):
+        request.bulk_edits = {}
+        with transaction.atomic(using=router.db_for_write(self.model)):
+            response = super().changelist_view(request, extra_context)
+            if request.bulk_edits:
+                objs = list(request.bulk_edits)
+                fields = set().union(*request.bulk_edits.values())
+                # bulk_update() skips the pre_save() that stamps auto_now
+                # fields, such as Product.last_update.
+                for field in self.model._meta.concrete_fields:
+                    if getattr(field, "auto_now", False):
+                        for obj in objs:
+                            field.pre_save(obj, add=False)
+                        fields.add(field.name)
+                self.model._default_manager.bulk_update(objs, fields)
+                self.bulk_saved(request, objs, fields)
+        return response
+
+    def save_model(self, request, obj, form, change):
+        bulk_edits = getattr(request, "bulk_edits", None)
+        if bulk_edits is None:
+            return super().save_model(request, obj, form, change)
+        bulk_edits[obj] = form.changed_data
+
+    def bulk_saved(self, request, objs, fields):
+        pass
 
 
 # Register your models here.
 @admin.register(Promotion)
-class PromotionAdmin(ModelAdmin, ImportExportModelAdmin):
+class PromotionAdmin(
+    BulkListEditableMixin, EstimatedCountMixin, ModelAdmin, ImportExportModelAdmin
+):
     import_form_class = ImportForm
     export_form_class = ExportForm
     search_fields = ["description"]
-    list_display = ["description", "discount"]
+    list_display = ["description", "discount", "starts_at", "ends_at"]
     list_editable = ["discount"]
+    list_filter = ["starts_at", "ends_at"]
+    autocomplete_fields = ["products", "collections"]
+    list_per_page = 10
+
+    def bulk_saved(self, request, promotions, fields):
+        # bulk_update() skips the post_save that reprices the products
+        pricing.schedule_refresh(
+            pricing.promotion_product_ids([promotion.pk for promotion in promotions])
+        )
+
+
+@admin.register(TaxRate)
+class TaxRateAdmin(EstimatedCountMixin, ModelAdmin):
+    list_display = ["region", "rate"]
+    list_editable = ["rate"]
     list_per_page = 10
 
 
 @admin.register(Collection)
-class CollectionAdmin(ModelAdmin, ImportExportModelAdmin):
+class CollectionAdmin(EstimatedCountMixin, ModelAdmin, ImportExportModelAdmin):
     import_form_class = ImportForm
     export_form_class = ExportForm
     list_display = ["title", "featured_product", "product_count"]
@@ -32,18 +145,14 @@ class CollectionAdmin(ModelAdmin, ImportExportModelAdmin):
     search_fields = ["title"]
     autocomplete_fields = ["featured_product"]
 
-    @admin.display(description="Product Count")
+    @admin.display(description="Product Count", ordering="products_count")
     def product_count(self, collection):
         url = (
             reverse("admin:store_product_changelist")
             + "?"
             + urlencode({"collection__id": f"{collection.id}"})
         )
-        return format_html('<a href="{}">{}</a>', url, collection.product_count)
-
-    # Modify the base queryset to include the product count:
-    def get_queryset(self, request):
-        return super().get_queryset(request).annotate(product_count=Count("product"))
+        return format_html('<a href="{}">{}</a>', url, collection.products_count)
 
 
 class ProductImageInline(admin.TabularInline):
@@ -59,16 +168,24 @@ class ProductImageInline(admin.TabularInline):
 
 
 @admin.register(Product)
-class ProductAdmin(ModelAdmin, ImportExportModelAdmin):
+class ProductAdmin(
+    BackgroundActionMixin,
+    BulkListEditableMixin,
+    EstimatedCountMixin,
+    ModelAdmin,
+    ImportExportModelAdmin,
+):
     import_form_class = ImportForm
     export_form_class = ExportForm
     autocomplete_fields = ["collection"]
     actions = ["clear_inventory"]
     inlines = [ProductImageInline]
-    list_select_related = ["collection"]
+    # Follows collection to the featured product shown in the list
+    list_select_related = ["collection__featured_product"]
     list_display = [
         "title",
         "unit_price",
+        "price_with_tax",
         "inventory_status",
         "collection_featured_product",
     ]
@@ -77,6 +194,7 @@ class ProductAdmin(ModelAdmin, ImportExportModelAdmin):
     search_fields = ["title", "description"]
     prepopulated_fields = {"slug": ["title"]}
 
+    @admin.display(ordering="collection__featured_product__title")
     def collection_featured_product(self, product):
         return product.collection.featured_product
 
@@ -88,9 +206,17 @@ class ProductAdmin(ModelAdmin, ImportExportModelAdmin):
 
     @admin.action(description="Clear inventory")
     def clear_inventory(self, request, queryset):
-        updated_count = queryset.update(inventory=0)
-        self.message_user(
-            request, f"{updated_count} products were successfully updated."
+        self.start_job(request, "clear_inventory", queryset, "Clear inventory")
+
+    def bulk_saved(self, request, products, fields):
+        # bulk_update() skips Product.save() and post_save
+        ids = [product.pk for product in products]
+        if "unit_price" in fields:
+            Product.objects.filter(pk__in=ids).update_price_with_tax()
+            pricing.schedule_refresh(ids)
+        invalidate_products(
+            product_ids=ids,
+            collection_ids=[product.collection_id for product in products],
         )
 
     class Media:
@@ -98,7 +224,7 @@ class ProductAdmin(ModelAdmin, ImportExportModelAdmin):
 
 
 @admin.register(Customer)
-class CustomerAdmin(ModelAdmin, ImportExportModelAdmin):
+class CustomerAdmin(EstimatedCountMixin, ModelAdmin, ImportExportModelAdmin):
     import_form_class = ImportForm
     export_form_class = ExportForm
     list_display = ["first_name", "last_name", "membership", "orders_count"]
@@ -108,8 +234,12 @@ class CustomerAdmin(ModelAdmin, ImportExportModelAdmin):
     list_select_related = ["user"]
     ordering = ["user__first_name", "user__last_name"]
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(orders_count=Count("orders"))
+
+    @admin.display(ordering="orders_count")
     def orders_count(self, customer):
-        return customer.orders.count()
+        return customer.orders_count
 
 
 class OrderItemInline(admin.TabularInline):
@@ -120,23 +250,41 @@ class OrderItemInline(admin.TabularInline):
 
 
 @admin.register(Order)
-class OrderAdmin(ModelAdmin, ImportExportModelAdmin):
+class OrderAdmin(EstimatedCountMixin, ModelAdmin, ImportExportModelAdmin):
     import_form_class = ImportForm
     export_form_class = ExportForm
     inlines = [OrderItemInline]
     autocomplete_fields = ["customer"]
-    list_select_related = ["customer"]
-    list_display = ["id", "Order_placed_at", "customer_name"]
+    list_display = [
+        "id",
+        "Order_placed_at",
+        "customer_name",
+        "total_amount",
+        "item_count",
+    ]
     list_per_page = 10
 
-    @admin.display(ordering="-placed_at")
+    def get_queryset(self, request):
+        # Joined in the changelist query instead of loading customer.user per row
+        return (
+            super()
+            .get_queryset(request)
+            .annotate(
+                customer_name=Concat(
+                    "customer__user__first_name",
+                    Value(" "),
+                    "customer__user__last_name",
+                )
+            )
+        )
+
+    @admin.display(ordering="customer_name")
     def customer_name(self, order):
-        full_name = order.customer.user.first_name + " " + order.customer.user.last_name
-        return full_name
+        return order.customer_name
 
 
 @admin.register(OrderItem)
-class OrderItemAdmin(ModelAdmin, ImportExportModelAdmin):
+class OrderItemAdmin(EstimatedCountMixin, ModelAdmin, ImportExportModelAdmin):
     import_form_class = ImportForm
     export_form_class = ExportForm
     list_display = ["id", "order", "product", "quantity", "unit_price"]
@@ -144,7 +292,7 @@ class OrderItemAdmin(ModelAdmin, ImportExportModelAdmin):
 
 
 @admin.register(Address)
-class AddressAdmin(ModelAdmin, ImportExportModelAdmin):
+class AddressAdmin(EstimatedCountMixin, ModelAdmin, ImportExportModelAdmin):
     import_form_class = ImportForm
     export_form_class = ExportForm
     list_display = ["street", "city"]
@@ -152,7 +300,7 @@ class AddressAdmin(ModelAdmin, ImportExportModelAdmin):
 
 
 @admin.register(Cart)
-class CartAdmin(ModelAdmin, ImportExportModelAdmin):
+class CartAdmin(EstimatedCountMixin, ModelAdmin, ImportExportModelAdmin):
     import_form_class = ImportForm
     export_form_class = ExportForm
     list_display = ["id", "created_at"]
@@ -160,8 +308,16 @@ class CartAdmin(ModelAdmin, ImportExportModelAdmin):
 
 
 @admin.register(CartItem)
-class CartItemAdmin(ModelAdmin, ImportExportModelAdmin):
+class CartItemAdmin(EstimatedCountMixin, ModelAdmin, ImportExportModelAdmin):
     import_form_class = ImportForm
     export_form_class = ExportForm
     list_display = ["id", "cart", "product", "quantity"]
     list_per_page = 10
+
+
+@admin.register(OutboxEvent)
+class OutboxEventAdmin(EstimatedCountMixin, ModelAdmin):
+    list_display = ["idempotency_key", "topic", "status", "attempts", "available_at"]
+    list_filter = ["status", "topic"]
+    readonly_fields = ["created_at", "processed_at"]
+    list_per_page = 10
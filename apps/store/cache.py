@@ -0,0 +1,260 @@
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from hashlib import md5
+
+from django.core.cache import cache
+from django.db import transaction
+from django_redis import get_redis_connection
+
+# Only these query params change what the product endpoints return, so
+# anything else is dropped before building the cache key.
+PRODUCT_LIST_PARAMS = [
+    "collection_id",
+    "unit_price__gt",
+    "unit_price__lt",
+    "price_with_tax__gt",
+    "price_with_tax__lt",
+    "search",
+    "ordering",
+    "page",
+    "cursor",
+]
+
+COLLECTION_LIST_PARAMS = ["page"]
+
+CATALOG_VERSION_KEY = "store:products:version:catalog"
+PRODUCTS_VERSION_KEY = "store:products:version"
+COLLECTION_VERSION_KEY = "store:products:version:collection:{}"
+PRODUCT_VERSION_KEY = "store:products:version:product:{}"
+COLLECTIONS_VERSION_KEY = "store:collections:version"
+COLLECTIONS_CHANNEL = "store:collections:invalidate"
+REVIEW_VERSION_KEY = "store:reviews:version:product:{}"
+
+
+class VersionedKey(namedtuple("VersionedKey", ["key", "last_modified"])):
+    """
+    A cache key built from version counters, and the time the newest of
+    them was bumped. Both change on every write that affects the cached
+    response, so they double as its HTTP validators.
+    """
+
+    @property
+    def etag(self):
+        # Weak: the body is only semantically equal once nginx gzips it.
+        return f'W/"{md5(self.key.encode()).hexdigest()}"'
+
+
+def modified_key(key):
+    return f"{key}:modified"
+
+
+def get_versions(*keys):
+    """The versions of keys, and when the latest of them was bumped."""
+    modified_keys = [modified_key(key) for key in keys]
+    stored = cache.get_many([*keys, *modified_keys])
+    missing = [key for key in modified_keys if key not in stored]
+    if missing:
+        # Nothing was bumped since the cache was flushed, or ever. Now is no
+        # earlier than the last write, so it is a valid Last-Modified; add()
+        # keeps whichever bump or seed got there first.
+        now = int(time.time())
+        for key in missing:
+            cache.add(key, now, timeout=None)
+        stored.update(cache.get_many(missing))
+    versions = [stored.get(key, 0) for key in keys]
+    modified = [stored[key] for key in modified_keys if key in stored]
+    return versions, max(modified, default=None)
+
+
+def bump_version(key):
+    # Version counters never expire; incr is atomic on django_redis.
+    cache.set(modified_key(key), int(time.time()), timeout=None)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, timeout=None)
+        return cache.incr(key)
+
+
+def bump_on_commit(*keys):
+    # Bumping before the write commits lets a concurrent request cache the
+    # old rows under the new version, so the bumps wait for the commit.
+    # Outside a transaction on_commit runs them right away.
+    transaction.on_commit(lambda: [bump_version(key) for key in keys])
+
+
+def invalidate_products(product_ids=(), collection_ids=()):
+    # The ids may be a lazy queryset, so the keys are built before the commit.
+    bump_on_commit(
+        PRODUCTS_VERSION_KEY,
+        *(
+            COLLECTION_VERSION_KEY.format(collection_id)
+            for collection_id in set(collection_ids)
+            if collection_id is not None
+        ),
+        *(
+            PRODUCT_VERSION_KEY.format(product_id)
+            for product_id in set(product_ids)
+            if product_id is not None
+        ),
+    )
+
+
+def invalidate_catalog():
+    # Every product key embeds this version, for changes such as a new tax
+    # rate that touch all products at once.
+    bump_on_commit(CATALOG_VERSION_KEY)
+
+
+def _digest(request, params):
+    # Image urls are absolute, so the host is part of the cached body.
+    raw = request.build_absolute_uri("/") + "&".join(
+        f"{name}={value}" for name, value in params
+    )
+    return md5(raw.encode()).hexdigest()
+
+
+def product_list_cache_key(request):
+    params = sorted(
+        (name, request.query_params.get(name))
+        for name in PRODUCT_LIST_PARAMS
+        if request.query_params.get(name) is not None
+    )
+    collection_id = request.query_params.get("collection_id", "")
+    if collection_id.isdigit():
+        # Filtered lists only contain one collection's products, so writes
+        # to other collections leave them untouched.
+        version_key = COLLECTION_VERSION_KEY.format(collection_id)
+    else:
+        version_key = PRODUCTS_VERSION_KEY
+    (catalog_version, version), last_modified = get_versions(
+        CATALOG_VERSION_KEY, version_key
+    )
+    return VersionedKey(
+        f"store:products:list:{catalog_version}:{version}:"
+        f"{_digest(request, params)}",
+        last_modified,
+    )
+
+
+def product_detail_cache_key(request, product_id):
+    (catalog_version, version), last_modified = get_versions(
+        CATALOG_VERSION_KEY, PRODUCT_VERSION_KEY.format(product_id)
+    )
+    return VersionedKey(
+        f"store:products:detail:{product_id}:{catalog_version}:{version}:"
+        f"{_digest(request, [])}",
+        last_modified,
+    )
+
+
+class LocalCache:
+    """
+    In-process LRU in front of the shared cache. It is only used while a
+    background thread is subscribed to the invalidation channel, so every
+    worker drops its copy as soon as any of them publishes a write.
+    """
+
+    def __init__(self, channel, maxsize=64):
+        self.channel = channel
+        self.maxsize = maxsize
+        self.data = OrderedDict()
+        self.lock = threading.Lock()
+        self.generation = 0
+        self.subscribed = False
+        self.pid = None
+
+    def ensure_listening(self):
+        # Threads don't survive a fork, so each gunicorn worker starts its own.
+        if self.pid != os.getpid():
+            self.pid = os.getpid()
+            self.subscribed = False
+            self.clear()
+            threading.Thread(target=self.listen, daemon=True).start()
+
+    def listen(self):
+        while True:
+            try:
+                pubsub = get_redis_connection("default").pubsub(
+                    ignore_subscribe_messages=True
+                )
+                pubsub.subscribe(self.channel)
+                self.clear()
+                self.subscribed = True
+                for _ in pubsub.listen():
+                    self.clear()
+            except Exception:
+                pass
+            # Invalidations may be missed while disconnected.
+            self.subscribed = False
+            self.clear()
+            time.sleep(1)
+
+    def get(self, key):
+        self.ensure_listening()
+        if not self.subscribed:
+            return None
+        with self.lock:
+            if key not in self.data:
+                return None
+            self.data.move_to_end(key)
+            return self.data[key]
+
+    def set(self, key, value, generation):
+        # Skip values computed before an invalidation that raced with them.
+        with self.lock:
+            if not self.subscribed or generation != self.generation:
+                return
+            self.data[key] = value
+            self.data.move_to_end(key)
+            while len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.generation += 1
+            self.data.clear()
+
+
+local_collections = LocalCache(COLLECTIONS_CHANNEL)
+
+
+def invalidate_collections():
+    transaction.on_commit(publish_collections)
+
+
+def publish_collections():
+    bump_version(COLLECTIONS_VERSION_KEY)
+    local_collections.clear()
+    get_redis_connection("default").publish(COLLECTIONS_CHANNEL, "invalidate")
+
+
+def collection_list_local_key(request):
+    params = sorted(
+        (name, request.query_params.get(name))
+        for name in COLLECTION_LIST_PARAMS
+        if request.query_params.get(name) is not None
+    )
+    return _digest(request, params)
+
+
+def collection_list_cache_key(local_key):
+    # Only built on a local miss, so local hits don't touch Redis at all.
+    (version,), last_modified = get_versions(COLLECTIONS_VERSION_KEY)
+    return VersionedKey(f"store:collections:list:{version}:{local_key}", last_modified)
+
+
+def invalidate_reviews(product_id):
+    bump_on_commit(REVIEW_VERSION_KEY.format(product_id))
+
+
+def review_cache_key(request, product_id):
+    # Reviews aren't cached, the key only provides their validators.
+    (version,), last_modified = get_versions(REVIEW_VERSION_KEY.format(product_id))
+    return VersionedKey(
+        f"store:reviews:{product_id}:{version}:"
+        f"{_digest(request, [('path', request.get_full_path())])}",
+        last_modified,
+    )
@@ -0,0 +1,298 @@
+from contextlib import contextmanager
+from decimal import Decimal
+from types import SimpleNamespace
+from uuid import UUID, uuid4
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from django_redis import get_redis_connection
+from redis.exceptions import ResponseError
+
+from .models import MAX_ITEM_QUANTITY, Cart, CartItem, Product
+
+
+def parse_cart_id(value):
+    try:
+        return UUID(str(value))
+    except ValueError:
+        return None
+
+
+def parse_item_id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class DatabaseCartStore:
+    """Carts as Cart/CartItem rows, with totals computed in SQL."""
+
+    def create_cart(self):
+        cart = Cart.objects.create()
+        # A new cart is empty, no need to query its items or totals.
+        cart._prefetched_objects_cache = {"items": CartItem.objects.none()}
+        cart.item_count = 0
+        cart.total_price = Decimal(0)
+        return cart
+
+    def get_cart(self, cart_id):
+        return Cart.objects.with_totals().filter(pk=cart_id).first()
+
+    def delete_cart(self, cart_id):
+        deleted, _ = Cart.objects.filter(pk=cart_id).delete()
+        return deleted > 0
+
+    def cart_exists(self, cart_id):
+        return Cart.objects.filter(pk=cart_id).exists()
+
+    def get_items(self, cart_id):
+        return list(CartItem.objects.with_total_price().filter(cart_id=cart_id))
+
+    def get_item(self, cart_id, item_id):
+        return (
+            CartItem.objects.with_total_price()
+            .filter(cart_id=cart_id, pk=item_id)
+            .first()
+        )
+
+    def set_item_quantity(self, cart_id, item_id, quantity):
+        CartItem.objects.filter(cart_id=cart_id, pk=item_id).update(quantity=quantity)
+        return self.get_item(cart_id, item_id)
+
+    def delete_item(self, cart_id, item_id):
+        deleted, _ = CartItem.objects.filter(cart_id=cart_id, pk=item_id).delete()
+        return deleted > 0
+
+    @contextmanager
+    def checkout(self, cart_id):
+        """
+        Yields the cart's {product_id: quantity}, or None if it doesn't
+        exist, and deletes the cart in the same transaction unless the block
+        raises. A concurrent checkout of the cart waits on its row lock, then
+        finds it gone.
+        """
+        with transaction.atomic():
+            if Cart.objects.select_for_update().filter(pk=cart_id).first() is None:
+                yield None
+                return
+            yield dict(
+                CartItem.objects.filter(cart_id=cart_id).values_list(
+                    "product_id", "quantity"
+                )
+            )
+            Cart.objects.filter(pk=cart_id).delete()
+
+    def add_quantities(self, cart_id, quantities):
+        # Skips missing products and carts, see CartItemQuerySet.add_quantities
+        return CartItem.objects.add_quantities(cart_id, quantities)
+
+    def apply(self, cart_id, adds, sets, removes):
+        with transaction.atomic():
+            if removes:
+                CartItem.objects.filter(
+                    cart_id=cart_id, product_id__in=removes
+                ).delete()
+            CartItem.objects.set_quantities(cart_id, sets)
+            CartItem.objects.add_quantities(cart_id, adds)
+
+
+# KEYS[1] is the cart hash. ARGV is the TTL, the quantity cap, then the
+# removed fields, the set field/quantity pairs and the added field/quantity
+# pairs, each group preceded by its length. A cart that doesn't exist, e.g.
+# because it expired, is left alone and nil returned, otherwise the new
+# quantities of the added fields.
+APPLY_SCRIPT = """
+local key = KEYS[1]
+if redis.call("EXISTS", key) == 0 then
+    return nil
+end
+local cap = tonumber(ARGV[2])
+local i = 3
+local count = tonumber(ARGV[i])
+for j = 1, count do
+    redis.call("HDEL", key, ARGV[i + j])
+end
+i = i + count + 1
+count = tonumber(ARGV[i])
+for j = 1, count * 2, 2 do
+    redis.call("HSET", key, ARGV[i + j], math.min(tonumber(ARGV[i + j + 1]), cap))
+end
+i = i + count * 2 + 1
+count = tonumber(ARGV[i])
+local results = {}
+for j = 1, count * 2, 2 do
+    local quantity = redis.call("HINCRBY", key, ARGV[i + j], ARGV[i + j + 1])
+    if quantity > cap then
+        redis.call("HSET", key, ARGV[i + j], cap)
+        quantity = cap
+    end
+    table.insert(results, quantity)
+end
+redis.call("EXPIRE", key, ARGV[1])
+return results
+"""
+
+
+class RedisCartStore:
+    """
+    Carts as Redis hashes on the default django_redis connection, one
+    "p:<product_id>" field per item plus a created_at marker, expiring
+    STORE_CART_TTL seconds after the last write. Item ids are product ids.
+    Nothing touches the database until checkout reads the quantities.
+    """
+
+    key_prefix = "store:cart:"
+    created_field = "created_at"
+    product_prefix = "p:"
+
+    def __init__(self):
+        self.redis = get_redis_connection("default")
+        self.ttl = settings.STORE_CART_TTL
+        self.apply_script = self.redis.register_script(APPLY_SCRIPT)
+
+    def key(self, cart_id):
+        return f"{self.key_prefix}{cart_id.hex}"
+
+    def field(self, product_id):
+        return f"{self.product_prefix}{product_id}"
+
+    def read(self, cart_id, key=None):
+        values = self.redis.hgetall(key or self.key(cart_id))
+        if not values:
+            return None
+        quantities = {}
+        for field, quantity in values.items():
+            field = field.decode()
+            if field.startswith(self.product_prefix):
+                quantities[int(field[len(self.product_prefix) :])] = int(quantity)
+        return quantities
+
+    def build_items(self, quantities):
+        products = (
+            Product.objects.only("id", "title", "unit_price")
+            .with_effective_price()
+            .in_bulk(quantities)
+        )
+        return [
+            SimpleNamespace(
+                id=product_id,
+                product=products[product_id],
+                product_id=product_id,
+                quantity=quantity,
+                total_price=quantity * products[product_id].effective_price,
+            )
+            for product_id, quantity in sorted(quantities.items())
+            if product_id in products
+        ]
+
+    def build_cart(self, cart_id, quantities):
+        items = self.build_items(quantities)
+        return SimpleNamespace(
+            id=cart_id,
+            items=items,
+            item_count=sum(item.quantity for item in items),
+            total_price=sum((item.total_price for item in items), Decimal(0)),
+        )
+
+    def create_cart(self):
+        cart_id = uuid4()
+        self.redis.hset(
+            self.key(cart_id), self.created_field, timezone.now().isoformat()
+        )
+        self.redis.expire(self.key(cart_id), self.ttl)
+        return self.build_cart(cart_id, {})
+
+    def get_cart(self, cart_id):
+        quantities = self.read(cart_id)
+        if quantities is None:
+            return None
+        return self.build_cart(cart_id, quantities)
+
+    def delete_cart(self, cart_id):
+        return self.redis.delete(self.key(cart_id)) > 0
+
+    def cart_exists(self, cart_id):
+        return self.redis.exists(self.key(cart_id)) > 0
+
+    def get_items(self, cart_id):
+        return self.build_items(self.read(cart_id) or {})
+
+    def get_item(self, cart_id, item_id):
+        quantity = self.redis.hget(self.key(cart_id), self.field(item_id))
+        if quantity is None:
+            return None
+        items = self.build_items({item_id: int(quantity)})
+        return items[0] if items else None
+
+    def set_item_quantity(self, cart_id, item_id, quantity):
+        if not self.redis.hexists(self.key(cart_id), self.field(item_id)):
+            return None
+        self.apply(cart_id, {}, {item_id: quantity}, set())
+        return self.get_item(cart_id, item_id)
+
+    def delete_item(self, cart_id, item_id):
+        deleted = self.redis.hdel(self.key(cart_id), self.field(item_id))
+        return deleted > 0
+
+    @contextmanager
+    def checkout(self, cart_id):
+        """
+        Same contract as the database store. The cart is renamed out of the
+        way first: RENAME is atomic, so of two checkouts only one gets it.
+        It is put back if the block raises, and deleted once it completes.
+        """
+        key = self.key(cart_id)
+        claimed = f"{key}:checkout"
+        try:
+            self.redis.rename(key, claimed)
+        except ResponseError:
+            yield None
+            return
+        try:
+            yield self.read(cart_id, claimed)
+        except BaseException:
+            self.redis.rename(claimed, key)
+            raise
+        self.redis.delete(claimed)
+
+    def add_quantities(self, cart_id, quantities):
+        # Same contract as the database store: products and carts that don't
+        # exist are skipped.
+        if not quantities:
+            return []
+        existing = set(
+            Product.objects.filter(pk__in=quantities).values_list("id", flat=True)
+        )
+        quantities = {
+            product_id: quantity
+            for product_id, quantity in quantities.items()
+            if product_id in existing
+        }
+        results = self.apply(cart_id, quantities, {}, set()) or []
+        return [
+            SimpleNamespace(id=product_id, product_id=product_id, quantity=quantity)
+            for product_id, quantity in zip(quantities, results)
+        ]
+
+    def apply(self, cart_id, adds, sets, removes):
+        """
+        Apply the folded operations in one script, so an expired cart can't
+        be recreated without its created_at and TTL, and quantities are
+        capped at MAX_ITEM_QUANTITY like the database columns. Returns the
+        new quantities of the added products, or None if the cart doesn't
+        exist.
+        """
+        args = [self.ttl, MAX_ITEM_QUANTITY, len(removes)]
+        args += [self.field(product_id) for product_id in removes]
+        for changes in (sets, adds):
+            args.append(len(changes))
+            for product_id, quantity in changes.items():
+                args += [self.field(product_id), quantity]
+        return self.apply_script(keys=[self.key(cart_id)], args=args)
+
+
+def get_cart_store():
+    return import_string(settings.STORE_CART_BACKEND)()
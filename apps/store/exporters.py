@@ -0,0 +1,154 @@
+import csv
+import json
+from importlib.util import find_spec
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import Order, OrderItem, Product
+
+
+class Export:
+    """
+    A dataset read with .values_list().iterator(), which streams rows from
+    a server-side cursor on Postgres, so exporting holds at most one chunk
+    in memory.
+    """
+
+    def __init__(self, model, columns, ordering=("id",)):
+        self.model = model
+        self.columns = columns
+        self.ordering = ordering
+
+    @property
+    def header(self):
+        return [column.replace("__", "_") for column in self.columns]
+
+    def rows(self):
+        return (
+            self.model.objects.order_by(*self.ordering)
+            .values_list(*self.columns)
+            .iterator(chunk_size=settings.STORE_EXPORT_CHUNK_SIZE)
+        )
+
+
+EXPORTS = {
+    "products": Export(
+        Product,
+        [
+            "id",
+            "title",
+            "slug",
+            "description",
+            "unit_price",
+            "price_with_tax",
+            "inventory",
+            "collection__title",
+            "last_update",
+        ],
+    ),
+    "orders": Export(
+        Order,
+        [
+            "id",
+            "customer_id",
+            "Order_placed_at",
+            "payment_status",
+            "total_amount",
+            "item_count",
+        ],
+    ),
+    "order-items": Export(
+        OrderItem,
+        ["id", "order_id", "product_id", "product__title", "quantity", "unit_price"],
+    ),
+}
+
+
+class Echo:
+    """A file-like object for csv.writer that hands back what is written."""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(export):
+    writer = csv.writer(Echo())
+    yield writer.writerow(export.header)
+    for row in export.rows():
+        yield writer.writerow(row)
+
+
+def jsonl_lines(export):
+    header = export.header
+    for row in export.rows():
+        yield json.dumps(dict(zip(header, row)), cls=DjangoJSONEncoder) + "\n"
+
+
+async def async_lines(lines):
+    """
+    The lines as an async iterator, for responses served under ASGI. Django
+    reads a sync iterator there with one sync_to_async(list) call, so the
+    whole export would be buffered in memory before the first byte is sent.
+    Here every STORE_EXPORT_CHUNK_SIZE lines are read in one thread hop and
+    sent as they come. thread_sensitive keeps every hop on the request's
+    thread, which owns the database connection and its server-side cursor.
+    """
+    iterator = iter(lines)
+    next_chunk = sync_to_async(
+        lambda: "".join(islice(iterator, settings.STORE_EXPORT_CHUNK_SIZE)),
+        thread_sensitive=True,
+    )
+    while chunk := await next_chunk():
+        yield chunk
+
+
+def write_parquet(export, file):
+    # Optional dependency, parquet is only offered when it is installed
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    header = export.header
+    writer = None
+    batch = []
+
+    def flush():
+        nonlocal writer
+        table = pa.Table.from_pylist(
+            [dict(zip(header, row)) for row in batch],
+            schema=writer.schema if writer else None,
+        )
+        if writer is None:
+            writer = pq.ParquetWriter(file, table.schema)
+        # Every chunk becomes a row group, written as soon as it is full.
+        writer.write_table(table)
+        batch.clear()
+
+    for row in export.rows():
+        batch.append(row)
+        if len(batch) == settings.STORE_EXPORT_CHUNK_SIZE:
+            flush()
+    if batch or writer is None:
+        flush()
+    writer.close()
+
+
+STREAMING_FORMATS = {
+    "csv": (csv_lines, "text/csv"),
+    "jsonl": (jsonl_lines, "application/x-ndjson"),
+}
+FILE_FORMATS = [*STREAMING_FORMATS]
+if find_spec("pyarrow") is not None:
+    FILE_FORMATS.append("parquet")
+
+
+def write_export(export, format, file):
+    """Write an export to a binary file, a chunk at a time."""
+    if format == "parquet":
+        write_parquet(export, file)
+        return
+    lines, _ = STREAMING_FORMATS[format]
+    for line in lines(export):
+        file.write(line.encode())
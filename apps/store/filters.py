@@ -1,6 +1,8 @@
 from django_filters.rest_framework import FilterSet
+from rest_framework.filters import SearchFilter
 
 from .models import Product
+from .search import get_search_backend
 
 
 class ProductFilter(FilterSet):
@@ -9,4 +11,15 @@ class ProductFilter(FilterSet):
         fields = {
             "collection_id": ["exact"],
             "unit_price": ["gt", "lt"],
+            "price_with_tax": ["gt", "lt"],
         }
+
+
+class ProductSearchFilter(SearchFilter):
+    """Ranked ?search= on products through the configured search backend."""
+
+    def filter_queryset(self, request, queryset, view):
+        term = request.query_params.get(self.search_param, "").replace("\x00", "")
+        if not term.strip():
+            return queryset
+        return get_search_backend().search(queryset, term)
@@ -0,0 +1,289 @@
+import csv
+import io
+import json
+import re
+import time
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .cache import invalidate_catalog, invalidate_collections
+from .models import Collection, Product, TaxRate, price_with_tax
+from .pricing import refresh_prices
+from .search import get_search_backend
+
+PRODUCT_TABLE = Product._meta.db_table
+
+# Columns written by an import, in COPY order
+IMPORT_COLUMNS = [
+    "title",
+    "slug",
+    "description",
+    "unit_price",
+    "price_with_tax",
+    "inventory",
+    "last_update",
+    "collection_id",
+]
+
+SLUG_RE = re.compile(r"^[-a-zA-Z0-9_]+\Z")
+MAX_UNIT_PRICE = Decimal("9999.99")
+MIN_INVENTORY, MAX_INVENTORY = -(2**31), 2**31 - 1
+
+
+def read_csv(file):
+    # Header line is 1, so the first product is line 2.
+    for line, row in enumerate(csv.DictReader(file), start=2):
+        yield line, row
+
+
+def read_jsonl(file):
+    for line, text in enumerate(file, start=1):
+        if not text.strip():
+            continue
+        try:
+            row = json.loads(text)
+        except ValueError:
+            row = None
+        yield line, row if isinstance(row, dict) else {"_error": "invalid JSON"}
+
+
+READERS = {
+    "csv": read_csv,
+    "jsonl": read_jsonl,
+}
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def parse_text(values, max_length, required=True):
+    errors = {}
+    for index, value in enumerate(values):
+        if value is None or not str(value).strip():
+            if required:
+                errors[index] = "is required"
+        elif len(str(value)) > max_length:
+            errors[index] = f"is longer than {max_length} characters"
+    return errors
+
+
+def parse_slugs(values):
+    errors = parse_text(values, 255)
+    for index, value in enumerate(values):
+        if index not in errors and not SLUG_RE.match(str(value)):
+            errors[index] = "is not a valid slug"
+    return errors
+
+
+def parse_prices(values):
+    prices, errors = [], {}
+    for index, value in enumerate(values):
+        try:
+            price = Decimal(str(value).strip()).quantize(Decimal("0.01"))
+            valid = 1 <= price <= MAX_UNIT_PRICE
+        except (InvalidOperation, ValueError):
+            price, valid = None, False
+        if not valid:
+            errors[index] = f"must be a number between 1 and {MAX_UNIT_PRICE}"
+        prices.append(price)
+    return prices, errors
+
+
+def parse_inventories(values):
+    inventories, errors = [], {}
+    for index, value in enumerate(values):
+        try:
+            inventory = int(str(value).strip())
+            valid = MIN_INVENTORY <= inventory <= MAX_INVENTORY
+        except ValueError:
+            inventory, valid = None, False
+        if not valid:
+            errors[index] = "must be an integer"
+        inventories.append(inventory)
+    return inventories, errors
+
+
+class ImportReport:
+    def __init__(self):
+        self.read = 0
+        self.imported = 0
+        self.rejected = 0
+        self.started = time.monotonic()
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    @property
+    def rows_per_second(self):
+        return self.read / self.elapsed if self.elapsed else 0
+
+    def as_dict(self):
+        return {
+            "read": self.read,
+            "imported": self.imported,
+            "rejected": self.rejected,
+            "seconds": round(self.elapsed, 2),
+            "rows_per_second": round(self.rows_per_second),
+        }
+
+
+class ProductImporter:
+    """
+    Upserts products on slug from a stream of rows, chunk_size rows at a
+    time, so memory stays flat however large the feed is. Rows are checked
+    a column at a time without instantiating models, and each chunk is one
+    COPY plus INSERT ... ON CONFLICT on Postgres, or one bulk_create with
+    update_conflicts elsewhere. Signals don't fire for these writes, so
+    collection counts, the search index and caches are refreshed here.
+
+    Rejected rows are written as (line, column, error) to rejects, a csv
+    writer, if one is given.
+    """
+
+    def __init__(self, chunk_size=5_000, rejects=None, progress=None):
+        self.chunk_size = chunk_size
+        self.rejects = rejects
+        self.progress = progress
+        # Collection titles are resolved against this map, not per row.
+        self.collections = dict(Collection.objects.values_list("title", "id"))
+        self.tax_rate = TaxRate.current_rate()
+        self.search_backend = get_search_backend()
+
+    def run(self, rows):
+        report = ImportReport()
+        for chunk in chunked(rows, self.chunk_size):
+            report.read += len(chunk)
+            products, rejected = self.validate(chunk)
+            report.rejected += len(rejected)
+            if self.rejects is not None:
+                self.rejects.writerows(rejected)
+            if products:
+                with transaction.atomic():
+                    product_ids = self.write(products)
+                    self.search_backend.index_products(product_ids)
+                    refresh_prices(product_ids)
+                    # Readers see each chunk once it commits, not only at the end
+                    invalidate_catalog()
+                report.imported += len(products)
+            if self.progress:
+                self.progress(report)
+        self.finish()
+        return report
+
+    def validate(self, chunk):
+        """The chunk's valid rows as IMPORT_COLUMNS tuples, and its rejects."""
+        lines = [line for line, _ in chunk]
+        rows = [row for _, row in chunk]
+
+        def column(name):
+            return [row.get(name) for row in rows]
+
+        errors = {}
+
+        def collect(name, column_errors):
+            for index, error in column_errors.items():
+                errors.setdefault(index, (name, error))
+
+        collect(
+            "row",
+            {index: row["_error"] for index, row in enumerate(rows) if "_error" in row},
+        )
+        collect("title", parse_text(column("title"), 255))
+        collect("slug", parse_slugs(column("slug")))
+        prices, price_errors = parse_prices(column("unit_price"))
+        collect("unit_price", price_errors)
+        inventories, inventory_errors = parse_inventories(column("inventory"))
+        collect("inventory", inventory_errors)
+        collection_ids = [
+            self.collections.get(title) if isinstance(title, str) else None
+            for title in column("collection")
+        ]
+        collect(
+            "collection",
+            {
+                index: "does not exist"
+                for index, collection_id in enumerate(collection_ids)
+                if collection_id is None
+            },
+        )
+
+        now = timezone.now()
+        # One statement can't upsert a slug twice, so the last row wins.
+        products = {}
+        for index, row in enumerate(rows):
+            if index in errors:
+                continue
+            slug = str(row["slug"])
+            products[slug] = (
+                str(row["title"]),
+                slug,
+                str(row.get("description") or ""),
+                prices[index],
+                price_with_tax(prices[index], self.tax_rate),
+                inventories[index],
+                now,
+                collection_ids[index],
+            )
+        rejected = [
+            (lines[index], name, error)
+            for index, (name, error) in sorted(errors.items())
+        ]
+        return list(products.values()), rejected
+
+    def write(self, products):
+        if connection.vendor == "postgresql":
+            return self.copy(products)
+        created = Product.objects.bulk_create(
+            [Product(**dict(zip(IMPORT_COLUMNS, product))) for product in products],
+            update_conflicts=True,
+            unique_fields=["slug"],
+            update_fields=[name for name in IMPORT_COLUMNS if name != "slug"],
+        )
+        return [product.pk for product in created]
+
+    def copy(self, products):
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(products)
+        buffer.seek(0)
+        columns = ", ".join(IMPORT_COLUMNS)
+        updates = ", ".join(
+            f"{name} = EXCLUDED.{name}" for name in IMPORT_COLUMNS if name != "slug"
+        )
+        with connection.cursor() as cursor:
+            # Kept for the session and emptied per chunk: ON COMMIT DROP would
+            # clash with the next chunk when an outer atomic() holds the commit
+            cursor.execute(
+                f"CREATE TEMP TABLE IF NOT EXISTS store_product_import AS "
+                f"SELECT {columns} FROM {PRODUCT_TABLE} WITH NO DATA"
+            )
+            cursor.execute("TRUNCATE store_product_import")
+            # csv writes "" unquoted, which COPY would otherwise read as NULL
+            cursor.copy_expert(
+                f"COPY store_product_import ({columns}) FROM STDIN "
+                "WITH (FORMAT csv, FORCE_NOT_NULL (title, description))",
+                buffer,
+            )
+            cursor.execute(
+                f"INSERT INTO {PRODUCT_TABLE} ({columns}) "
+                f"SELECT {columns} FROM store_product_import "
+                f"ON CONFLICT (slug) DO UPDATE SET {updates} RETURNING id"
+            )
+            return [product_id for product_id, in cursor.fetchall()]
+
+    def finish(self):
+        # Upserts can move products between collections, so recount them all.
+        Collection.objects.update_products_count()
+        invalidate_collections()
+
+
+def import_products(file, format, chunk_size=5_000, rejects=None, progress=None):
+    """Import the products of an open text file in the given format."""
+    importer = ProductImporter(chunk_size, rejects=rejects, progress=progress)
+    return importer.run(READERS[format](file))
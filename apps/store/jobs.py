@@ -0,0 +1,141 @@
+import logging
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from .cache import invalidate_products
+from .models import Product
+
+logger = logging.getLogger(__name__)
+
+# Admin actions that can run in the background: name -> function(ids)
+JOBS = {}
+
+JOB_KEY = "store:jobs:{}"
+JOB_DONE_KEY = "store:jobs:{}:done"
+JOB_FAILED_KEY = "store:jobs:{}:failed"
+JOB_ERROR_KEY = "store:jobs:{}:error"
+JOB_QUERY_KEY = "store:jobs:{}:query"
+
+
+def job(name):
+    def register(function):
+        JOBS[name] = function
+        return function
+
+    return register
+
+
+def start(name, queryset, description):
+    """
+    Record the job and queue a coordinator task that pages through the
+    selected ids, so the admin request doesn't load them or queue the
+    batches itself. The query goes through the cache, which pickles it,
+    because Celery arguments are JSON.
+    """
+    from .tasks import run_job
+
+    job_id = uuid4().hex
+    timeout = settings.STORE_JOB_TTL
+    cache.set_many(
+        {
+            JOB_KEY.format(job_id): {
+                "name": name,
+                "description": description,
+                "total": queryset.count(),
+                "started_at": timezone.now(),
+            },
+            JOB_QUERY_KEY.format(job_id): queryset.query,
+            JOB_DONE_KEY.format(job_id): 0,
+            JOB_FAILED_KEY.format(job_id): 0,
+        },
+        timeout,
+    )
+    run_job.delay(job_id)
+    return job_id
+
+
+def run(job_id):
+    """
+    Queue one task per STORE_JOB_BATCH_SIZE ids of the selection, paging by
+    primary key. Each batch commits on its own, so no lock is held across
+    the selection.
+    """
+    from .tasks import run_job_batch
+
+    state = cache.get(JOB_KEY.format(job_id))
+    query = cache.get(JOB_QUERY_KEY.format(job_id))
+    if state is None or query is None:
+        return
+    queryset = query.model._base_manager.all()
+    queryset.query = query
+    ids = queryset.order_by("pk").values_list("pk", flat=True)
+    queued = 0
+    batch = list(ids[: settings.STORE_JOB_BATCH_SIZE])
+    while batch:
+        run_job_batch.delay(job_id, state["name"], batch)
+        queued += len(batch)
+        batch = list(ids.filter(pk__gt=batch[-1])[: settings.STORE_JOB_BATCH_SIZE])
+    if queued != state["total"]:
+        # Rows were added or deleted since the count at the start
+        cache.set(
+            JOB_KEY.format(job_id), {**state, "total": queued}, settings.STORE_JOB_TTL
+        )
+
+
+def run_batch(job_id, name, ids):
+    """
+    Run the job on a batch. A failing batch is rolled back and counted as
+    failed, so the job still finishes and reports it.
+    """
+    try:
+        with transaction.atomic():
+            JOBS[name](ids)
+    except Exception as error:
+        logger.exception("Job %s failed on a batch of %s rows", job_id, len(ids))
+        cache.set(JOB_ERROR_KEY.format(job_id), str(error), settings.STORE_JOB_TTL)
+        cache.incr(JOB_FAILED_KEY.format(job_id), len(ids))
+    else:
+        cache.incr(JOB_DONE_KEY.format(job_id), len(ids))
+
+
+def progress(job_id):
+    """The job's description and counters, or None once it has expired."""
+    stored = cache.get_many(
+        [
+            JOB_KEY.format(job_id),
+            JOB_DONE_KEY.format(job_id),
+            JOB_FAILED_KEY.format(job_id),
+            JOB_ERROR_KEY.format(job_id),
+        ]
+    )
+    state = stored.get(JOB_KEY.format(job_id))
+    if state is None:
+        return None
+    done = stored.get(JOB_DONE_KEY.format(job_id), 0)
+    failed = stored.get(JOB_FAILED_KEY.format(job_id), 0)
+    total = state["total"]
+    return {
+        **state,
+        "id": job_id,
+        "done": done,
+        "failed": failed,
+        "percent": 100 if not total else (done + failed) * 100 // total,
+        "error": stored.get(JOB_ERROR_KEY.format(job_id)),
+        "finished": done + failed >= total,
+    }
+
+
+@job("clear_inventory")
+def clear_inventory(ids):
+    Product.objects.filter(pk__in=ids).update(inventory=0)
+    # update() skips post_save, so the product cache is invalidated here
+    invalidate_products(
+        product_ids=ids,
+        collection_ids=Product.objects.filter(pk__in=ids).values_list(
+            "collection_id", flat=True
+        ),
+    )
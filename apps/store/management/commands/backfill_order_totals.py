@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from apps.store.models import Order
+
+
+class Command(BaseCommand):
+    help = "Recompute Order.total_amount and item_count from the order items."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1_000)
+
+    def handle(self, *args, **options):
+        last_id = 0
+        updated = 0
+        while True:
+            # Walk the primary key so every batch is an index range scan.
+            ids = list(
+                Order.objects.filter(pk__gt=last_id)
+                .order_by("pk")
+                .values_list("pk", flat=True)[: options["batch_size"]]
+            )
+            if not ids:
+                break
+            with transaction.atomic():
+                updated += Order.objects.filter(pk__in=ids).update_totals()
+            last_id = ids[-1]
+            self.stdout.write(f"{updated} orders updated", ending="\r")
+        self.stdout.write(self.style.SUCCESS(f"Backfilled totals of {updated} orders."))
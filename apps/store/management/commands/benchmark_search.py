@@ -0,0 +1,100 @@
+from random import choice, randint
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from apps.store.models import Collection, Product, TaxRate, price_with_tax
+from apps.store.search import IContainsSearchBackend, get_search_backend
+
+WORDS = [
+    "apple",
+    "banana",
+    "cherry",
+    "walnut",
+    "coffee",
+    "organic",
+    "roasted",
+    "frozen",
+    "fresh",
+    "spicy",
+    "sweet",
+    "sour",
+    "crunchy",
+    "smoked",
+    "wild",
+    "golden",
+    "dark",
+    "green",
+    "red",
+    "sparkling",
+    "vanilla",
+    "honey",
+    "salted",
+]
+
+
+def sentence(length):
+    return " ".join(choice(WORDS) for _ in range(length))
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare product search latency of the icontains scan and the "
+        "configured full-text backend. Runs in a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes", nargs="+", type=int, default=[10_000, 100_000, 1_000_000]
+        )
+        parser.add_argument("--queries", type=int, default=20)
+        parser.add_argument("--batch-size", type=int, default=5_000)
+
+    def handle(self, *args, **options):
+        backends = [IContainsSearchBackend(), get_search_backend()]
+        terms = [f"{choice(WORDS)} {choice(WORDS)}" for _ in range(options["queries"])]
+
+        tax_rate = TaxRate.current_rate()
+
+        with transaction.atomic():
+            collection = Collection.objects.create(title="benchmark")
+            created = 0
+            for size in sorted(options["sizes"]):
+                while created < size:
+                    batch = min(options["batch_size"], size - created)
+                    products = []
+                    for i in range(batch):
+                        unit_price = randint(1, 999)
+                        products.append(
+                            Product(
+                                title=sentence(3),
+                                slug=f"benchmark-{created + i}",
+                                description=sentence(40),
+                                unit_price=unit_price,
+                                price_with_tax=price_with_tax(unit_price, tax_rate),
+                                inventory=10,
+                                collection=collection,
+                            )
+                        )
+                    Product.objects.bulk_create(products)
+                    created += batch
+                # bulk_create skips the signals that keep the index current
+                backends[-1].rebuild()
+
+                for backend in backends:
+                    started = perf_counter()
+                    for term in terms:
+                        # What the list endpoint does: count plus the first page
+                        queryset = backend.search(
+                            Product.objects.order_by("-last_update"), term
+                        )
+                        queryset.count()
+                        list(queryset.values_list("id", flat=True)[:10])
+                    elapsed = (perf_counter() - started) / len(terms) * 1000
+                    self.stdout.write(
+                        f"{size:>10} products  {type(backend).__name__:<24} "
+                        f"{elapsed:8.2f} ms/query"
+                    )
+
+            transaction.set_rollback(True)
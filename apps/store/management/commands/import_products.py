@@ -0,0 +1,58 @@
+import csv
+from contextlib import ExitStack
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.store.importers import READERS, import_products
+
+
+class Command(BaseCommand):
+    help = (
+        "Upsert products on slug from a CSV or JSONL feed with title, slug, "
+        "description, unit_price, inventory and collection (title) columns."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--format", choices=sorted(READERS), default=None)
+        parser.add_argument("--chunk-size", type=int, default=5_000)
+        parser.add_argument(
+            "--rejects", default=None, help="Write rejected rows to this CSV file."
+        )
+
+    def handle(self, *args, **options):
+        path = Path(options["path"])
+        format = options["format"] or path.suffix.lstrip(".").lower()
+        if format not in READERS:
+            raise CommandError(f"Unknown format {format!r}, pass --format.")
+
+        def progress(report):
+            self.stdout.write(
+                f"{report.read} rows read, {report.rejected} rejected, "
+                f"{report.rows_per_second:.0f} rows/s",
+                ending="\r",
+            )
+
+        with ExitStack() as stack:
+            rejects = None
+            if options["rejects"]:
+                rejects = csv.writer(
+                    stack.enter_context(open(options["rejects"], "w", newline=""))
+                )
+                rejects.writerow(["line", "column", "error"])
+            file = stack.enter_context(path.open(newline="", encoding="utf-8"))
+            report = import_products(
+                file,
+                format,
+                chunk_size=options["chunk_size"],
+                rejects=rejects,
+                progress=progress,
+            )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported {report.imported} of {report.read} rows "
+                f"({report.rejected} rejected) in {report.elapsed:.1f}s, "
+                f"{report.rows_per_second:.0f} rows/s."
+            )
+        )
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from apps.store.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = "Rebuild the product full-text search index in bulk."
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        backend.rebuild()
+        self.stdout.write(
+            self.style.SUCCESS(f"Rebuilt search index ({type(backend).__name__}).")
+        )
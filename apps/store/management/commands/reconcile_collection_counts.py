@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+
+from apps.store.cache import invalidate_collections
+from apps.store.models import Collection
+
+
+class Command(BaseCommand):
+    help = "Recompute Collection.products_count where it drifted from the products."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        last_id = 0
+        checked = fixed = 0
+        while True:
+            batch = list(
+                Collection.objects.filter(pk__gt=last_id)
+                .order_by("pk")
+                .with_actual_products_count()
+                .values_list("pk", "products_count", "actual_products_count")[
+                    : options["batch_size"]
+                ]
+            )
+            if not batch:
+                break
+            drifted = [pk for pk, stored, actual in batch if stored != actual]
+            if drifted:
+                # Recomputed rather than copied, in case products moved since.
+                fixed += Collection.objects.filter(
+                    pk__in=drifted
+                ).update_products_count()
+            checked += len(batch)
+            last_id = batch[-1][0]
+        if fixed:
+            invalidate_collections()
+        self.stdout.write(
+            self.style.SUCCESS(f"Checked {checked} collections, fixed {fixed}.")
+        )
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from apps.store.pricing import refresh_prices, refresh_stale_prices
+
+
+class Command(BaseCommand):
+    help = "Recompute the effective prices of products from their promotions."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--stale",
+            action="store_true",
+            help="Only products whose promotion window passed, or never priced.",
+        )
+
+    def handle(self, *args, **options):
+        repriced = refresh_stale_prices() if options["stale"] else refresh_prices()
+        self.stdout.write(self.style.SUCCESS(f"Repriced {repriced} products."))
@@ -0,0 +1,52 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.http.request import split_domain_port, validate_host
+from rest_framework.test import APIRequestFactory
+
+from apps.store.views import CollectionViewSet
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill the shared cache with every collection list page, e.g. at "
+        "deploy, so workers start from Redis instead of the database."
+    )
+
+    def add_arguments(self, parser):
+        # Pages embed absolute next/previous links, so they are cached per host.
+        # Defaults to the first ALLOWED_HOSTS entry that names a single host.
+        parser.add_argument("--host", default=None)
+        parser.add_argument("--scheme", default="https", choices=["http", "https"])
+
+    def handle(self, *args, **options):
+        host = options["host"] or next(
+            (
+                host
+                for host in settings.ALLOWED_HOSTS
+                if host != "*" and not host.startswith(".")
+            ),
+            None,
+        )
+        if host is None:
+            raise CommandError("ALLOWED_HOSTS names no single host, pass --host.")
+        domain, _ = split_domain_port(host)
+        if not validate_host(domain, settings.ALLOWED_HOSTS):
+            raise CommandError(f"{host} is not in ALLOWED_HOSTS.")
+        factory = APIRequestFactory()
+        view = CollectionViewSet.as_view({"get": "list"})
+        page, pages = 1, 0
+        while page:
+            request = factory.get(
+                "/api/v1/store/collections/",
+                {"page": page} if page > 1 else {},
+                HTTP_HOST=host,
+                secure=options["scheme"] == "https",
+            )
+            response = view(request)
+            if response.status_code != 200:
+                break
+            pages += 1
+            page = page + 1 if response.data.get("next") else None
+        self.stdout.write(
+            self.style.SUCCESS(f"Warmed {pages} collection list pages for {host}.")
+        )
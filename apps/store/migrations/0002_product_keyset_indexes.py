@@ -0,0 +1,31 @@
+# Generated by Django 5.0.4 on 2026-10-17 16:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("store", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                fields=["last_update", "id"], name="store_produ_last_up_34dd1f_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                fields=["unit_price", "id"], name="store_produ_unit_pr_2ca2a1_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                fields=["title", "id"], name="store_produ_title_829862_idx"
+            ),
+        ),
+    ]
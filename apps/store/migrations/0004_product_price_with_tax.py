@@ -0,0 +1,63 @@
+# Generated by Django 5.0.4 on 2026-10-17 17:02
+
+from decimal import Decimal
+
+import django.core.validators
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F
+from django.db.models.functions import Round
+
+
+def backfill_price_with_tax(apps, schema_editor):
+    Product = apps.get_model("store", "Product")
+    rate = Decimal(settings.STORE_DEFAULT_TAX_RATE)
+    Product.objects.update(price_with_tax=Round(F("unit_price") * (1 + rate), 2))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("store", "0003_product_search"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TaxRate",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("region", models.CharField(max_length=32, unique=True)),
+                (
+                    "rate",
+                    models.DecimalField(
+                        decimal_places=4,
+                        max_digits=5,
+                        validators=[django.core.validators.MinValueValidator(0)],
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name="product",
+            name="price_with_tax",
+            field=models.DecimalField(
+                decimal_places=2, default=0, editable=False, max_digits=8
+            ),
+            preserve_default=False,
+        ),
+        migrations.RunPython(backfill_price_with_tax, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                fields=["price_with_tax", "id"], name="store_produ_price_w_324c3a_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.0.4 on 2026-10-17 19:05
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_products_count(apps, schema_editor):
+    Collection = apps.get_model("store", "Collection")
+    Product = apps.get_model("store", "Product")
+    Collection.objects.update(
+        products_count=Coalesce(
+            Subquery(
+                Product.objects.filter(collection=OuterRef("pk"))
+                .values("collection")
+                .annotate(count=Count("id"))
+                .values("count")
+            ),
+            0,
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("store", "0006_outboxevent"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="collection",
+            name="products_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_products_count, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="collection",
+            index=models.Index(fields=["title"], name="store_colle_title_ddb562_idx"),
+        ),
+    ]
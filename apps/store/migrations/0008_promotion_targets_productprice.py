@@ -0,0 +1,98 @@
+# Generated by Django 5.0.4 on 2026-10-17 21:40
+
+import django.core.validators
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def clamp_discounts(apps, schema_editor):
+    # Discounts are now percentages in 0-100; older rows were never checked.
+    Promotion = apps.get_model("store", "Promotion")
+    Promotion.objects.filter(discount__lt=0).update(discount=0)
+    Promotion.objects.filter(discount__gt=100).update(discount=100)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("store", "0007_collection_products_count"),
+    ]
+
+    operations = [
+        migrations.RunPython(clamp_discounts, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="promotion",
+            name="discount",
+            field=models.FloatField(
+                validators=[
+                    django.core.validators.MinValueValidator(0),
+                    django.core.validators.MaxValueValidator(100),
+                ]
+            ),
+        ),
+        migrations.AddField(
+            model_name="promotion",
+            name="products",
+            field=models.ManyToManyField(
+                blank=True, related_name="promotions", to="store.product"
+            ),
+        ),
+        migrations.AddField(
+            model_name="promotion",
+            name="collections",
+            field=models.ManyToManyField(
+                blank=True, related_name="promotions", to="store.collection"
+            ),
+        ),
+        migrations.AddField(
+            model_name="promotion",
+            name="starts_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="promotion",
+            name="ends_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name="ProductPrice",
+            fields=[
+                (
+                    "product",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="effective",
+                        serialize=False,
+                        to="store.product",
+                    ),
+                ),
+                (
+                    "effective_price",
+                    models.DecimalField(decimal_places=2, max_digits=6),
+                ),
+                ("expires_at", models.DateTimeField(blank=True, null=True)),
+                (
+                    "promotion",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to="store.promotion",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["effective_price"],
+                        name="store_produ_effecti_5d119a_idx",
+                    ),
+                    models.Index(
+                        fields=["expires_at"], name="store_produ_expires_f14062_idx"
+                    ),
+                ],
+            },
+        ),
+    ]
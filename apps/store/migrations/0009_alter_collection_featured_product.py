@@ -0,0 +1,25 @@
+# Generated by Django 5.0.4 on 2026-10-17 18:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("store", "0008_promotion_targets_productprice"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="collection",
+            name="featured_product",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="+",
+                to="store.product",
+            ),
+        ),
+    ]
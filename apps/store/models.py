@@ -1,3 +1,4 @@
+from decimal import ROUND_HALF_UP, Decimal
 from uuid import uuid4
 
 from django.conf import settings
@@ -7,14 +8,84 @@ from import_export.admin import ImportExportModelAdmin
 from unfold.contrib.import_export.forms import ExportForm, ImportForm, SelectableFieldsExportForm
 
 from django.core.validators import *
-from django.db import models
+from django.db import connection, models
+from django.db.models import (
+    Case,
+    Count,
+    F,
+    OuterRef,
+    Prefetch,
+    Subquery,
+    Sum,
+    When,
+)
+from django.db.models.functions import Coalesce, Round
+from django.utils import timezone
 
 from apps.store.validators import validate_image_size
 
 
 class Promotion(models.Model):
     description = models.CharField(max_length=255)
-    discount = models.FloatField()
+    # Percent taken off the unit_price of the products it applies to
+    discount = models.FloatField(
+        validators=[MinValueValidator(0), MaxValueValidator(100)]
+    )
+    # Applies to these products and every product of these collections,
+    # from starts_at until ends_at (open-ended when empty)
+    products = models.ManyToManyField("Product", blank=True, related_name="promotions")
+    collections = models.ManyToManyField(
+        "Collection", blank=True, related_name="promotions"
+    )
+    starts_at = models.DateTimeField(null=True, blank=True)
+    ends_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return self.description
+
+    def is_running(self, now):
+        return (self.starts_at is None or self.starts_at <= now) and (
+            self.ends_at is None or now < self.ends_at
+        )
+
+
+def products_count_subquery():
+    return Coalesce(
+        Subquery(
+            Product.objects.filter(collection=OuterRef("pk"))
+            .values("collection")
+            .annotate(count=Count("id"))
+            .values("count")
+        ),
+        0,
+    )
+
+
+class CollectionQuerySet(models.QuerySet):
+    def with_actual_products_count(self):
+        return self.annotate(actual_products_count=products_count_subquery())
+
+    def update_products_count(self):
+        """Recompute products_count, for writes that bypass the signals."""
+        return self.update(products_count=products_count_subquery())
+
+    def adjust_products_count(self, deltas):
+        """Apply {collection_id: change} to products_count in one UPDATE."""
+        deltas = {pk: delta for pk, delta in deltas.items() if pk and delta}
+        if not deltas:
+            return 0
+        return self.filter(pk__in=deltas).update(
+            products_count=Case(
+                *[
+                    When(pk=pk, then=F("products_count") + delta)
+                    for pk, delta in deltas.items()
+                ],
+                default=F("products_count"),
+                # F() + int would otherwise mix IntegerField and
+                # PositiveIntegerField
+                output_field=models.PositiveIntegerField(),
+            )
+        )
 
 
 class Collection(models.Model):
@@ -22,12 +93,65 @@ class Collection(models.Model):
     featured_product = models.ForeignKey(
         "Product", on_delete=models.SET_NULL, null=True, blank=True, related_name="+"
     )
+    # Maintained by the product signals; reconcile_collection_counts fixes drift
+    products_count = models.PositiveIntegerField(default=0, editable=False)
+
+    objects = CollectionQuerySet.as_manager()
 
     def __str__(self):
         return self.title
 
     class Meta:
         ordering = ["title"]
+        indexes = [models.Index(fields=["title"])]
+
+
+class TaxRate(models.Model):
+    region = models.CharField(max_length=32, unique=True)
+    rate = models.DecimalField(
+        max_digits=5, decimal_places=4, validators=[MinValueValidator(0)]
+    )
+
+    def __str__(self):
+        return f"{self.region} ({self.rate})"
+
+    @classmethod
+    def current_rate(cls):
+        rate = (
+            cls.objects.filter(region=settings.STORE_TAX_REGION)
+            .values_list("rate", flat=True)
+            .first()
+        )
+        return Decimal(settings.STORE_DEFAULT_TAX_RATE) if rate is None else rate
+
+
+def price_with_tax(unit_price, rate):
+    # Half up, like the SQL Round() used by update_price_with_tax()
+    return (unit_price * (1 + rate)).quantize(Decimal("0.01"), ROUND_HALF_UP)
+
+
+class ProductQuerySet(models.QuerySet):
+    def update_price_with_tax(self, rate=None):
+        # Bulk counterpart of Product.save(), for tax rate changes and any
+        # update() that touches unit_price.
+        if rate is None:
+            rate = TaxRate.current_rate()
+        return self.update(price_with_tax=Round(F("unit_price") * (1 + rate), 2))
+
+    def with_effective_price(self):
+        return self.annotate(effective_price=effective_price_expression())
+
+    def decrement_inventory(self, quantities):
+        """Subtract {product_id: quantity} from inventory in one UPDATE."""
+        return self.filter(pk__in=quantities).update(
+            inventory=Case(
+                *[
+                    When(pk=product_id, then=F("inventory") - quantity)
+                    for product_id, quantity in quantities.items()
+                ],
+                default=F("inventory"),
+            )
+        )
 
 
 class Product(models.Model):
@@ -37,13 +161,82 @@ class Product(models.Model):
     unit_price = models.DecimalField(
         max_digits=6, decimal_places=2, validators=[MinValueValidator(1)]
     )
+    # unit_price with the current region's tax applied, kept in sync on
+    # save so it can be filtered and sorted on in SQL
+    price_with_tax = models.DecimalField(max_digits=8, decimal_places=2, editable=False)
     inventory = models.IntegerField()
     last_update = models.DateTimeField(auto_now=True)
     collection = models.ForeignKey(Collection, on_delete=models.PROTECT)
 
+    objects = ProductQuerySet.as_manager()
+
     def __str__(self):
         return self.title
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._saved_unit_price = instance.__dict__.get("unit_price")
+        return instance
+
+    def save(self, *args, **kwargs):
+        # Tax rate changes reprice in bulk, so the rate is only looked up
+        # when this product's own price moved.
+        if self.unit_price != getattr(self, "_saved_unit_price", None):
+            self.price_with_tax = price_with_tax(
+                self.unit_price, TaxRate.current_rate()
+            )
+            update_fields = kwargs.get("update_fields")
+            if update_fields is not None and "unit_price" in update_fields:
+                kwargs["update_fields"] = {*update_fields, "price_with_tax"}
+        super().save(*args, **kwargs)
+        self._saved_unit_price = self.unit_price
+
+    class Meta:
+        # Back the keyset pagination orderings, (field, id) in either direction
+        indexes = [
+            models.Index(fields=["last_update", "id"]),
+            models.Index(fields=["unit_price", "id"]),
+            models.Index(fields=["title", "id"]),
+            models.Index(fields=["price_with_tax", "id"]),
+        ]
+
+
+def effective_price_expression(product=""):
+    """
+    The precomputed ProductPrice of a product (a lookup prefix such as
+    "items__product__" reaches it through relations), or its unit_price
+    until apps.store.pricing has computed one.
+    """
+    return Coalesce(
+        F(f"{product}effective__effective_price"),
+        F(f"{product}unit_price"),
+        output_field=models.DecimalField(max_digits=6, decimal_places=2),
+    )
+
+
+class ProductPrice(models.Model):
+    """
+    A product's unit_price after its best running promotion, kept up to
+    date by apps.store.pricing so reads never evaluate promotions.
+    """
+
+    product = models.OneToOneField(
+        Product, on_delete=models.CASCADE, primary_key=True, related_name="effective"
+    )
+    effective_price = models.DecimalField(max_digits=6, decimal_places=2)
+    promotion = models.ForeignKey(
+        Promotion, on_delete=models.SET_NULL, null=True, blank=True, related_name="+"
+    )
+    # When a promotion starts or ends and the price has to be recomputed
+    expires_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["effective_price"]),
+            models.Index(fields=["expires_at"]),
+        ]
+
 
 class ProductImage(models.Model):
     product = models.ForeignKey(
@@ -54,6 +247,10 @@ class ProductImage(models.Model):
     )
 
 
+# Output type of order totals computed in SQL
+ORDER_TOTAL_FIELD = models.DecimalField(max_digits=12, decimal_places=2)
+
+
 class Customer(models.Model):
     user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     phone_number = models.CharField(max_length=20)
@@ -86,6 +283,29 @@ class Customer(models.Model):
         ordering = ["user__first_name", "user__last_name"]
 
 
+class OrderQuerySet(models.QuerySet):
+    def update_totals(self):
+        """Recompute total_amount and item_count from the order items."""
+        items = OrderItem.objects.filter(order=OuterRef("pk")).values("order")
+        return self.update(
+            total_amount=Coalesce(
+                Subquery(
+                    items.annotate(
+                        total=Sum(
+                            F("quantity") * F("unit_price"),
+                            output_field=ORDER_TOTAL_FIELD,
+                        )
+                    ).values("total")
+                ),
+                Decimal(0),
+                output_field=ORDER_TOTAL_FIELD,
+            ),
+            item_count=Coalesce(
+                Subquery(items.annotate(count=Sum("quantity")).values("count")), 0
+            ),
+        )
+
+
 class Order(models.Model):
     PAYMENT_STATUS_PENDING = "P"
     PAYMENT_STATUS_COMPLETE = "C"
@@ -104,11 +324,23 @@ class Order(models.Model):
         on_delete=models.PROTECT,
         related_name="orders",
     )
+    # Denormalized from the items: set at checkout, recomputed when items
+    # change (see signals) and backfilled by backfill_order_totals
+    total_amount = models.DecimalField(
+        max_digits=12, decimal_places=2, default=0, editable=False
+    )
+    item_count = models.PositiveIntegerField(default=0, editable=False)
+
+    objects = OrderQuerySet.as_manager()
 
     class Meta:
         permissions = [
             ("cancel_order", "can cancel order"),
         ]
+        indexes = [
+            models.Index(fields=["total_amount", "id"]),
+            models.Index(fields=["customer", "Order_placed_at"]),
+        ]
 
 
 class OrderItem(models.Model):
@@ -132,16 +364,105 @@ class Address(models.Model):
     )
 
 
+# Output type of cart and line totals computed in SQL
+TOTAL_PRICE_FIELD = models.DecimalField(max_digits=14, decimal_places=2)
+
+
+class CartQuerySet(models.QuerySet):
+    def with_totals(self):
+        # Totals are aggregated in the cart query itself; the prefetched
+        # items carry their own line totals.
+        return self.annotate(
+            total_price=Coalesce(
+                Sum(
+                    F("items__quantity")
+                    * effective_price_expression("items__product__"),
+                    output_field=TOTAL_PRICE_FIELD,
+                ),
+                Decimal(0),
+                output_field=TOTAL_PRICE_FIELD,
+            ),
+            item_count=Coalesce(Sum("items__quantity"), 0),
+        ).prefetch_related(
+            Prefetch("items", queryset=CartItem.objects.with_total_price())
+        )
+
+
 class Cart(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid4)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = CartQuerySet.as_manager()
+
+
+# Upper bound of CartItem.quantity, a PositiveSmallIntegerField
+MAX_ITEM_QUANTITY = 32767
+
+
+class CartItemQuerySet(models.QuerySet):
+    def with_total_price(self):
+        return self.select_related("product").annotate(
+            total_price=models.ExpressionWrapper(
+                F("quantity") * effective_price_expression("product__"),
+                output_field=TOTAL_PRICE_FIELD,
+            )
+        )
+
+    def add_quantities(self, cart_id, quantities):
+        """
+        Add {product_id: quantity} to the cart in a single INSERT ... ON
+        CONFLICT DO UPDATE, so concurrent adds of the same product can't
+        lose increments. The insert joins the cart and product tables, so
+        missing ids insert nothing rather than failing the FK check. A sum
+        past MAX_ITEM_QUANTITY is capped instead of overflowing the column.
+        Returns the resulting items.
+        """
+        total = "{table}.quantity + excluded.quantity"
+        return self._upsert(
+            cart_id,
+            quantities,
+            f"CASE WHEN {total} > {MAX_ITEM_QUANTITY} THEN {MAX_ITEM_QUANTITY} "
+            f"ELSE {total} END",
+        )
+
+    def set_quantities(self, cart_id, quantities):
+        """Like add_quantities, but replaces the quantity of existing items."""
+        return self._upsert(cart_id, quantities, "excluded.quantity")
+
+    def _upsert(self, cart_id, quantities, new_quantity):
+        if not quantities:
+            return []
+        table = self.model._meta.db_table
+        rows = ", ".join(["(%s, %s)"] * len(quantities))
+        params = [value for pair in quantities.items() for value in pair]
+        params.append(
+            self.model._meta.get_field("cart").get_db_prep_value(cart_id, connection)
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {table} (cart_id, product_id, quantity) "
+                f"SELECT cart.id, product.id, v.column2 "
+                f"FROM (VALUES {rows}) AS v, "
+                f"{Cart._meta.db_table} cart, {Product._meta.db_table} product "
+                f"WHERE cart.id = %s AND product.id = v.column1 "
+                f"ON CONFLICT (cart_id, product_id) DO UPDATE "
+                f"SET quantity = {new_quantity.format(table=table)} "
+                f"RETURNING id, product_id, quantity",
+                params,
+            )
+            return [
+                self.model(id=pk, cart_id=cart_id, product_id=product_id, quantity=qty)
+                for pk, product_id, qty in cursor.fetchall()
+            ]
+
 
 class CartItem(models.Model):
     cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name="items")
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     quantity = models.PositiveSmallIntegerField(validators=[MinValueValidator(1)])
 
+    objects = CartItemQuerySet.as_manager()
+
     class Meta:
         unique_together = [["cart", "product"]]
 
@@ -153,3 +474,37 @@ class Review(models.Model):
     name = models.CharField(max_length=255)
     review_date = models.DateField(auto_now_add=True)
     description = models.TextField()
+
+
+class OutboxEvent(models.Model):
+    """
+    An event recorded in the transaction that caused it and delivered to
+    its listeners by the drain_outbox task once that transaction commits.
+    """
+
+    STATUS_PENDING = "P"
+    STATUS_DONE = "D"
+    STATUS_FAILED = "F"
+    STATUS_CHOICES = [
+        (STATUS_PENDING, "Pending"),
+        (STATUS_DONE, "Done"),
+        (STATUS_FAILED, "Failed"),
+    ]
+    topic = models.CharField(max_length=64)
+    payload = models.JSONField()
+    # Passed to listeners, which may see an event again after a retry
+    idempotency_key = models.CharField(max_length=255, unique=True)
+    status = models.CharField(
+        max_length=1, choices=STATUS_CHOICES, default=STATUS_PENDING
+    )
+    attempts = models.PositiveIntegerField(default=0)
+    available_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return self.idempotency_key
+
+    class Meta:
+        indexes = [models.Index(fields=["status", "available_at"])]
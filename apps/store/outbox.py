@@ -0,0 +1,95 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Order, OutboxEvent
+from .signals import order_created
+
+
+def publish(topic, payload, idempotency_key):
+    """
+    Record an event in the current transaction. It is delivered by the
+    drain_outbox task after the commit, so a rolled back transaction never
+    reaches the listeners and slow listeners don't hold up the caller.
+    """
+    from .tasks import drain_outbox
+
+    event = OutboxEvent.objects.create(
+        topic=topic, payload=payload, idempotency_key=idempotency_key
+    )
+    # Periodic draining picks the event up if the broker can't be reached.
+    transaction.on_commit(drain_outbox.delay, robust=True)
+    return event
+
+
+def send_order_created(event):
+    order = Order.objects.get(pk=event.payload["order_id"])
+    return order_created.send_robust(
+        OutboxEvent, order=order, idempotency_key=event.idempotency_key
+    )
+
+
+TOPICS = {
+    "order_created": send_order_created,
+}
+
+
+def retry_delay(attempts):
+    delay = settings.STORE_OUTBOX_RETRY_DELAY * 2 ** (attempts - 1)
+    return timedelta(seconds=min(delay, settings.STORE_OUTBOX_MAX_RETRY_DELAY))
+
+
+def deliver(event):
+    try:
+        # Its own transaction, outside the claim in drain(), so a listener's
+        # database error is rolled back alone and no locks wait on it.
+        with transaction.atomic():
+            errors = [
+                error
+                for _, error in TOPICS[event.topic](event)
+                if isinstance(error, Exception)
+            ]
+    except Exception as error:
+        errors = [error]
+
+    event.attempts += 1
+    if not errors:
+        event.status = OutboxEvent.STATUS_DONE
+        event.processed_at = timezone.now()
+    elif event.attempts >= settings.STORE_OUTBOX_MAX_ATTEMPTS:
+        event.status = OutboxEvent.STATUS_FAILED
+    else:
+        event.available_at = timezone.now() + retry_delay(event.attempts)
+    event.last_error = "\n".join(repr(error) for error in errors)
+    event.save(
+        update_fields=[
+            "status",
+            "attempts",
+            "available_at",
+            "last_error",
+            "processed_at",
+        ]
+    )
+
+
+def drain(batch_size=None):
+    """Deliver one batch of due events, returns how many were handled."""
+    batch_size = batch_size or settings.STORE_OUTBOX_BATCH_SIZE
+    with transaction.atomic():
+        # skip_locked lets several workers drain side by side. Claimed events
+        # are leased rather than locked for the deliveries; a worker that dies
+        # mid-batch leaves them due again once the lease runs out.
+        events = list(
+            OutboxEvent.objects.select_for_update(skip_locked=True)
+            .filter(status=OutboxEvent.STATUS_PENDING, available_at__lte=timezone.now())
+            .order_by("id")[:batch_size]
+        )
+        OutboxEvent.objects.filter(pk__in=[event.pk for event in events]).update(
+            available_at=timezone.now()
+            + timedelta(seconds=settings.STORE_OUTBOX_CLAIM_TIMEOUT)
+        )
+    for event in events:
+        deliver(event)
+    return len(events)
@@ -1,5 +1,107 @@
-from rest_framework.pagination import PageNumberPagination
+import json
+from base64 import b64decode, b64encode
+from collections import OrderedDict
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
 
 class ProductPagination(PageNumberPagination):
     page_size = 10
+
+
+class ProductCursorPagination(BasePagination):
+    """
+    Keyset pagination that seeks on (ordering field, id) instead of using
+    OFFSET, and never counts the filtered queryset.
+    """
+
+    page_size = 10
+    cursor_query_param = "cursor"
+    ordering_query_param = "ordering"
+    default_ordering = "-last_update"
+    ordering_fields = ["last_update", "unit_price", "price_with_tax", "title"]
+    invalid_cursor_message = "Invalid cursor"
+
+    def get_ordering(self, request):
+        ordering = request.query_params.get(self.ordering_query_param, "")
+        ordering = ordering.split(",")[0].strip()
+        if ordering.lstrip("-") in self.ordering_fields:
+            return ordering
+        return self.default_ordering
+
+    def decode_cursor(self, request, ordering, field):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            cursor = json.loads(b64decode(encoded.encode("ascii")))
+            value, pk, cursor_ordering = cursor["v"], int(cursor["id"]), cursor["o"]
+            # A crafted value would otherwise fail as the filter is built.
+            value = field.to_python(value)
+        except (TypeError, ValueError, KeyError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        if cursor_ordering != ordering:
+            raise NotFound(self.invalid_cursor_message)
+        return value, pk
+
+    def encode_cursor(self, value, pk, ordering):
+        cursor = {"v": str(value), "id": pk, "o": ordering}
+        return b64encode(json.dumps(cursor).encode("ascii")).decode("ascii")
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.ordering = self.get_ordering(request)
+        field = self.ordering.lstrip("-")
+        descending = self.ordering.startswith("-")
+
+        queryset = queryset.order_by(self.ordering, "-id" if descending else "id")
+        position = self.decode_cursor(
+            request, self.ordering, queryset.model._meta.get_field(field)
+        )
+        if position is not None:
+            value, pk = position
+            lookup = "lt" if descending else "gt"
+            queryset = queryset.filter(
+                Q(**{f"{field}__{lookup}": value})
+                | Q(**{field: value, f"id__{lookup}": pk})
+            )
+
+        # Fetch one extra row to find out whether there is a next page.
+        results = list(queryset[: self.page_size + 1])
+        self.has_next = len(results) > self.page_size
+        self.page = results[: self.page_size]
+        if self.has_next:
+            last = self.page[-1]
+            if isinstance(last, dict):
+                # .values() rows from the fast read path
+                value, pk = last[field], last["id"]
+            else:
+                value, pk = getattr(last, field), last.pk
+            self.next_cursor = self.encode_cursor(value, pk, self.ordering)
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        return Response(
+            OrderedDict([("next", self.get_next_link()), ("results", data)])
+        )
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
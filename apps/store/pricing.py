@@ -0,0 +1,178 @@
+from decimal import Decimal
+from itertools import islice
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .cache import invalidate_catalog, invalidate_products
+from .models import Product, ProductPrice, Promotion
+
+# Past this many repriced products one catalog bump is cheaper than
+# bumping every product and collection version.
+INVALIDATE_CATALOG_AFTER = 100
+
+CENT = Decimal("0.01")
+
+
+def discounted(unit_price, discount):
+    # Promotion.discount is a float percent; go through str so 12.5 stays 12.5
+    return (unit_price * (100 - Decimal(str(discount))) / 100).quantize(CENT)
+
+
+def best_price(unit_price, promotions, now):
+    """
+    The (effective price, promotion, expires_at) of a product covered by
+    promotions: the biggest running discount, valid until the next time
+    one of them starts or ends.
+    """
+    running = [promotion for promotion in promotions if promotion.is_running(now)]
+    best = max(running, key=lambda promotion: promotion.discount, default=None)
+    boundaries = [
+        moment
+        for promotion in promotions
+        for moment in (promotion.starts_at, promotion.ends_at)
+        if moment is not None and moment > now
+    ]
+    price = unit_price if best is None else discounted(unit_price, best.discount)
+    return price, best, min(boundaries, default=None)
+
+
+def promotions_by_product(products, now):
+    """{product id: promotions that cover it and haven't ended yet}"""
+    through_products = Promotion.products.through.objects.filter(
+        product_id__in=[product_id for product_id, _, _ in products]
+    ).values_list("product_id", "promotion_id")
+    through_collections = Promotion.collections.through.objects.filter(
+        collection_id__in={collection_id for _, _, collection_id in products}
+    ).values_list("collection_id", "promotion_id")
+    direct, by_collection = {}, {}
+    for product_id, promotion_id in through_products:
+        direct.setdefault(product_id, set()).add(promotion_id)
+    for collection_id, promotion_id in through_collections:
+        by_collection.setdefault(collection_id, set()).add(promotion_id)
+    promotions = Promotion.objects.filter(
+        Q(ends_at__isnull=True) | Q(ends_at__gt=now),
+        pk__in={
+            promotion_id
+            for promotion_ids in (*direct.values(), *by_collection.values())
+            for promotion_id in promotion_ids
+        },
+    ).in_bulk()
+    return {
+        product_id: [
+            promotions[promotion_id]
+            for promotion_id in direct.get(product_id, set())
+            | by_collection.get(collection_id, set())
+            if promotion_id in promotions
+        ]
+        for product_id, _, collection_id in products
+    }
+
+
+def refresh_batch(product_ids, now):
+    """Recompute the ProductPrice rows of product_ids, return the repriced ones."""
+    products = list(
+        Product.objects.filter(pk__in=product_ids).values_list(
+            "id", "unit_price", "collection_id"
+        )
+    )
+    promotions = promotions_by_product(products, now)
+    current = {
+        price.product_id: price
+        for price in ProductPrice.objects.filter(product_id__in=product_ids)
+    }
+    rows, repriced = [], []
+    for product_id, unit_price, collection_id in products:
+        price, promotion, expires_at = best_price(
+            unit_price, promotions[product_id], now
+        )
+        row = ProductPrice(
+            product_id=product_id,
+            effective_price=price,
+            promotion=promotion,
+            expires_at=expires_at,
+        )
+        old = current.get(product_id)
+        if old is not None and (
+            old.effective_price,
+            old.promotion_id,
+            old.expires_at,
+        ) == (price, row.promotion_id, expires_at):
+            continue
+        rows.append(row)
+        if old is None or old.effective_price != price:
+            repriced.append((product_id, collection_id))
+    # Only the rows that changed are written.
+    ProductPrice.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=["product"],
+        update_fields=["effective_price", "promotion", "expires_at"],
+    )
+    return repriced
+
+
+def refresh_prices(product_ids=None):
+    """
+    Bring the ProductPrice rows of product_ids (every product when None) in
+    line with unit_price and the promotions, STORE_PRICE_BATCH_SIZE products
+    per query round, and invalidate the cached products whose price moved
+    once the write commits. Returns how many were repriced.
+    """
+    if product_ids is None:
+        product_ids = Product.objects.values_list("id", flat=True).iterator()
+    now = timezone.now()
+    iterator = iter(product_ids)
+    repriced = []
+    while batch := list(islice(iterator, settings.STORE_PRICE_BATCH_SIZE)):
+        repriced += refresh_batch(batch, now)
+    if len(repriced) > INVALIDATE_CATALOG_AFTER:
+        invalidate_catalog()
+    elif repriced:
+        invalidate_products(
+            product_ids=[product_id for product_id, _ in repriced],
+            collection_ids=[collection_id for _, collection_id in repriced],
+        )
+    return len(repriced)
+
+
+def refresh_stale_prices():
+    """Reprice products whose promotion window passed, or never priced."""
+    return refresh_prices(
+        Product.objects.filter(
+            Q(effective__isnull=True) | Q(effective__expires_at__lte=timezone.now())
+        )
+        .values_list("id", flat=True)
+        .iterator()
+    )
+
+
+def schedule_refresh(product_ids):
+    """
+    Reprice a write's products: inline when they fit in one batch, so the
+    response already shows the new price, otherwise in Celery tasks once the
+    write has committed.
+    """
+    from .tasks import refresh_product_prices
+
+    product_ids = list(product_ids)
+    if len(product_ids) <= settings.STORE_PRICE_BATCH_SIZE:
+        refresh_prices(product_ids)
+        return
+    iterator = iter(product_ids)
+    while batch := list(islice(iterator, settings.STORE_PRICE_BATCH_SIZE)):
+        transaction.on_commit(lambda batch=batch: refresh_product_prices.delay(batch))
+
+
+def promotion_product_ids(promotion_ids):
+    """Ids of the products the promotions cover, directly or by collection."""
+    return (
+        Product.objects.filter(
+            Q(promotions__in=promotion_ids)
+            | Q(collection__promotions__in=promotion_ids)
+        )
+        .values_list("id", flat=True)
+        .distinct()
+    )
@@ -0,0 +1,150 @@
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import BooleanField, FloatField, Q
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+
+from .models import Product
+
+PRODUCT_TABLE = Product._meta.db_table
+SQLITE_FTS_TABLE = "store_product_fts"
+
+
+class IContainsSearchBackend:
+    """Unranked substring search, the behaviour of DRF's SearchFilter."""
+
+    def search(self, queryset, term):
+        for word in term.split():
+            queryset = queryset.filter(
+                Q(title__icontains=word) | Q(description__icontains=word)
+            )
+        return queryset
+
+    def index_products(self, product_ids):
+        pass
+
+    def remove_products(self, product_ids):
+        pass
+
+    def rebuild(self):
+        pass
+
+
+class PostgresSearchBackend(IContainsSearchBackend):
+    """
+    Ranked search over the generated store_product.search_vector column
+    (title weighted A, description weighted B) backed by a GIN index.
+    Postgres keeps the column up to date, so there is nothing to index.
+    """
+
+    index_name = "store_product_search_idx"
+
+    def search(self, queryset, term):
+        query = "websearch_to_tsquery('english', %s)"
+        return (
+            queryset.filter(
+                RawSQL(
+                    f"{PRODUCT_TABLE}.search_vector @@ {query}",
+                    [term],
+                    output_field=BooleanField(),
+                )
+            )
+            .annotate(
+                rank=RawSQL(
+                    f"ts_rank({PRODUCT_TABLE}.search_vector, {query})",
+                    [term],
+                    output_field=FloatField(),
+                )
+            )
+            .order_by("-rank", "-id")
+        )
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"REINDEX INDEX {self.index_name}")
+
+
+class SQLiteSearchBackend(IContainsSearchBackend):
+    """
+    Ranked search over an FTS5 shadow table keyed by product id, kept in
+    sync by the product signal handlers. Used in development and tests.
+    """
+
+    # bm25 column weights for (title, description)
+    weights = (10.0, 1.0)
+
+    def match_expression(self, term):
+        # Quote every token so user input can't inject FTS5 query syntax.
+        tokens = re.findall(r"\w+", term)
+        return " ".join('"{}"'.format(token) for token in tokens)
+
+    def search(self, queryset, term):
+        match = self.match_expression(term)
+        if not match:
+            return queryset.none()
+        weights = ", ".join(str(weight) for weight in self.weights)
+        return (
+            queryset.filter(
+                id__in=RawSQL(
+                    f"SELECT rowid FROM {SQLITE_FTS_TABLE} "
+                    f"WHERE {SQLITE_FTS_TABLE} MATCH %s",
+                    [match],
+                )
+            ).annotate(
+                rank=RawSQL(
+                    f"SELECT bm25({SQLITE_FTS_TABLE}, {weights}) "
+                    f"FROM {SQLITE_FTS_TABLE} WHERE {SQLITE_FTS_TABLE} MATCH %s "
+                    f"AND rowid = {PRODUCT_TABLE}.id",
+                    [match],
+                    output_field=FloatField(),
+                )
+            )
+            # bm25 scores are negative, lower is a better match
+            .order_by("rank", "-id")
+        )
+
+    def index_products(self, product_ids):
+        product_ids = list(product_ids)
+        self.remove_products(product_ids)
+        rows = Product.objects.filter(pk__in=product_ids).values_list(
+            "id", "title", "description"
+        )
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f"INSERT INTO {SQLITE_FTS_TABLE} (rowid, title, description) "
+                "VALUES (%s, %s, %s)",
+                list(rows),
+            )
+
+    def remove_products(self, product_ids):
+        product_ids = list(product_ids)
+        if not product_ids:
+            return
+        placeholders = ", ".join(["%s"] * len(product_ids))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {SQLITE_FTS_TABLE} WHERE rowid IN ({placeholders})",
+                product_ids,
+            )
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {SQLITE_FTS_TABLE}")
+            cursor.execute(
+                f"INSERT INTO {SQLITE_FTS_TABLE} (rowid, title, description) "
+                f"SELECT id, title, description FROM {PRODUCT_TABLE}"
+            )
+
+
+VENDOR_BACKENDS = {
+    "postgresql": PostgresSearchBackend,
+    "sqlite": SQLiteSearchBackend,
+}
+
+
+def get_search_backend():
+    if settings.STORE_SEARCH_BACKEND:
+        return import_string(settings.STORE_SEARCH_BACKEND)()
+    return VENDOR_BACKENDS.get(connection.vendor, IContainsSearchBackend)()
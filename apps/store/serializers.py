@@ -1,9 +1,12 @@
-from decimal import Decimal
-
 from django.db import transaction
 from rest_framework import serializers
+from rest_framework.exceptions import NotFound
 
+from . import outbox
+from .cache import invalidate_products
+from .carts import get_cart_store
 from .models import (
+    MAX_ITEM_QUANTITY,
     Cart,
     CartItem,
     Collection,
@@ -12,9 +15,9 @@ from .models import (
     OrderItem,
     Product,
     ProductImage,
+    ProductPrice,
     Review,
 )
-from .signals import order_created
 
 
 class SimpleProductSerializer(serializers.ModelSerializer):
@@ -32,24 +35,21 @@ class UpdateCartItemSerializer(serializers.ModelSerializer):
 class AddCartItemSerializer(serializers.ModelSerializer):
     product_id = serializers.IntegerField()
 
-    def validate_product_id(self, value):
-        if not Product.objects.filter(pk=value).exists():
-            raise serializers.ValidationError("Product doesn't exists with that id")
-        return value
-
     def save(self, **kwargs):
         cart_id = self.context["cart_id"]
         product_id = self.validated_data["product_id"]
         quantity = self.validated_data["quantity"]
-        try:
-            cart_item = CartItem.objects.get(cart_id=cart_id, product_id=product_id)
-            cart_item.quantity += quantity
-            cart_item.save()
-            self.instance = cart_item
-        except CartItem.DoesNotExist:
-            self.instance = CartItem.objects.create(
-                cart_id=cart_id, **self.validated_data
+        store = get_cart_store()
+        # The upsert only inserts for an existing cart and product, so the
+        # lookups below run only when it didn't.
+        items = store.add_quantities(cart_id, {product_id: quantity})
+        if not items:
+            if not store.cart_exists(cart_id):
+                raise NotFound("Cart doesn't exist with that id")
+            raise serializers.ValidationError(
+                {"product_id": ["Product doesn't exists with that id"]}
             )
+        self.instance = items[0]
         return self.instance
 
     class Meta:
@@ -57,12 +57,81 @@ class AddCartItemSerializer(serializers.ModelSerializer):
         fields = ["id", "product_id", "quantity"]
 
 
+class BulkCartItemSerializer(serializers.ListSerializer):
+    def validate(self, operations):
+        product_ids = {operation["product_id"] for operation in operations}
+        existing = set(
+            Product.objects.filter(pk__in=product_ids).values_list("id", flat=True)
+        )
+        missing = sorted(product_ids - existing)
+        if missing:
+            raise serializers.ValidationError(
+                f"Products don't exist with these ids: {missing}"
+            )
+        self.changes = fold_operations(operations)
+        adds, sets, _ = self.changes
+        too_many = sorted(
+            product_id
+            for product_id, quantity in (*adds.items(), *sets.items())
+            if quantity > MAX_ITEM_QUANTITY
+        )
+        if too_many:
+            raise serializers.ValidationError(
+                f"Quantities above {MAX_ITEM_QUANTITY} for products: {too_many}"
+            )
+        return operations
+
+    def save(self, **kwargs):
+        get_cart_store().apply(self.context["cart_id"], *self.changes)
+
+
+def fold_operations(operations):
+    """Fold the operations per product, in order, into (adds, sets, removes)."""
+    adds, sets, removes = {}, {}, set()
+    for operation in operations:
+        product_id = operation["product_id"]
+        quantity = operation.get("quantity")
+        if operation["op"] == "remove":
+            adds.pop(product_id, None)
+            sets.pop(product_id, None)
+            removes.add(product_id)
+        elif operation["op"] == "set" or product_id in removes:
+            adds.pop(product_id, None)
+            removes.discard(product_id)
+            sets[product_id] = quantity
+        elif product_id in sets:
+            sets[product_id] += quantity
+        else:
+            adds[product_id] = adds.get(product_id, 0) + quantity
+    return adds, sets, removes
+
+
+class CartItemOperationSerializer(serializers.Serializer):
+    OPERATION_CHOICES = ["add", "set", "remove"]
+
+    op = serializers.ChoiceField(choices=OPERATION_CHOICES, default="add")
+    product_id = serializers.IntegerField()
+    quantity = serializers.IntegerField(
+        min_value=1, max_value=MAX_ITEM_QUANTITY, required=False
+    )
+
+    def validate(self, data):
+        if data["op"] != "remove" and "quantity" not in data:
+            raise serializers.ValidationError(
+                {"quantity": [f"This field is required to {data['op']} an item."]}
+            )
+        return data
+
+    class Meta:
+        list_serializer_class = BulkCartItemSerializer
+
+
 class CartItemSerializer(serializers.ModelSerializer):
     product = SimpleProductSerializer()
-    total_price = serializers.SerializerMethodField()
-
-    def get_total_price(self, cart_item: CartItem):
-        return cart_item.quantity * cart_item.product.unit_price
+    # annotated by CartItem.objects.with_total_price()
+    total_price = serializers.DecimalField(
+        max_digits=14, decimal_places=2, read_only=True
+    )
 
     class Meta:
         model = CartItem
@@ -72,14 +141,15 @@ class CartItemSerializer(serializers.ModelSerializer):
 class CartSerializer(serializers.ModelSerializer):
     id = serializers.UUIDField(read_only=True)
     items = CartItemSerializer(many=True, read_only=True)
-    total_price = serializers.SerializerMethodField()
-
-    def get_total_price(self, cart: Cart):
-        return sum([item.quantity * item.product.price for item in cart.items.all()])
+    # annotated by Cart.objects.with_totals()
+    item_count = serializers.IntegerField(read_only=True)
+    total_price = serializers.DecimalField(
+        max_digits=14, decimal_places=2, read_only=True
+    )
 
     class Meta:
         model = Cart
-        fields = ["id", "items", "total_price"]
+        fields = ["id", "items", "item_count", "total_price"]
 
 
 class CollectionSerializer(serializers.ModelSerializer):
@@ -87,7 +157,7 @@ class CollectionSerializer(serializers.ModelSerializer):
         model = Collection
         fields = ["id", "title", "product_count", "featured_product"]
 
-    product_count = serializers.IntegerField(read_only=True)
+    product_count = serializers.IntegerField(source="products_count", read_only=True)
     featured_product = serializers.PrimaryKeyRelatedField(read_only=True)
 
 
@@ -104,6 +174,7 @@ class ProductImageSerializer(serializers.ModelSerializer):
 # it is better to use ModelSerializer class for Models
 class ProductSerializer(serializers.ModelSerializer):
     images = ProductImageSerializer(many=True, read_only=True)
+    effective_price = serializers.SerializerMethodField()
 
     class Meta:
         model = Product
@@ -115,14 +186,23 @@ class ProductSerializer(serializers.ModelSerializer):
             "inventory",
             "unit_price",
             "price_with_tax",
+            "effective_price",
             "collection",
             "images",
         ]
+        read_only_fields = ["price_with_tax"]
 
-    price_with_tax = serializers.SerializerMethodField(method_name="calculate_tax")
-
-    def calculate_tax(self, product: Product):
-        return product.unit_price * Decimal(1.18)
+    def get_effective_price(self, product):
+        # Annotated by Product.objects.with_effective_price(); a product
+        # that was just written is looked up instead.
+        if hasattr(product, "effective_price"):
+            return product.effective_price
+        price = (
+            ProductPrice.objects.filter(product_id=product.pk)
+            .values_list("effective_price", flat=True)
+            .first()
+        )
+        return product.unit_price if price is None else price
 
 
 class ReviewSerializer(serializers.ModelSerializer):
@@ -156,7 +236,15 @@ class OrderSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Order
-        fields = ["id", "customer", "Order_placed_at", "payment_status", "items"]
+        fields = [
+            "id",
+            "customer",
+            "Order_placed_at",
+            "payment_status",
+            "total_amount",
+            "item_count",
+            "items",
+        ]
 
 
 class UpdateOrderSerializer(serializers.ModelSerializer):
@@ -168,35 +256,74 @@ class UpdateOrderSerializer(serializers.ModelSerializer):
 class CreateOrderSerializer(serializers.Serializer):
     cart_id = serializers.UUIDField()
 
-    def validate_cart_id(self, cart_id):
-        if not Cart.objects.filter(pk=cart_id).exists():
-            raise serializers.ValidationError("Cart with this id, doesn't exist")
-        if CartItem.objects.filter(cart_id=cart_id).count() == 0:
-            raise serializers.ValidationError("Cart is empty")
-        return cart_id
+    def check_quantities(self, quantities):
+        if quantities is None:
+            raise serializers.ValidationError(
+                {"cart_id": ["Cart with this id, doesn't exist"]}
+            )
+        if not quantities:
+            raise serializers.ValidationError({"cart_id": ["Cart is empty"]})
 
     def save(self, **kwargs):
-        with transaction.atomic():
-            customer = Customer.objects.get(user_id=self.context["user_id"])
-            order = Order.objects.create(customer=customer)
-            cart_id = self.validated_data["cart_id"]
-            cart_items = CartItem.objects.select_related("product").filter(
-                cart_id=cart_id
+        cart_id = self.validated_data["cart_id"]
+        # The cart is taken before the order is written and is gone once it
+        # commits, so checking out the same cart twice orders it once.
+        with get_cart_store().checkout(cart_id) as quantities, transaction.atomic():
+            self.check_quantities(quantities)
+            customer_id = self.context.get("customer_id")
+            if customer_id is None:
+                customer_id = (
+                    Customer.objects.only("id").get(user_id=self.context["user_id"]).id
+                )
+            # Lock the products in id order so concurrent checkouts sharing
+            # products queue up instead of deadlocking, then check stock
+            # against the locked rows so nothing is oversold.
+            products = list(
+                Product.objects.select_for_update(of=("self",))
+                .with_effective_price()
+                .filter(pk__in=quantities)
+                .order_by("id")
+                .only("id", "unit_price", "inventory", "collection_id")
+            )
+            out_of_stock = sorted(
+                set(quantities) - {product.id for product in products}
+                | {
+                    product.id
+                    for product in products
+                    if product.inventory < quantities[product.id]
+                }
+            )
+            if out_of_stock:
+                raise serializers.ValidationError(
+                    {"cart_id": [f"Not enough stock for products: {out_of_stock}"]}
+                )
+            Product.objects.decrement_inventory(quantities)
+
+            order = Order.objects.create(
+                customer_id=customer_id,
+                total_amount=sum(
+                    product.effective_price * quantities[product.id]
+                    for product in products
+                ),
+                item_count=sum(quantities.values()),
             )
-            # List comprehension
-            # [expression for item in collection]
-            order_items = [
+            OrderItem.objects.bulk_create(
                 OrderItem(
                     order=order,
-                    product=item.product,
-                    quantity=item.quantity,
-                    unit_price=item.product.unit_price,
+                    product=product,
+                    quantity=quantities[product.id],
+                    unit_price=product.effective_price,
                 )
-                for item in cart_items
-            ]
-            # create order_items in bulk
-            OrderItem.objects.bulk_create(order_items)
-            # after the cart items is added to order, cart should be deleted
-            Cart.objects.filter(pk=cart_id).delete()
-            order_created.send_robust(self.__class__, order=order)
-            return order
+                for product in products
+            )
+            outbox.publish(
+                "order_created",
+                {"order_id": order.id},
+                idempotency_key=f"order_created:{order.id}",
+            )
+        # update() skips post_save, so the product cache is invalidated here
+        invalidate_products(
+            product_ids=quantities,
+            collection_ids=[product.collection_id for product in products],
+        )
+        return order
@@ -1,11 +1,178 @@
 from django.conf import settings
-from django.db.models.signals import post_save
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save,
+)
 from django.dispatch import receiver
 
-from apps.store.models import Customer
+from apps.store.cache import (
+    invalidate_catalog,
+    invalidate_collections,
+    invalidate_products,
+    invalidate_reviews,
+)
+from apps.store.models import (
+    Collection,
+    Customer,
+    Order,
+    OrderItem,
+    Product,
+    ProductImage,
+    Promotion,
+    Review,
+    TaxRate,
+)
+from apps.store.pricing import promotion_product_ids, schedule_refresh
+from apps.store.search import get_search_backend
 
 
 @receiver(post_save, sender=settings.AUTH_USER_MODEL)
 def create_customer_for_new_user(sender, **kwargs):
     if kwargs["created"]:
         Customer.objects.create(user=kwargs["instance"])
+
+
+@receiver(pre_save, sender=Product)
+def remember_previous_collection(sender, instance, **kwargs):
+    # A product moving between collections has to invalidate both of them.
+    instance._previous_collection_id = None
+    if instance.pk:
+        instance._previous_collection_id = (
+            Product.objects.filter(pk=instance.pk)
+            .values_list("collection_id", flat=True)
+            .first()
+        )
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_product_cache(sender, instance, **kwargs):
+    invalidate_products(
+        product_ids=[instance.pk],
+        collection_ids=[
+            instance.collection_id,
+            getattr(instance, "_previous_collection_id", None),
+        ],
+    )
+
+
+@receiver(post_save, sender=Product)
+def index_product(sender, instance, **kwargs):
+    get_search_backend().index_products([instance.pk])
+
+
+@receiver(post_save, sender=Product)
+def price_product(sender, instance, **kwargs):
+    # unit_price or the collection, and so the promotions, may have changed
+    schedule_refresh([instance.pk])
+
+
+@receiver(post_delete, sender=Product)
+def unindex_product(sender, instance, **kwargs):
+    get_search_backend().remove_products([instance.pk])
+
+
+@receiver(post_save, sender=Product)
+def count_saved_product(sender, instance, created, **kwargs):
+    previous = getattr(instance, "_previous_collection_id", None)
+    if created:
+        Collection.objects.adjust_products_count({instance.collection_id: 1})
+        invalidate_collections()
+    elif previous != instance.collection_id:
+        Collection.objects.adjust_products_count(
+            {previous: -1, instance.collection_id: 1}
+        )
+        invalidate_collections()
+
+
+@receiver(post_delete, sender=Product)
+def count_deleted_product(sender, instance, **kwargs):
+    Collection.objects.adjust_products_count({instance.collection_id: -1})
+    invalidate_collections()
+
+
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+def invalidate_product_image_cache(sender, instance, **kwargs):
+    collection_id = (
+        Product.objects.filter(pk=instance.product_id)
+        .values_list("collection_id", flat=True)
+        .first()
+    )
+    invalidate_products(
+        product_ids=[instance.product_id], collection_ids=[collection_id]
+    )
+
+
+@receiver(post_save, sender=Collection)
+@receiver(post_delete, sender=Collection)
+def invalidate_collection_cache(sender, instance, **kwargs):
+    invalidate_products(collection_ids=[instance.pk])
+    invalidate_collections()
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def invalidate_review_cache(sender, instance, **kwargs):
+    invalidate_reviews(instance.product_id)
+
+
+@receiver(post_save, sender=Promotion)
+def price_promoted_products(sender, instance, **kwargs):
+    schedule_refresh(promotion_product_ids([instance.pk]))
+
+
+@receiver(pre_delete, sender=Promotion)
+def remember_promoted_products(sender, instance, **kwargs):
+    # The m2m rows are gone by post_delete.
+    instance._product_ids = list(promotion_product_ids([instance.pk]))
+
+
+@receiver(post_delete, sender=Promotion)
+def price_unpromoted_products(sender, instance, **kwargs):
+    schedule_refresh(getattr(instance, "_product_ids", []))
+
+
+def promoted_product_ids(sender, instance, pk_set):
+    # The signal fires on whichever side of the m2m was edited.
+    if isinstance(instance, Product):
+        return [instance.pk]
+    if isinstance(instance, Collection):
+        return Product.objects.filter(collection=instance).values_list("id", flat=True)
+    if pk_set is None:
+        return promotion_product_ids([instance.pk])
+    if sender is Promotion.products.through:
+        return pk_set
+    return Product.objects.filter(collection_id__in=pk_set).values_list("id", flat=True)
+
+
+@receiver(m2m_changed, sender=Promotion.products.through)
+@receiver(m2m_changed, sender=Promotion.collections.through)
+def price_repromoted_products(sender, instance, action, pk_set, **kwargs):
+    if action == "pre_clear":
+        # clear() doesn't say what it removed, so look before it runs.
+        instance._cleared_product_ids = list(
+            promoted_product_ids(sender, instance, None)
+        )
+    elif action == "post_clear":
+        schedule_refresh(instance._cleared_product_ids)
+    elif action in ("post_add", "post_remove"):
+        schedule_refresh(promoted_product_ids(sender, instance, pk_set))
+
+
+@receiver(post_save, sender=TaxRate)
+@receiver(post_delete, sender=TaxRate)
+def reprice_products(sender, instance, **kwargs):
+    Product.objects.update_price_with_tax()
+    invalidate_catalog()
+
+
+@receiver(post_save, sender=OrderItem)
+@receiver(post_delete, sender=OrderItem)
+def update_order_totals(sender, instance, **kwargs):
+    # Checkout sets the totals itself; this covers edits such as the admin
+    # OrderItemInline.
+    Order.objects.filter(pk=instance.order_id).update_totals()
@@ -0,0 +1,69 @@
+import io
+import tempfile
+
+from celery import shared_task
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.mail import send_mail
+from django.utils import timezone
+
+from . import exporters, importers, jobs, outbox, pricing
+
+
+@shared_task
+def drain_outbox():
+    if outbox.drain() == settings.STORE_OUTBOX_BATCH_SIZE:
+        # A full batch means more events may be waiting.
+        drain_outbox.delay()
+
+
+@shared_task
+def import_products(name, format, chunk_size=5_000):
+    """Import a feed uploaded to default_storage, then delete it."""
+    with default_storage.open(name, "rb") as raw:
+        file = io.TextIOWrapper(raw, encoding="utf-8", newline="")
+        report = importers.import_products(file, format, chunk_size=chunk_size)
+    default_storage.delete(name)
+    return report.as_dict()
+
+
+@shared_task
+def export_to_storage(name, format, user_id):
+    """Write an export to default_storage and email its link to user_id."""
+    export = exporters.EXPORTS[name]
+    stamp = timezone.now().strftime("%Y%m%d-%H%M%S")
+    with tempfile.TemporaryFile() as file:
+        exporters.write_export(export, format, file)
+        file.seek(0)
+        path = default_storage.save(f"exports/{name}-{stamp}.{format}", File(file))
+    user = get_user_model().objects.get(pk=user_id)
+    if user.email:
+        send_mail(
+            f"Your {name} export is ready",
+            f"Download it from {default_storage.url(path)}",
+            None,
+            [user.email],
+        )
+    return path
+
+
+@shared_task
+def run_job(job_id):
+    jobs.run(job_id)
+
+
+@shared_task
+def run_job_batch(job_id, name, ids):
+    jobs.run_batch(job_id, name, ids)
+
+
+@shared_task
+def refresh_product_prices(product_ids):
+    return pricing.refresh_prices(product_ids)
+
+
+@shared_task
+def refresh_stale_prices():
+    return pricing.refresh_stale_prices()
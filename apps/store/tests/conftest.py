@@ -1,8 +1,39 @@
+from contextlib import contextmanager
+
 import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from rest_framework.test import APIClient
 
+from apps.store.cache import local_collections
+
 
 @pytest.fixture
 def api_client():
     return APIClient()
-  
\ No newline at end of file
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    # Invalidations wait for a commit, which a rolled-back test never makes,
+    # so rows reusing an earlier test's ids would hit its cached responses.
+    cache.clear()
+    local_collections.clear()
+
+
+@pytest.fixture
+def query_budget():
+    """
+    with query_budget(n): ... fails if the block runs more than n queries,
+    listing the ones it ran.
+    """
+
+    @contextmanager
+    def budget(limit):
+        with CaptureQueriesContext(connection) as queries:
+            yield queries
+        sql = "\n".join(query["sql"] for query in queries.captured_queries)
+        assert len(queries) <= limit, f"{len(queries)} queries > {limit}:\n{sql}"
+
+    return budget
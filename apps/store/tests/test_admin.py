@@ -0,0 +1,175 @@
+from datetime import timedelta
+
+import pytest
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from model_bakery import baker
+
+from apps.store import jobs, tasks
+from apps.store.models import Collection, Customer, Order, Product
+
+User = get_user_model()
+
+
+def make_customers(size):
+    for user in baker.make(User, _quantity=size):
+        baker.make(Order, customer=user.customer, _quantity=2)
+
+
+def make_orders(size):
+    for user in baker.make(User, _quantity=size):
+        baker.make(Order, customer=user.customer)
+
+
+def make_products(size):
+    for _ in range(size):
+        collection = baker.make(Collection)
+        collection.featured_product = baker.make(
+            Product, collection=collection, unit_price=10
+        )
+        collection.save()
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "model, setup",
+    [(Customer, make_customers), (Order, make_orders), (Product, make_products)],
+    ids=["customer", "order", "product"],
+)
+def test_changelist_query_count_is_constant(admin_client, monkeypatch, model, setup):
+    url = f"/admin/store/{model._meta.model_name}/"
+    counts = []
+    for size in [5, 50]:
+        setup(size)
+        monkeypatch.setattr(admin.site._registry[model], "list_per_page", size * 2)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = admin_client.get(url)
+
+        assert response.status_code == 200
+        counts.append(len(queries))
+
+    assert counts[0] == counts[1]
+
+
+@pytest.mark.django_db
+class TestChangelistAnnotations:
+    def test_if_customers_are_sorted_by_orders_count_counts_are_shown(
+        self, admin_client
+    ):
+        user = baker.make(User, first_name="Busy")
+        baker.make(Order, customer=user.customer, _quantity=3)
+
+        response = admin_client.get("/admin/store/customer/?o=4")
+
+        customers = list(response.context["cl"].result_list)
+        assert customers[0].orders_count == 0
+        assert customers[-1].orders_count == 3
+
+    def test_if_orders_are_listed_customer_name_is_annotated(self, admin_client):
+        user = baker.make(User, first_name="Ada", last_name="Lovelace")
+        baker.make(Order, customer=user.customer)
+
+        response = admin_client.get("/admin/store/order/")
+
+        assert response.context["cl"].result_list[0].customer_name == "Ada Lovelace"
+
+
+@pytest.fixture
+def eager_jobs(monkeypatch, settings):
+    settings.STORE_JOB_BATCH_SIZE = 2
+    monkeypatch.setattr(tasks.run_job, "delay", tasks.run_job)
+    monkeypatch.setattr(tasks.run_job_batch, "delay", tasks.run_job_batch)
+
+
+def clear_inventory(admin_client, products):
+    """Run the clear_inventory action and return the job's progress."""
+    response = admin_client.post(
+        "/admin/store/product/",
+        {
+            "action": "clear_inventory",
+            "_selected_action": [product.id for product in products],
+        },
+        follow=True,
+    )
+    message = str(list(response.context["messages"])[0])
+    job_url = message.split('href="')[1].split('"')[0]
+    return admin_client.get(job_url).context["job"]
+
+
+@pytest.mark.django_db
+class TestBackgroundActions:
+    def test_if_inventory_is_cleared_it_runs_in_batches(self, admin_client, eager_jobs):
+        products = baker.make(Product, unit_price=10, inventory=5, _quantity=5)
+
+        progress = clear_inventory(admin_client, products)
+
+        assert set(Product.objects.values_list("inventory", flat=True)) == {0}
+        assert (progress["done"], progress["total"]) == (5, 5)
+        assert progress["finished"]
+
+    def test_if_a_batch_fails_job_still_finishes(
+        self, admin_client, eager_jobs, monkeypatch
+    ):
+        products = baker.make(Product, unit_price=10, inventory=5, _quantity=5)
+        failing = products[0].id
+
+        def clear_or_fail(ids):
+            if failing in ids:
+                raise ValueError("boom")
+            Product.objects.filter(pk__in=ids).update(inventory=0)
+
+        monkeypatch.setitem(jobs.JOBS, "clear_inventory", clear_or_fail)
+
+        progress = clear_inventory(admin_client, products)
+
+        assert Product.objects.get(pk=failing).inventory == 5
+        assert (progress["done"], progress["failed"]) == (3, 2)
+        assert progress["error"] == "boom"
+        assert progress["finished"]
+
+    def test_if_prices_are_edited_in_list_they_are_saved_in_bulk(self, admin_client):
+        products = baker.make(Product, unit_price=10, _quantity=3)
+        # The changelist lists the newest product first
+        rows = sorted(products, key=lambda product: -product.id)
+        data = {
+            "form-TOTAL_FORMS": len(rows),
+            "form-INITIAL_FORMS": len(rows),
+            "_save": "Save",
+        }
+        for index, product in enumerate(rows):
+            data[f"form-{index}-id"] = product.id
+            data[f"form-{index}-unit_price"] = 20
+
+        with CaptureQueriesContext(connection) as queries:
+            admin_client.post("/admin/store/product/", data)
+
+        updates = [
+            query
+            for query in queries
+            if query["sql"].startswith('UPDATE "store_product"')
+        ]
+        assert len(updates) == 2
+        assert set(Product.objects.values_list("unit_price", flat=True)) == {20}
+        assert Product.objects.first().price_with_tax > 20
+
+    def test_if_prices_are_edited_in_list_last_update_is_stamped(self, admin_client):
+        product = baker.make(Product, unit_price=10)
+        Product.objects.update(last_update=timezone.now() - timedelta(days=1))
+        before = Product.objects.get().last_update
+
+        admin_client.post(
+            "/admin/store/product/",
+            {
+                "form-TOTAL_FORMS": 1,
+                "form-INITIAL_FORMS": 1,
+                "_save": "Save",
+                "form-0-id": product.id,
+                "form-0-unit_price": 20,
+            },
+        )
+
+        assert Product.objects.get().last_update > before
@@ -0,0 +1,328 @@
+from decimal import Decimal
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from model_bakery import baker
+from rest_framework import status
+
+from apps.store.carts import get_cart_store, parse_cart_id
+from apps.store.models import MAX_ITEM_QUANTITY, Cart, CartItem, Order, Product
+
+User = get_user_model()
+
+
+@pytest.mark.django_db
+class TestAddCartItem:
+    def test_if_product_is_added_twice_quantities_are_summed(self, api_client):
+        cart = baker.make(Cart)
+        product = baker.make(Product, unit_price=10)
+        url = f"/api/v1/store/carts/{cart.id}/items/"
+
+        api_client.post(url, {"product_id": product.id, "quantity": 2})
+        response = api_client.post(url, {"product_id": product.id, "quantity": 3})
+
+        assert response.status_code == status.HTTP_201_CREATED
+        assert response.data["quantity"] == 5
+        assert CartItem.objects.get(cart=cart, product=product).quantity == 5
+
+    def test_if_product_is_added_it_takes_one_query(self, api_client):
+        cart = baker.make(Cart)
+        product = baker.make(Product, unit_price=10)
+
+        with CaptureQueriesContext(connection) as queries:
+            api_client.post(
+                f"/api/v1/store/carts/{cart.id}/items/",
+                {"product_id": product.id, "quantity": 1},
+            )
+
+        assert len(queries) == 1
+
+    def test_if_added_quantity_overflows_it_is_capped(self, api_client):
+        item = baker.make(CartItem, product__unit_price=10, quantity=MAX_ITEM_QUANTITY)
+
+        response = api_client.post(
+            f"/api/v1/store/carts/{item.cart_id}/items/",
+            {"product_id": item.product_id, "quantity": 1},
+        )
+
+        assert response.status_code == status.HTTP_201_CREATED
+        assert response.data["quantity"] == MAX_ITEM_QUANTITY
+
+    def test_if_product_does_not_exist_returns_400(self, api_client):
+        cart = baker.make(Cart)
+
+        response = api_client.post(
+            f"/api/v1/store/carts/{cart.id}/items/", {"product_id": 0, "quantity": 1}
+        )
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.data["product_id"] is not None
+
+    def test_if_cart_does_not_exist_returns_404(self, api_client):
+        product = baker.make(Product, unit_price=10)
+
+        response = api_client.post(
+            "/api/v1/store/carts/00000000-0000-0000-0000-000000000000/items/",
+            {"product_id": product.id, "quantity": 1},
+        )
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.mark.django_db
+class TestBulkCartItems:
+    def test_if_operations_are_valid_they_are_applied_in_order(self, api_client):
+        cart = baker.make(Cart)
+        kept, replaced, removed, added = baker.make(Product, unit_price=10, _quantity=4)
+        baker.make(CartItem, cart=cart, product=kept, quantity=1)
+        baker.make(CartItem, cart=cart, product=replaced, quantity=1)
+        baker.make(CartItem, cart=cart, product=removed, quantity=1)
+
+        response = api_client.post(
+            f"/api/v1/store/carts/{cart.id}/items/bulk/",
+            [
+                {"op": "add", "product_id": kept.id, "quantity": 2},
+                {"op": "set", "product_id": replaced.id, "quantity": 5},
+                {"op": "remove", "product_id": removed.id},
+                {"product_id": added.id, "quantity": 1},
+                {"product_id": added.id, "quantity": 1},
+            ],
+            format="json",
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        quantities = {
+            item["product"]["id"]: item["quantity"] for item in response.data["items"]
+        }
+        assert quantities == {kept.id: 3, replaced.id: 5, added.id: 2}
+
+    def test_if_product_does_not_exist_nothing_is_applied(self, api_client):
+        cart = baker.make(Cart)
+        product = baker.make(Product, unit_price=10)
+
+        response = api_client.post(
+            f"/api/v1/store/carts/{cart.id}/items/bulk/",
+            [
+                {"product_id": product.id, "quantity": 1},
+                {"product_id": 0, "quantity": 1},
+            ],
+            format="json",
+        )
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert not CartItem.objects.filter(cart=cart).exists()
+
+    def test_if_folded_quantity_is_too_large_returns_400(self, api_client):
+        cart = baker.make(Cart)
+        product = baker.make(Product, unit_price=10)
+
+        response = api_client.post(
+            f"/api/v1/store/carts/{cart.id}/items/bulk/",
+            [{"product_id": product.id, "quantity": 20000}] * 2,
+            format="json",
+        )
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert not CartItem.objects.filter(cart=cart).exists()
+
+    def test_if_many_products_are_restored_query_count_is_constant(self, api_client):
+        cart = baker.make(Cart)
+        products = baker.make(Product, unit_price=10, _quantity=30)
+
+        with CaptureQueriesContext(connection) as queries:
+            api_client.post(
+                f"/api/v1/store/carts/{cart.id}/items/bulk/",
+                [{"product_id": product.id, "quantity": 1} for product in products],
+                format="json",
+            )
+
+        assert len(queries) <= 10
+
+
+@pytest.mark.django_db
+class TestCartTotals:
+    def test_if_cart_has_items_totals_are_computed(self, api_client):
+        cart = baker.make(Cart)
+        baker.make(CartItem, cart=cart, product__unit_price=10, quantity=2)
+        baker.make(CartItem, cart=cart, product__unit_price=Decimal("2.50"), quantity=3)
+
+        response = api_client.get(f"/api/v1/store/carts/{cart.id}/")
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["item_count"] == 5
+        assert response.data["total_price"] == Decimal("27.50")
+        assert sorted(item["total_price"] for item in response.data["items"]) == [
+            Decimal("7.50"),
+            Decimal("20.00"),
+        ]
+
+    def test_if_cart_is_created_totals_are_zero(self, api_client):
+        response = api_client.post("/api/v1/store/carts/")
+
+        assert response.status_code == status.HTTP_201_CREATED
+        assert response.data["item_count"] == 0
+        assert response.data["total_price"] == 0
+
+    def test_if_cart_items_are_listed_line_totals_are_included(self, api_client):
+        item = baker.make(CartItem, product__unit_price=10, quantity=2)
+
+        response = api_client.get(f"/api/v1/store/carts/{item.cart_id}/items/")
+
+        assert response.data[0]["total_price"] == Decimal("20.00")
+
+    @pytest.mark.parametrize("lines", [1, 50, 500])
+    def test_if_cart_is_retrieved_query_count_is_constant(self, api_client, lines):
+        cart = baker.make(Cart)
+        baker.make(CartItem, cart=cart, product__unit_price=10, _quantity=lines)
+
+        with CaptureQueriesContext(connection) as queries:
+            api_client.get(f"/api/v1/store/carts/{cart.id}/")
+
+        assert len(queries) == 2
+
+    @pytest.mark.benchmark(group="cart-retrieve")
+    @pytest.mark.parametrize("lines", [1, 50, 500])
+    def test_benchmark_cart_retrieve(self, benchmark, api_client, lines):
+        cart = baker.make(Cart)
+        baker.make(CartItem, cart=cart, product__unit_price=10, _quantity=lines)
+
+        benchmark(api_client.get, f"/api/v1/store/carts/{cart.id}/")
+
+
+@pytest.fixture
+def redis_carts(settings):
+    store = pytest.importorskip("django_redis").get_redis_connection("default")
+    try:
+        store.ping()
+    except Exception:
+        pytest.skip("Redis is not available")
+    settings.STORE_CART_BACKEND = "apps.store.carts.RedisCartStore"
+
+
+def database_writes(queries):
+    return [
+        query["sql"]
+        for query in queries.captured_queries
+        if query["sql"].split(None, 1)[0].upper() in {"INSERT", "UPDATE", "DELETE"}
+    ]
+
+
+def run_cart_session(api_client, products):
+    cart_id = api_client.post("/api/v1/store/carts/").data["id"]
+    url = f"/api/v1/store/carts/{cart_id}/items/"
+    for product in products:
+        api_client.post(url, {"product_id": product.id, "quantity": 1})
+    item_id = api_client.get(url).data[0]["id"]
+    api_client.patch(f"{url}{item_id}/", {"quantity": 3})
+    api_client.delete(f"{url}{item_id}/")
+    api_client.post(url, {"product_id": products[0].id, "quantity": 2})
+    return cart_id
+
+
+@pytest.mark.django_db
+class TestRedisCartStore:
+    def test_if_cart_is_built_it_matches_database_contract(
+        self, api_client, redis_carts
+    ):
+        product = baker.make(Product, unit_price=10)
+        cart_id = api_client.post("/api/v1/store/carts/").data["id"]
+
+        api_client.post(
+            f"/api/v1/store/carts/{cart_id}/items/",
+            {"product_id": product.id, "quantity": 2},
+        )
+        response = api_client.get(f"/api/v1/store/carts/{cart_id}/")
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["item_count"] == 2
+        assert response.data["total_price"] == Decimal("20.00")
+        assert response.data["items"][0]["product"]["id"] == product.id
+        assert not Cart.objects.exists()
+
+    def test_if_cart_session_runs_it_writes_nothing_to_database(
+        self, api_client, redis_carts
+    ):
+        products = baker.make(Product, unit_price=10, _quantity=5)
+
+        with CaptureQueriesContext(connection) as queries:
+            run_cart_session(api_client, products)
+
+        assert database_writes(queries) == []
+
+    def test_if_cart_is_checked_out_order_is_created(self, api_client, redis_carts):
+        product = baker.make(Product, unit_price=10, inventory=10)
+        api_client.force_authenticate(user=baker.make(User))
+        cart_id = run_cart_session(api_client, [product])
+
+        response = api_client.post("/api/v1/store/orders/", {"cart_id": cart_id})
+
+        assert response.status_code == status.HTTP_200_OK
+        order = Order.objects.get(pk=response.data["id"])
+        assert [(item.product_id, item.quantity) for item in order.items.all()] == [
+            (product.id, 2)
+        ]
+        cart = api_client.get(f"/api/v1/store/carts/{cart_id}/")
+        assert cart.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_if_cart_is_checked_out_twice_second_checkout_returns_400(
+        self, api_client, redis_carts
+    ):
+        product = baker.make(Product, unit_price=10, inventory=10)
+        api_client.force_authenticate(user=baker.make(User))
+        cart_id = run_cart_session(api_client, [product])
+
+        first = api_client.post("/api/v1/store/orders/", {"cart_id": cart_id})
+        second = api_client.post("/api/v1/store/orders/", {"cart_id": cart_id})
+
+        assert first.status_code == status.HTTP_200_OK
+        assert second.status_code == status.HTTP_400_BAD_REQUEST
+        assert Order.objects.count() == 1
+
+    def test_if_stock_is_short_cart_is_kept(self, api_client, redis_carts):
+        product = baker.make(Product, unit_price=10, inventory=1)
+        api_client.force_authenticate(user=baker.make(User))
+        cart_id = run_cart_session(api_client, [product])
+
+        response = api_client.post("/api/v1/store/orders/", {"cart_id": cart_id})
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        cart = api_client.get(f"/api/v1/store/carts/{cart_id}/")
+        assert cart.data["item_count"] == 2
+
+    def test_if_quantity_adds_up_past_max_it_is_capped(self, api_client, redis_carts):
+        product = baker.make(Product, unit_price=10)
+        cart_id = api_client.post("/api/v1/store/carts/").data["id"]
+        for _ in range(2):
+            response = api_client.post(
+                f"/api/v1/store/carts/{cart_id}/items/",
+                {"product_id": product.id, "quantity": MAX_ITEM_QUANTITY},
+            )
+
+        assert response.data["quantity"] == MAX_ITEM_QUANTITY
+
+    def test_if_cart_expired_adding_does_not_recreate_it(self, api_client, redis_carts):
+        product = baker.make(Product, unit_price=10)
+        cart_id = api_client.post("/api/v1/store/carts/").data["id"]
+        store = get_cart_store()
+        store.delete_cart(parse_cart_id(cart_id))
+
+        response = api_client.post(
+            f"/api/v1/store/carts/{cart_id}/items/",
+            {"product_id": product.id, "quantity": 1},
+        )
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+        assert not store.cart_exists(parse_cart_id(cart_id))
+
+
+@pytest.mark.django_db
+def test_cart_session_database_writes(api_client):
+    # Baseline for TestRedisCartStore: the same session on the database store
+    products = baker.make(Product, unit_price=10, _quantity=5)
+
+    with CaptureQueriesContext(connection) as queries:
+        run_cart_session(api_client, products)
+
+    assert len(database_writes(queries)) == 9
@@ -1,5 +1,11 @@
+from io import StringIO
+
 import pytest
 from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from model_bakery import baker
 from rest_framework import status
 from rest_framework.test import APIClient
@@ -45,3 +51,109 @@ class TestRetriveCollection:
             "title": collection.title,
             "product_count": 0,
         }
+
+
+@pytest.mark.django_db
+class TestCollectionProductsCount:
+    def test_if_products_are_added_and_moved_count_follows(self):
+        collection, other = baker.make(Collection, _quantity=2)
+        product, _ = baker.make(Product, collection=collection, _quantity=2)
+
+        product.collection = other
+        product.save()
+
+        collection.refresh_from_db()
+        other.refresh_from_db()
+        assert (collection.products_count, other.products_count) == (1, 1)
+
+    def test_if_product_is_saved_its_collection_is_counted(self):
+        collection = baker.make(Collection)
+
+        Product.objects.create(
+            title="a",
+            slug="a",
+            description="",
+            unit_price=10,
+            inventory=1,
+            collection=collection,
+        )
+
+        collection.refresh_from_db()
+        assert collection.products_count == 1
+
+    def test_if_counts_are_adjusted_each_collection_gets_its_delta(self):
+        collection, other = baker.make(Collection, _quantity=2)
+
+        Collection.objects.adjust_products_count({collection.pk: 2, other.pk: 1})
+
+        collection.refresh_from_db()
+        other.refresh_from_db()
+        assert (collection.products_count, other.products_count) == (2, 1)
+
+    def test_if_product_is_deleted_count_drops(self):
+        collection = baker.make(Collection)
+        product = baker.make(Product, collection=collection)
+
+        product.delete()
+
+        collection.refresh_from_db()
+        assert collection.products_count == 0
+
+    def test_if_count_drifted_reconcile_fixes_it(self):
+        collection = baker.make(Collection)
+        baker.make(Product, collection=collection, _quantity=3)
+        Collection.objects.update(products_count=7)
+
+        call_command("reconcile_collection_counts", stdout=StringIO())
+
+        collection.refresh_from_db()
+        assert collection.products_count == 3
+
+
+@pytest.mark.django_db
+class TestCollectionListCache:
+    @pytest.fixture(autouse=True)
+    def clear_cache(self):
+        cache.clear()
+
+    def test_if_list_is_cached_it_hits_no_database(self, api_client):
+        baker.make(Collection, _quantity=3)
+        api_client.get("/api/v1/store/collections/")
+
+        with CaptureQueriesContext(connection) as queries:
+            response = api_client.get("/api/v1/store/collections/")
+
+        assert response.data["count"] == 3
+        assert len(queries) == 0
+
+    def test_if_product_moves_list_returns_fresh_counts(
+        self, api_client, django_capture_on_commit_callbacks
+    ):
+        collection, other = baker.make(Collection, _quantity=2)
+        product = baker.make(Product, collection=collection)
+        api_client.get("/api/v1/store/collections/")
+
+        with django_capture_on_commit_callbacks(execute=True):
+            product.collection = other
+            product.save()
+        response = api_client.get("/api/v1/store/collections/")
+
+        counts = {row["id"]: row["product_count"] for row in response.data["results"]}
+        assert counts == {collection.id: 0, other.id: 1}
+
+    def test_if_cache_is_warmed_list_hits_no_database(self, api_client, settings):
+        settings.ALLOWED_HOSTS = ["testserver"]
+        baker.make(Collection, _quantity=3)
+
+        call_command("warm_collections_cache", "--scheme", "http", stdout=StringIO())
+        with CaptureQueriesContext(connection) as queries:
+            response = api_client.get("/api/v1/store/collections/")
+
+        assert response.data["count"] == 3
+        assert len(queries) == 0
+
+    def test_if_no_single_host_is_allowed_warming_needs_host(self, settings):
+        settings.ALLOWED_HOSTS = ["*"]
+
+        with pytest.raises(CommandError):
+            call_command("warm_collections_cache", stdout=StringIO())
@@ -0,0 +1,96 @@
+import csv
+import json
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.test import AsyncRequestFactory
+from model_bakery import baker
+from rest_framework import status
+from rest_framework.test import force_authenticate
+
+from apps.store.models import Order, Product
+from apps.store.tasks import export_to_storage
+from apps.store.views import ExportView
+
+User = get_user_model()
+
+
+@pytest.fixture
+def admin_client(api_client):
+    api_client.force_authenticate(user=baker.make(User, is_staff=True))
+    return api_client
+
+
+def streamed(response):
+    return b"".join(response.streaming_content).decode()
+
+
+@pytest.mark.django_db
+class TestExport:
+    def test_if_user_is_not_admin_returns_403(self, api_client):
+        api_client.force_authenticate(user=baker.make(User))
+
+        response = api_client.get("/api/v1/store/exports/products/")
+
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    def test_if_products_are_exported_csv_is_streamed(self, admin_client, settings):
+        settings.STORE_EXPORT_CHUNK_SIZE = 2
+        products = baker.make(Product, unit_price=10, _quantity=5)
+
+        response = admin_client.get("/api/v1/store/exports/products/")
+
+        assert response.streaming
+        rows = list(csv.DictReader(streamed(response).splitlines()))
+        assert [int(row["id"]) for row in rows] == [product.id for product in products]
+        assert rows[0]["collection_title"] == products[0].collection.title
+
+    def test_if_orders_are_exported_as_jsonl_each_line_is_an_order(self, admin_client):
+        order = baker.make(
+            Order, customer=baker.make(User).customer, total_amount=25, item_count=2
+        )
+
+        response = admin_client.get(
+            "/api/v1/store/exports/orders/", {"file_format": "jsonl"}
+        )
+
+        lines = streamed(response).splitlines()
+        assert [json.loads(line)["id"] for line in lines] == [order.id]
+        assert json.loads(lines[0])["total_amount"] == "25.00"
+
+    def test_if_served_under_asgi_chunks_are_streamed_async(self, settings):
+        settings.STORE_EXPORT_CHUNK_SIZE = 2
+        baker.make(Product, unit_price=10, _quantity=3)
+        request = AsyncRequestFactory().get("/api/v1/store/exports/products/")
+        force_authenticate(request, user=baker.make(User, is_staff=True))
+
+        response = ExportView.as_view()(request, name="products")
+
+        async def chunks():
+            return [chunk async for chunk in response.streaming_content]
+
+        assert response.is_async
+        # The header and three rows, two lines per chunk
+        assert len(async_to_sync(chunks)()) == 2
+
+    def test_if_export_is_unknown_returns_404(self, admin_client):
+        response = admin_client.get("/api/v1/store/exports/users/")
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_if_export_runs_in_background_file_is_stored_and_mailed(
+        self, settings, tmp_path
+    ):
+        settings.MEDIA_ROOT = tmp_path
+        settings.EMAIL_BACKEND = "django.core.mail.backends.locmem.EmailBackend"
+        user = baker.make(User, is_staff=True, email="admin@example.com")
+        baker.make(Product, unit_price=10, _quantity=3)
+
+        path = export_to_storage("products", "csv", user.id)
+
+        with (tmp_path / path).open() as file:
+            assert len(list(csv.reader(file))) == 4
+        assert mail.outbox[0].to == ["admin@example.com"]
+        assert path in mail.outbox[0].body
@@ -0,0 +1,116 @@
+import csv
+import json
+from decimal import Decimal
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from model_bakery import baker
+
+from apps.store.cache import CATALOG_VERSION_KEY, get_versions
+from apps.store.importers import import_products
+from apps.store.models import Collection, Product
+
+HEADER = ["title", "slug", "description", "unit_price", "inventory", "collection"]
+
+
+def write_csv(path, rows):
+    with path.open("w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(HEADER)
+        writer.writerows(rows)
+    return path
+
+
+@pytest.mark.django_db
+class TestImportProducts:
+    def test_if_rows_are_valid_products_are_upserted_on_slug(self, tmp_path):
+        collection = baker.make(Collection, title="Tools")
+        baker.make(
+            Product, slug="hammer", title="Old", unit_price=5, collection=collection
+        )
+        feed = write_csv(
+            tmp_path / "feed.csv",
+            [
+                ["Hammer", "hammer", "", "12.50", "3", "Tools"],
+                ["Saw", "saw", "Sharp", "20", "7", "Tools"],
+            ],
+        )
+
+        call_command(
+            "import_products", str(feed), "--chunk-size", "1", stdout=StringIO()
+        )
+
+        assert dict(Product.objects.values_list("slug", "title")) == {
+            "hammer": "Hammer",
+            "saw": "Saw",
+        }
+        assert Product.objects.get(slug="hammer").unit_price == Decimal("12.50")
+        assert Collection.objects.get().products_count == 2
+
+    def test_if_rows_are_invalid_they_are_rejected_with_their_line(self, tmp_path):
+        baker.make(Collection, title="Tools")
+        feed = write_csv(
+            tmp_path / "feed.csv",
+            [
+                ["Saw", "saw", "", "20", "7", "Tools"],
+                ["Nail", "nail", "", "0.10", "7", "Tools"],
+                ["Drill", "drill", "", "30", "7", "Missing"],
+                ["Glue", "not a slug", "", "5", "x", "Tools"],
+            ],
+        )
+        rejects = tmp_path / "rejects.csv"
+
+        call_command(
+            "import_products", str(feed), "--rejects", str(rejects), stdout=StringIO()
+        )
+
+        assert list(Product.objects.values_list("slug", flat=True)) == ["saw"]
+        with rejects.open() as file:
+            assert list(csv.reader(file))[1:] == [
+                ["3", "unit_price", "must be a number between 1 and 9999.99"],
+                ["4", "collection", "does not exist"],
+                ["5", "slug", "is not a valid slug"],
+            ]
+
+    def test_if_feed_is_jsonl_products_are_imported(self, tmp_path):
+        baker.make(Collection, title="Tools")
+        feed = tmp_path / "feed.jsonl"
+        feed.write_text(
+            json.dumps(
+                {
+                    "title": "Saw",
+                    "slug": "saw",
+                    "unit_price": 20,
+                    "inventory": 7,
+                    "collection": "Tools",
+                }
+            )
+            + "\nnot json\n"
+        )
+
+        out = StringIO()
+        call_command("import_products", str(feed), stdout=out)
+
+        assert Product.objects.get().slug == "saw"
+        assert "Imported 1 of 2 rows (1 rejected)" in out.getvalue()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_if_chunk_is_committed_catalog_is_invalidated():
+    baker.make(Collection, title="Tools")
+    feed = StringIO(
+        "title,slug,description,unit_price,inventory,collection\n"
+        "Saw,saw,,20,7,Tools\n"
+        "Axe,axe,,30,7,Tools\n"
+    )
+    versions = []
+
+    import_products(
+        feed,
+        "csv",
+        chunk_size=1,
+        progress=lambda report: versions.append(get_versions(CATALOG_VERSION_KEY)[0]),
+    )
+
+    assert versions[0] != versions[1]
@@ -0,0 +1,169 @@
+from io import StringIO
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from model_bakery import baker
+from rest_framework import status
+
+from apps.store.models import Cart, CartItem, Order, OrderItem, Product
+
+User = get_user_model()
+
+
+@pytest.fixture
+def customer_client(api_client):
+    api_client.force_authenticate(user=baker.make(User))
+    return api_client
+
+
+def make_order():
+    # Creating the user already created its Customer, through post_save.
+    return baker.make(Order, customer=baker.make(User).customer)
+
+
+def make_cart(lines, inventory=10, quantity=1):
+    cart = baker.make(Cart)
+    for product in baker.make(
+        Product, unit_price=10, inventory=inventory, _quantity=lines
+    ):
+        baker.make(CartItem, cart=cart, product=product, quantity=quantity)
+    return cart
+
+
+@pytest.mark.django_db
+class TestCreateOrder:
+    def test_if_cart_is_checked_out_inventory_is_decremented(
+        self, customer_client, django_capture_on_commit_callbacks
+    ):
+        cart = make_cart(2, inventory=10, quantity=3)
+
+        with django_capture_on_commit_callbacks(execute=True):
+            response = customer_client.post(
+                "/api/v1/store/orders/", {"cart_id": str(cart.id)}
+            )
+
+        assert response.status_code == status.HTTP_200_OK
+        assert list(Product.objects.values_list("inventory", flat=True)) == [7, 7]
+        assert not Cart.objects.filter(pk=cart.id).exists()
+
+    def test_if_stock_is_short_returns_400_and_changes_nothing(self, customer_client):
+        cart = make_cart(1, inventory=1, quantity=2)
+
+        response = customer_client.post(
+            "/api/v1/store/orders/", {"cart_id": str(cart.id)}
+        )
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert not Order.objects.exists()
+        assert Product.objects.get().inventory == 1
+        assert Cart.objects.filter(pk=cart.id).exists()
+
+    def test_if_cart_is_checked_out_twice_second_checkout_returns_400(
+        self, customer_client
+    ):
+        cart = make_cart(1, inventory=10, quantity=2)
+
+        first = customer_client.post("/api/v1/store/orders/", {"cart_id": str(cart.id)})
+        second = customer_client.post(
+            "/api/v1/store/orders/", {"cart_id": str(cart.id)}
+        )
+
+        assert first.status_code == status.HTTP_200_OK
+        assert second.status_code == status.HTTP_400_BAD_REQUEST
+        assert Order.objects.count() == 1
+        assert Product.objects.get().inventory == 8
+
+    def test_if_cart_grows_checkout_query_count_is_constant(self, customer_client):
+        counts = []
+        for lines in [1, 20]:
+            cart = make_cart(lines)
+            with CaptureQueriesContext(connection) as queries:
+                customer_client.post("/api/v1/store/orders/", {"cart_id": str(cart.id)})
+            counts.append(len(queries))
+
+        assert counts[0] == counts[1]
+
+
+@pytest.mark.django_db
+class TestListOrders:
+    @pytest.mark.parametrize("orders, items", [(1, 1), (10, 5)])
+    def test_if_orders_are_listed_query_count_is_constant(
+        self, api_client, orders, items
+    ):
+        user = baker.make(User)
+        for order in baker.make(Order, customer=user.customer, _quantity=orders):
+            baker.make(
+                OrderItem,
+                order=order,
+                product__unit_price=10,
+                unit_price=10,
+                quantity=1,
+                _quantity=items,
+            )
+        api_client.force_authenticate(user=user)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = api_client.get("/api/v1/store/orders/")
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["count"] == orders
+        assert len(queries) <= 4
+
+    def test_if_user_has_no_customer_returns_empty_list(self, api_client):
+        user = baker.make(User)
+        user.customer.delete()
+        api_client.force_authenticate(user=user)
+
+        response = api_client.get("/api/v1/store/orders/")
+
+        assert response.data["count"] == 0
+
+
+@pytest.mark.django_db
+class TestOrderTotals:
+    def test_if_cart_is_checked_out_totals_are_stored(self, customer_client):
+        cart = make_cart(2, quantity=3)
+
+        response = customer_client.post(
+            "/api/v1/store/orders/", {"cart_id": str(cart.id)}
+        )
+
+        order = Order.objects.get(pk=response.data["id"])
+        assert order.total_amount == 60
+        assert order.item_count == 6
+        assert response.data["total_amount"] == 60
+
+    def test_if_item_is_edited_totals_are_recomputed(self):
+        item = baker.make(
+            OrderItem,
+            order=make_order(),
+            product__unit_price=10,
+            unit_price=10,
+            quantity=1,
+        )
+
+        item.quantity = 4
+        item.save()
+
+        order = Order.objects.get(pk=item.order_id)
+        assert order.total_amount == 40
+        assert order.item_count == 4
+
+    def test_if_backfill_runs_totals_are_computed(self):
+        item = baker.make(
+            OrderItem,
+            order=make_order(),
+            product__unit_price=10,
+            unit_price=5,
+            quantity=2,
+        )
+        Order.objects.update(total_amount=0, item_count=0)
+
+        call_command("backfill_order_totals", "--batch-size", "1", stdout=StringIO())
+
+        order = Order.objects.get(pk=item.order_id)
+        assert order.total_amount == 10
+        assert order.item_count == 2
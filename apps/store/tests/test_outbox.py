@@ -0,0 +1,104 @@
+import pytest
+from django.contrib.auth import get_user_model
+from django.dispatch import receiver
+from model_bakery import baker
+
+from apps.store import outbox
+from apps.store.models import Order, OutboxEvent
+from apps.store.signals import order_created
+
+
+@pytest.fixture
+def listener():
+    calls = []
+
+    @receiver(order_created)
+    def record(sender, **kwargs):
+        calls.append(kwargs)
+
+    yield calls
+    order_created.disconnect(record)
+
+
+@pytest.fixture
+def failing_listener():
+    @receiver(order_created)
+    def fail(sender, **kwargs):
+        raise RuntimeError("listener is down")
+
+    yield
+    order_created.disconnect(fail)
+
+
+def make_order():
+    # Creating the user already created its Customer, through post_save.
+    return baker.make(Order, customer=baker.make(get_user_model()).customer)
+
+
+def publish_order_created(order):
+    return outbox.publish(
+        "order_created",
+        {"order_id": order.id},
+        idempotency_key=f"order_created:{order.id}",
+    )
+
+
+@pytest.mark.django_db
+class TestOutbox:
+    def test_if_event_is_published_listeners_wait_for_commit(
+        self, listener, django_capture_on_commit_callbacks
+    ):
+        order = make_order()
+
+        with django_capture_on_commit_callbacks() as callbacks:
+            publish_order_created(order)
+
+        assert listener == []
+        assert len(callbacks) == 1
+
+    def test_if_outbox_is_drained_listeners_get_order_and_key(self, listener):
+        order = make_order()
+        publish_order_created(order)
+
+        outbox.drain()
+
+        assert listener[0]["order"] == order
+        assert listener[0]["idempotency_key"] == f"order_created:{order.id}"
+        assert OutboxEvent.objects.get().status == OutboxEvent.STATUS_DONE
+
+    def test_if_listener_fails_event_is_retried_later(self, failing_listener):
+        publish_order_created(make_order())
+
+        outbox.drain()
+        outbox.drain()
+
+        event = OutboxEvent.objects.get()
+        assert event.status == OutboxEvent.STATUS_PENDING
+        assert event.attempts == 1
+        assert "listener is down" in event.last_error
+
+    def test_if_listener_keeps_failing_event_is_given_up(
+        self, failing_listener, settings
+    ):
+        settings.STORE_OUTBOX_MAX_ATTEMPTS = 1
+        publish_order_created(make_order())
+
+        outbox.drain()
+
+        assert OutboxEvent.objects.get().status == OutboxEvent.STATUS_FAILED
+
+    def test_if_event_is_being_delivered_another_drain_skips_it(self):
+        drained = []
+
+        @receiver(order_created)
+        def drain_again(sender, **kwargs):
+            drained.append(outbox.drain())
+
+        publish_order_created(make_order())
+        try:
+            outbox.drain()
+        finally:
+            order_created.disconnect(drain_again)
+
+        assert drained == [0]
+        assert OutboxEvent.objects.get().status == OutboxEvent.STATUS_DONE
@@ -0,0 +1,165 @@
+from datetime import timedelta
+from decimal import Decimal
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from model_bakery import baker
+from rest_framework import status
+
+from apps.store.models import (
+    Cart,
+    CartItem,
+    Collection,
+    Product,
+    ProductPrice,
+    Promotion,
+)
+from apps.store.pricing import refresh_stale_prices
+
+User = get_user_model()
+
+
+def effective_price(product):
+    return ProductPrice.objects.get(product=product).effective_price
+
+
+@pytest.mark.django_db
+class TestEffectivePrice:
+    def test_if_product_is_saved_its_price_is_precomputed(self):
+        product = baker.make(Product, unit_price=10)
+
+        assert effective_price(product) == Decimal("10.00")
+
+    def test_if_promotion_covers_product_price_is_discounted(self):
+        product = baker.make(Product, unit_price=10)
+        promotion = baker.make(Promotion, discount=25)
+
+        promotion.products.add(product)
+
+        assert effective_price(product) == Decimal("7.50")
+
+    def test_if_promotion_covers_collection_its_products_are_discounted(self):
+        collection = baker.make(Collection)
+        product = baker.make(Product, collection=collection, unit_price=10)
+        promotion = baker.make(Promotion, discount=10)
+
+        promotion.collections.add(collection)
+
+        assert effective_price(product) == Decimal("9.00")
+
+    def test_if_promotions_overlap_the_biggest_discount_wins(self):
+        product = baker.make(Product, unit_price=10)
+        for discount in [10, 30, 20]:
+            baker.make(Promotion, discount=discount).products.add(product)
+
+        assert effective_price(product) == Decimal("7.00")
+
+    def test_if_unit_price_changes_price_is_recomputed(self):
+        product = baker.make(Product, unit_price=10)
+        baker.make(Promotion, discount=50).products.add(product)
+
+        product.unit_price = 20
+        product.save()
+
+        assert effective_price(product) == Decimal("10.00")
+
+    def test_if_promotion_is_deleted_price_is_restored(self):
+        product = baker.make(Product, unit_price=10)
+        promotion = baker.make(Promotion, discount=50)
+        promotion.products.add(product)
+
+        promotion.delete()
+
+        assert effective_price(product) == Decimal("10.00")
+
+    def test_if_promotion_is_cleared_price_is_restored(self):
+        product = baker.make(Product, unit_price=10)
+        promotion = baker.make(Promotion, discount=50)
+        promotion.products.add(product)
+
+        promotion.products.clear()
+
+        assert effective_price(product) == Decimal("10.00")
+
+    def test_if_promotion_has_not_started_it_expires_the_price_at_its_start(self):
+        starts_at = timezone.now() + timedelta(hours=1)
+        product = baker.make(Product, unit_price=10)
+        baker.make(Promotion, discount=50, starts_at=starts_at).products.add(product)
+
+        price = ProductPrice.objects.get(product=product)
+        assert price.effective_price == Decimal("10.00")
+        assert price.expires_at == starts_at
+
+    def test_if_promotion_window_passed_stale_prices_are_refreshed(self):
+        product = baker.make(Product, unit_price=10)
+        promotion = baker.make(
+            Promotion, discount=50, ends_at=timezone.now() + timedelta(hours=1)
+        )
+        promotion.products.add(product)
+        assert effective_price(product) == Decimal("5.00")
+        # The window closes without a write that would reprice the product
+        Promotion.objects.filter(pk=promotion.pk).update(
+            ends_at=timezone.now() - timedelta(seconds=1)
+        )
+        ProductPrice.objects.filter(product=product).update(
+            expires_at=timezone.now() - timedelta(seconds=1)
+        )
+
+        assert refresh_stale_prices() == 1
+        assert effective_price(product) == Decimal("10.00")
+
+
+@pytest.mark.django_db
+class TestEffectivePriceReads:
+    def test_if_product_is_retrieved_effective_price_is_included(self, api_client):
+        product = baker.make(Product, unit_price=10)
+        baker.make(Promotion, discount=20).products.add(product)
+
+        response = api_client.get(f"/api/v1/store/products/{product.id}/")
+
+        assert response.data["unit_price"] == Decimal("10.00")
+        assert response.data["effective_price"] == Decimal("8.00")
+
+    def test_if_product_is_created_effective_price_is_included(self, api_client):
+        api_client.force_authenticate(user=baker.make(User, is_staff=True))
+        collection = baker.make(Collection)
+
+        response = api_client.post(
+            "/api/v1/store/products/",
+            {
+                "title": "a",
+                "slug": "a",
+                "description": "a",
+                "inventory": 1,
+                "unit_price": 10,
+                "collection": collection.id,
+            },
+        )
+
+        assert response.status_code == status.HTTP_201_CREATED
+        assert response.data["effective_price"] == Decimal("10.00")
+
+    def test_if_cart_is_retrieved_totals_use_effective_price(self, api_client):
+        cart = baker.make(Cart)
+        product = baker.make(Product, unit_price=10)
+        baker.make(Promotion, discount=50).products.add(product)
+        baker.make(CartItem, cart=cart, product=product, quantity=2)
+
+        response = api_client.get(f"/api/v1/store/carts/{cart.id}/")
+
+        assert response.data["total_price"] == Decimal("10.00")
+        assert response.data["items"][0]["total_price"] == Decimal("10.00")
+
+    def test_if_cart_is_checked_out_order_uses_effective_price(self, api_client):
+        api_client.force_authenticate(user=baker.make(User))
+        cart = baker.make(Cart)
+        product = baker.make(Product, unit_price=10, inventory=5)
+        baker.make(Promotion, discount=50).products.add(product)
+        baker.make(CartItem, cart=cart, product=product, quantity=2)
+
+        response = api_client.post("/api/v1/store/orders/", {"cart_id": str(cart.id)})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["total_amount"] == Decimal("10.00")
+        assert response.data["items"][0]["unit_price"] == Decimal("5.00")
@@ -0,0 +1,259 @@
+import json
+from base64 import b64encode
+from decimal import Decimal
+
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from model_bakery import baker
+from rest_framework import status
+
+from apps.store.models import Collection, Product, Review, TaxRate
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+
+
+@pytest.mark.django_db
+class TestProductCache:
+    def test_if_product_is_cached_retrieve_hits_no_database(self, api_client):
+        product = baker.make(Product, unit_price=10)
+        api_client.get(f"/api/v1/store/products/{product.id}/")
+
+        with CaptureQueriesContext(connection) as queries:
+            response = api_client.get(f"/api/v1/store/products/{product.id}/")
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["id"] == product.id
+        assert len(queries) == 0
+
+    def test_if_product_is_saved_retrieve_returns_fresh_data(
+        self, api_client, django_capture_on_commit_callbacks
+    ):
+        product = baker.make(Product, title="old", unit_price=10)
+        api_client.get(f"/api/v1/store/products/{product.id}/")
+
+        with django_capture_on_commit_callbacks(execute=True):
+            product.title = "new"
+            product.save()
+        response = api_client.get(f"/api/v1/store/products/{product.id}/")
+
+        assert response.data["title"] == "new"
+
+    def test_if_other_collection_changes_filtered_list_stays_cached(
+        self, api_client, django_capture_on_commit_callbacks
+    ):
+        collection, other = baker.make(Collection, _quantity=2)
+        baker.make(Product, collection=collection, unit_price=10)
+        url = f"/api/v1/store/products/?collection_id={collection.id}"
+        api_client.get(url)
+
+        with django_capture_on_commit_callbacks(execute=True):
+            baker.make(Product, collection=other, unit_price=10)
+        with CaptureQueriesContext(connection) as queries:
+            response = api_client.get(url)
+
+        assert response.data["count"] == 1
+        assert len(queries) == 0
+
+    def test_if_product_is_added_list_returns_fresh_data(
+        self, api_client, django_capture_on_commit_callbacks
+    ):
+        collection = baker.make(Collection)
+        baker.make(Product, collection=collection, unit_price=10)
+        api_client.get("/api/v1/store/products/")
+
+        with django_capture_on_commit_callbacks(execute=True):
+            baker.make(Product, collection=collection, unit_price=10)
+        response = api_client.get("/api/v1/store/products/")
+
+        assert response.data["count"] == 2
+
+
+@pytest.mark.django_db
+class TestProductCursorPagination:
+    def test_if_cursor_is_given_pages_walk_all_products_once(self, api_client):
+        collection = baker.make(Collection)
+        products = baker.make(
+            Product, collection=collection, unit_price=10, _quantity=25
+        )
+
+        seen = []
+        url = "/api/v1/store/products/?cursor=&ordering=unit_price"
+        while url:
+            response = api_client.get(url)
+            assert response.status_code == status.HTTP_200_OK
+            assert "count" not in response.data
+            seen += [product["id"] for product in response.data["results"]]
+            url = response.data["next"]
+
+        assert seen == sorted(product.id for product in products)
+
+    def test_if_cursor_is_invalid_returns_404(self, api_client):
+        response = api_client.get("/api/v1/store/products/?cursor=garbage")
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_if_cursor_value_is_not_a_price_returns_404(self, api_client):
+        cursor = {"v": "abc", "id": 1, "o": "unit_price"}
+        encoded = b64encode(json.dumps(cursor).encode()).decode()
+
+        response = api_client.get(
+            "/api/v1/store/products/",
+            {"cursor": encoded, "ordering": "unit_price"},
+        )
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.mark.django_db
+class TestProductSearch:
+    def test_if_term_matches_title_ranks_above_description(self, api_client):
+        in_description = baker.make(
+            Product, title="mug", description="a walnut mug", unit_price=10
+        )
+        in_title = baker.make(
+            Product, title="walnut bowl", description="a bowl", unit_price=10
+        )
+        baker.make(Product, title="spoon", description="a spoon", unit_price=10)
+
+        response = api_client.get("/api/v1/store/products/?search=walnut")
+
+        assert [product["id"] for product in response.data["results"]] == [
+            in_title.id,
+            in_description.id,
+        ]
+
+    def test_if_product_is_deleted_it_is_not_found(self, api_client):
+        product = baker.make(Product, title="walnut", unit_price=10)
+        product.delete()
+
+        response = api_client.get("/api/v1/store/products/?search=walnut")
+
+        assert response.data["count"] == 0
+
+
+@pytest.mark.django_db
+class TestProductPriceWithTax:
+    def test_if_product_is_saved_price_with_tax_is_stored(self, settings):
+        settings.STORE_DEFAULT_TAX_RATE = "0.18"
+        product = baker.make(Product, unit_price=10)
+
+        product.refresh_from_db()
+
+        assert product.price_with_tax == Decimal("11.80")
+
+    def test_if_price_rounds_half_up_save_and_bulk_update_agree(self, settings):
+        settings.STORE_DEFAULT_TAX_RATE = "0.18"
+        saved = baker.make(Product, unit_price=Decimal("1.75"))
+        updated = baker.make(Product, unit_price=Decimal("1.75"))
+
+        Product.objects.filter(pk=updated.pk).update_price_with_tax()
+        saved.refresh_from_db()
+        updated.refresh_from_db()
+
+        assert saved.price_with_tax == updated.price_with_tax == Decimal("2.07")
+
+    def test_if_unit_price_is_unchanged_tax_rate_is_not_queried(self):
+        product = baker.make(Product, unit_price=10)
+        product = Product.objects.get(pk=product.pk)
+        product.title = "walnut"
+
+        with CaptureQueriesContext(connection) as queries:
+            product.save(update_fields=["title"])
+
+        assert not any(TaxRate._meta.db_table in query["sql"] for query in queries)
+
+    def test_if_tax_rate_changes_products_are_repriced(
+        self, api_client, settings, django_capture_on_commit_callbacks
+    ):
+        settings.STORE_TAX_REGION = "eu"
+        product = baker.make(Product, unit_price=10)
+        api_client.get(f"/api/v1/store/products/{product.id}/")
+
+        with django_capture_on_commit_callbacks(execute=True):
+            TaxRate.objects.create(region="eu", rate=Decimal("0.2"))
+        response = api_client.get(f"/api/v1/store/products/{product.id}/")
+
+        assert response.data["price_with_tax"] == Decimal("12.00")
+
+    def test_if_ordering_by_price_with_tax_sorts_in_sql(self, api_client):
+        expensive = baker.make(Product, unit_price=20)
+        cheap = baker.make(Product, unit_price=10)
+
+        response = api_client.get(
+            "/api/v1/store/products/?ordering=price_with_tax&price_with_tax__gt=1"
+        )
+
+        assert [product["id"] for product in response.data["results"]] == [
+            cheap.id,
+            expensive.id,
+        ]
+
+
+@pytest.mark.django_db
+class TestConditionalGet:
+    def test_if_etag_matches_product_returns_304_without_database(self, api_client):
+        product = baker.make(Product, unit_price=10)
+        url = f"/api/v1/store/products/{product.id}/"
+        etag = api_client.get(url)["ETag"]
+
+        with CaptureQueriesContext(connection) as queries:
+            response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+        assert response["ETag"] == etag
+        assert len(queries) == 0
+
+    def test_if_product_is_saved_etag_changes(
+        self, api_client, django_capture_on_commit_callbacks
+    ):
+        product = baker.make(Product, unit_price=10)
+        url = f"/api/v1/store/products/{product.id}/"
+        etag = api_client.get(url)["ETag"]
+
+        with django_capture_on_commit_callbacks(execute=True):
+            product.save()
+        response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response["ETag"] != etag
+
+    def test_if_list_is_unchanged_since_last_modified_returns_304(
+        self, api_client, django_capture_on_commit_callbacks
+    ):
+        with django_capture_on_commit_callbacks(execute=True):
+            baker.make(Product, unit_price=10)
+        last_modified = api_client.get("/api/v1/store/products/")["Last-Modified"]
+
+        response = api_client.get(
+            "/api/v1/store/products/", HTTP_IF_MODIFIED_SINCE=last_modified
+        )
+
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+    def test_if_nothing_was_written_since_flush_last_modified_is_sent(self, api_client):
+        product = baker.make(Product, unit_price=10)
+
+        response = api_client.get(f"/api/v1/store/products/{product.id}/")
+
+        assert "Last-Modified" in response
+
+    def test_if_review_is_added_reviews_etag_changes(
+        self, api_client, django_capture_on_commit_callbacks
+    ):
+        product = baker.make(Product, unit_price=10)
+        url = f"/api/v1/store/products/{product.id}/reviews/"
+        etag = api_client.get(url)["ETag"]
+        unchanged = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        with django_capture_on_commit_callbacks(execute=True):
+            baker.make(Review, product=product)
+        response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        assert unchanged.status_code == status.HTTP_304_NOT_MODIFIED
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["count"] == 1
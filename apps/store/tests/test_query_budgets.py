@@ -0,0 +1,269 @@
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from model_bakery import baker
+from rest_framework import status
+
+from apps.store import urls
+from apps.store.cache import local_collections
+from apps.store.models import (
+    Cart,
+    CartItem,
+    Collection,
+    Order,
+    OrderItem,
+    Product,
+    ProductImage,
+    Review,
+)
+
+User = get_user_model()
+
+# Rows of the listed or related model created before each request, all
+# under the page size of 10 so that paginated lists grow with them
+SIZES = [1, 3, 9]
+
+
+def product_with_images(size):
+    product = baker.make(Product, unit_price=10)
+    baker.make(
+        ProductImage, product=product, image="store/images/a.jpg", _quantity=size
+    )
+    return product
+
+
+def product_list(size):
+    for _ in range(size):
+        product_with_images(1)
+    return "/api/v1/store/products/", None
+
+
+def product_detail(size):
+    return f"/api/v1/store/products/{product_with_images(size).id}/", None
+
+
+def collection_list(size):
+    baker.make(Collection, _quantity=size)
+    return "/api/v1/store/collections/", None
+
+
+def collection_detail(size):
+    collection = baker.make(Collection)
+    baker.make(Product, collection=collection, unit_price=10, _quantity=size)
+    return f"/api/v1/store/collections/{collection.id}/", None
+
+
+def cart_with_items(size):
+    cart = baker.make(Cart)
+    baker.make(
+        CartItem,
+        cart=cart,
+        product__unit_price=10,
+        product__inventory=10,
+        quantity=1,
+        _quantity=size,
+    )
+    return cart
+
+
+def cart_detail(size):
+    return f"/api/v1/store/carts/{cart_with_items(size).id}/", None
+
+
+def cart_item_list(size):
+    return f"/api/v1/store/carts/{cart_with_items(size).id}/items/", None
+
+
+def cart_item_detail(size):
+    item = cart_with_items(size).items.first()
+    return f"/api/v1/store/carts/{item.cart_id}/items/{item.id}/", None
+
+
+def customer_list(size):
+    baker.make(User, _quantity=size)
+    return "/api/v1/store/customers/", None
+
+
+def customer_detail(size):
+    baker.make(User, _quantity=size)
+    return f"/api/v1/store/customers/{baker.make(User).customer.id}/", None
+
+
+def customer_me(size):
+    baker.make(User, _quantity=size)
+    return "/api/v1/store/customers/me/", baker.make(User)
+
+
+def order_list(size):
+    user = baker.make(User)
+    for order in baker.make(Order, customer=user.customer, _quantity=size):
+        baker.make(
+            OrderItem,
+            order=order,
+            product__unit_price=10,
+            unit_price=10,
+            quantity=1,
+            _quantity=2,
+        )
+    return "/api/v1/store/orders/", user
+
+
+def order_detail(size):
+    user = baker.make(User)
+    order = baker.make(Order, customer=user.customer)
+    baker.make(
+        OrderItem,
+        order=order,
+        product__unit_price=10,
+        unit_price=10,
+        quantity=1,
+        _quantity=size,
+    )
+    return f"/api/v1/store/orders/{order.id}/", user
+
+
+def review_list(size):
+    product = baker.make(Product, unit_price=10)
+    baker.make(Review, product=product, _quantity=size)
+    return f"/api/v1/store/products/{product.id}/reviews/", None
+
+
+def review_detail(size):
+    review = baker.make(Review, product__unit_price=10)
+    baker.make(Review, product=review.product, _quantity=size)
+    return f"/api/v1/store/products/{review.product_id}/reviews/{review.id}/", None
+
+
+def image_list(size):
+    product = product_with_images(size)
+    return f"/api/v1/store/products/{product.id}/images/", None
+
+
+def image_detail(size):
+    image = product_with_images(size).images.first()
+    return f"/api/v1/store/products/{image.product_id}/images/{image.id}/", None
+
+
+def export(size):
+    baker.make(Product, unit_price=10, _quantity=size)
+    return "/api/v1/store/exports/products/", baker.make(User, is_staff=True)
+
+
+# (route name, query budget, setup returning (url, user))
+ENDPOINTS = [
+    ("product-list", 3, product_list),
+    ("product-detail", 2, product_detail),
+    ("collection-list", 2, collection_list),
+    ("collection-detail", 1, collection_detail),
+    ("cart-detail", 2, cart_detail),
+    ("cart-items-list", 1, cart_item_list),
+    ("cart-items-detail", 1, cart_item_detail),
+    ("customer-list", 2, customer_list),
+    ("customer-detail", 1, customer_detail),
+    ("customer-me", 1, customer_me),
+    ("orders-list", 4, order_list),
+    ("orders-detail", 3, order_detail),
+    ("product-reviews-list", 2, review_list),
+    ("product-reviews-detail", 1, review_detail),
+    ("product-images-list", 2, image_list),
+    ("product-images-detail", 1, image_detail),
+    ("export", 1, export),
+]
+
+
+def cart_item_add(size):
+    cart = cart_with_items(size)
+    product = baker.make(Product, unit_price=10)
+    data = {"product_id": product.id, "quantity": 1}
+    return f"/api/v1/store/carts/{cart.id}/items/", data, None
+
+
+def cart_item_bulk(size):
+    # Each of add, set and remove applied to size products
+    cart = cart_with_items(2 * size)
+    items = list(cart.items.all())
+    added = baker.make(Product, unit_price=10, _quantity=size)
+    data = [
+        *[{"op": "add", "product_id": product.id, "quantity": 2} for product in added],
+        *[
+            {"op": "set", "product_id": item.product_id, "quantity": 2}
+            for item in items[:size]
+        ],
+        *[{"op": "remove", "product_id": item.product_id} for item in items[size:]],
+    ]
+    return f"/api/v1/store/carts/{cart.id}/items/bulk/", data, None
+
+
+def checkout(size):
+    cart = cart_with_items(size)
+    return "/api/v1/store/orders/", {"cart_id": cart.id}, baker.make(User)
+
+
+# (route name, query budget, setup returning (url, data, user)) of POSTs,
+# whose request grows with the size
+WRITE_ENDPOINTS = [
+    ("cart-items-list", 1, cart_item_add),
+    ("cart-items-bulk", 9, cart_item_bulk),
+    ("orders-list", 17, checkout),
+]
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "budget, setup",
+    [endpoint[1:] for endpoint in ENDPOINTS],
+    ids=[endpoint[0] for endpoint in ENDPOINTS],
+)
+def test_endpoint_query_count_is_constant(api_client, query_budget, budget, setup):
+    counts = []
+    for size in SIZES:
+        # Measure the database path, not a response cached by the last size
+        cache.clear()
+        local_collections.clear()
+        url, user = setup(size)
+        api_client.force_authenticate(user=user)
+
+        with query_budget(budget) as queries:
+            response = api_client.get(url)
+            if response.streaming:
+                b"".join(response.streaming_content)
+
+        assert response.status_code == status.HTTP_200_OK
+        counts.append(len(queries))
+
+    assert len(set(counts)) == 1, dict(zip(SIZES, counts))
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "budget, setup",
+    [endpoint[1:] for endpoint in WRITE_ENDPOINTS],
+    ids=[endpoint[0] for endpoint in WRITE_ENDPOINTS],
+)
+def test_write_query_count_is_constant(api_client, query_budget, budget, setup):
+    counts = []
+    for size in SIZES:
+        url, data, user = setup(size)
+        api_client.force_authenticate(user=user)
+
+        with query_budget(budget) as queries:
+            response = api_client.post(url, data, format="json")
+
+        assert status.is_success(response.status_code), response.data
+        counts.append(len(queries))
+
+    assert len(set(counts)) == 1, dict(zip(SIZES, counts))
+
+
+@pytest.mark.django_db
+def test_every_store_route_has_a_query_budget():
+    routers = [urls.router, urls.product_router, urls.cart_router]
+    names = {
+        route.name.format(basename=basename)
+        for router in routers
+        for _, viewset, basename in router.registry
+        for route in router.get_routes(viewset)
+        if "get" in router.get_method_map(viewset, route.mapping)
+    }
+
+    assert names <= {endpoint[0] for endpoint in ENDPOINTS}
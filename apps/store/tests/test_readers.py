@@ -0,0 +1,80 @@
+import timeit
+
+import pytest
+from django.contrib.auth import get_user_model
+from model_bakery import baker
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from apps.store.models import Collection, Order, OrderItem, Product, ProductImage
+from apps.store.readers import OrderReader, ProductReader
+from apps.store.serializers import OrderSerializer, ProductSerializer
+
+
+@pytest.fixture
+def drf_request():
+    return Request(APIRequestFactory().get("/api/v1/store/products/"))
+
+
+@pytest.fixture
+def products():
+    collection = baker.make(Collection)
+    products = baker.make(Product, collection=collection, unit_price=10, _quantity=100)
+    for product in products:
+        baker.make(ProductImage, product=product, image="store/images/a.jpg")
+    return Product.objects.order_by("id").prefetch_related("images")
+
+
+def serialize_page(queryset, request):
+    return ProductSerializer(
+        list(queryset), many=True, context={"request": request}
+    ).data
+
+
+def read_page(queryset, request):
+    reader = ProductReader(request)
+    return reader.many(reader.values(queryset))
+
+
+@pytest.mark.django_db
+class TestProductReader:
+    def test_if_page_is_read_it_matches_serializer(self, products, drf_request):
+        expected = serialize_page(products, drf_request)
+
+        assert read_page(products, drf_request) == expected
+
+    def test_if_page_is_read_it_is_faster_than_serializer(self, products, drf_request):
+        def best_of(read):
+            return min(
+                timeit.repeat(lambda: read(products, drf_request), number=1, repeat=5)
+            )
+
+        # About ten times faster when measured; half leaves room for noise
+        assert best_of(read_page) < best_of(serialize_page) / 2
+
+    @pytest.mark.benchmark(group="product-page")
+    def test_benchmark_product_serializer(self, benchmark, products, drf_request):
+        page = benchmark(serialize_page, products, drf_request)
+
+        assert len(page) == 100
+
+    @pytest.mark.benchmark(group="product-page")
+    def test_benchmark_product_reader(self, benchmark, products, drf_request):
+        page = benchmark(read_page, products, drf_request)
+
+        assert len(page) == 100
+
+
+@pytest.mark.django_db
+class TestOrderReader:
+    def test_if_orders_are_read_they_match_order_serializer(self):
+        order = baker.make(Order, customer=baker.make(get_user_model()).customer)
+        baker.make(
+            OrderItem, order=order, product__unit_price=10, unit_price=10, quantity=1
+        )
+        queryset = Order.objects.order_by("id")
+
+        reader = OrderReader()
+        data = reader.many(reader.values(queryset))
+
+        assert data == OrderSerializer(queryset, many=True).data
@@ -23,4 +23,5 @@ urlpatterns = [
     path("store/", include(router.urls)),
     path("store/", include(product_router.urls)),
     path("store/", include(cart_router.urls)),
+    path("store/exports/<str:name>/", views.ExportView.as_view(), name="export"),
 ]
@@ -1,11 +1,16 @@
-from django.db.models import Count
-from django.http import HttpResponse
+from django.conf import settings
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIRequest
+from django.db.models import Prefetch
+from django.http import HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_list_or_404, get_object_or_404, render
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework import status
+from rest_framework import generics, status
 from rest_framework.decorators import action, api_view
-from rest_framework.exceptions import PermissionDenied
-from rest_framework.filters import OrderingFilter, SearchFilter
+from rest_framework.exceptions import NotFound, PermissionDenied
+from rest_framework.filters import OrderingFilter
 from rest_framework.generics import ListCreateAPIView, RetrieveUpdateDestroyAPIView
 from rest_framework.mixins import (
     CreateModelMixin,
@@ -19,9 +24,21 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.viewsets import GenericViewSet, ModelViewSet
 
-from apps.store.filters import ProductFilter
-from apps.store.pagination import ProductPagination
+from apps.store.cache import (
+    collection_list_cache_key,
+    collection_list_local_key,
+    local_collections,
+    product_detail_cache_key,
+    product_list_cache_key,
+    review_cache_key,
+)
+from apps.store.carts import get_cart_store, parse_cart_id, parse_item_id
+from apps.store.exporters import EXPORTS, FILE_FORMATS, STREAMING_FORMATS, async_lines
+from apps.store.filters import ProductFilter, ProductSearchFilter
+from apps.store.pagination import ProductCursorPagination, ProductPagination
 from apps.store.permissions import FullDjangoModelPermission, IsAdminOrReadOnly
+from apps.store.readers import CollectionReader, OrderReader, ProductReader
+from apps.store.tasks import export_to_storage
 
 from .models import (
     Cart,
@@ -36,6 +53,7 @@ from .models import (
 )
 from .serializers import (
     AddCartItemSerializer,
+    CartItemOperationSerializer,
     CartItemSerializer,
     CartSerializer,
     CollectionSerializer,
@@ -51,19 +69,124 @@ from .serializers import (
 )
 
 
+def get_customer_id(request):
+    """The requesting user's Customer id, looked up at most once per request."""
+    # Cached on the HttpRequest, which every DRF Request for it wraps.
+    http_request = getattr(request, "_request", request)
+    if not hasattr(http_request, "store_customer_id"):
+        http_request.store_customer_id = (
+            Customer.objects.filter(user_id=request.user.id)
+            .values_list("id", flat=True)
+            .first()
+        )
+    return http_request.store_customer_id
+
+
+class FastReadMixin:
+    """
+    Serve list and retrieve from .values() rows through reader_class
+    instead of the ModelSerializer, which is kept for writes.
+    """
+
+    reader_class = None
+
+    def get_reader(self):
+        return self.reader_class(self.request)
+
+    def list(self, request, *args, **kwargs):
+        reader = self.get_reader()
+        queryset = reader.values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(reader.many(page))
+        return Response(reader.many(queryset))
+
+    def retrieve(self, request, *args, **kwargs):
+        reader = self.get_reader()
+        queryset = reader.values(self.filter_queryset(self.get_queryset()))
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        row = generics.get_object_or_404(
+            queryset, **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+        )
+        return Response(reader.one(row))
+
+
+class ConditionalGetMixin:
+    """
+    ETag and Last-Modified from the versioned cache keys, so revalidating
+    clients, nginx and the CDN get a 304 before any body is read or built.
+    """
+
+    def set_validators(self, response, versioned):
+        response.headers["ETag"] = versioned.etag
+        if versioned.last_modified is not None:
+            response.headers["Last-Modified"] = http_date(versioned.last_modified)
+        patch_cache_control(
+            response, public=True, max_age=settings.STORE_HTTP_CACHE_MAX_AGE
+        )
+        return response
+
+    def not_modified(self, request, versioned):
+        # The 304 copies its headers from the response it stands in for.
+        response = get_conditional_response(
+            request,
+            etag=versioned.etag,
+            last_modified=versioned.last_modified,
+            response=self.set_validators(HttpResponse(), versioned),
+        )
+        return response if response.status_code != 200 else None
+
+
+class CartStoreMixin:
+    """Carts are read and written through the STORE_CART_BACKEND store."""
+
+    @property
+    def cart_store(self):
+        if not hasattr(self, "_cart_store"):
+            self._cart_store = get_cart_store()
+        return self._cart_store
+
+    def get_cart_id(self, kwarg):
+        cart_id = parse_cart_id(self.kwargs[kwarg])
+        if cart_id is None:
+            raise NotFound()
+        return cart_id
+
+
 class CartViewSet(
-    CreateModelMixin, RetrieveModelMixin, DestroyModelMixin, GenericViewSet
+    CartStoreMixin,
+    CreateModelMixin,
+    RetrieveModelMixin,
+    DestroyModelMixin,
+    GenericViewSet,
 ):
     lookup_field = "id"
-    queryset = Cart.objects.prefetch_related("items__product").all()
+    queryset = Cart.objects.with_totals()
     serializer_class = CartSerializer
 
+    def create(self, request, *args, **kwargs):
+        cart = self.cart_store.create_cart()
+        return Response(CartSerializer(cart).data, status=status.HTTP_201_CREATED)
+
+    def retrieve(self, request, *args, **kwargs):
+        cart = self.cart_store.get_cart(self.get_cart_id("id"))
+        if cart is None:
+            raise NotFound()
+        return Response(CartSerializer(cart).data)
 
-class CartItemViewSet(ModelViewSet):
+    def destroy(self, request, *args, **kwargs):
+        if not self.cart_store.delete_cart(self.get_cart_id("id")):
+            raise NotFound()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class CartItemViewSet(CartStoreMixin, ModelViewSet):
     lookup_field = "id"
     http_method_names = ["get", "post", "patch", "delete"]
 
     def get_serializer_class(self):
+        if self.action == "bulk":
+            return CartItemOperationSerializer
         if self.request.method == "POST":
             return AddCartItemSerializer
         elif self.request.method == "PATCH":
@@ -71,29 +194,90 @@ class CartItemViewSet(ModelViewSet):
         return CartItemSerializer
 
     def get_serializer_context(self):
-        return {"cart_id": self.kwargs["cart_pk"]}
+        return {"cart_id": self.get_cart_id("cart_id")}
 
     def get_queryset(self):
-        return CartItem.objects.select_related("product").filter(
-            cart_id=self.kwargs["cart_pk"]
+        return CartItem.objects.with_total_price().filter(
+            cart_id=self.get_cart_id("cart_id")
+        )
+
+    def get_item_id(self):
+        item_id = parse_item_id(self.kwargs["id"])
+        if item_id is None:
+            raise NotFound()
+        return item_id
+
+    def list(self, request, *args, **kwargs):
+        items = self.cart_store.get_items(self.get_cart_id("cart_id"))
+        return Response(CartItemSerializer(items, many=True).data)
+
+    def retrieve(self, request, *args, **kwargs):
+        item = self.cart_store.get_item(self.get_cart_id("cart_id"), self.get_item_id())
+        if item is None:
+            raise NotFound()
+        return Response(CartItemSerializer(item).data)
+
+    def partial_update(self, request, *args, **kwargs):
+        serializer = UpdateCartItemSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        item = self.cart_store.set_item_quantity(
+            self.get_cart_id("cart_id"),
+            self.get_item_id(),
+            serializer.validated_data["quantity"],
         )
+        if item is None:
+            raise NotFound()
+        return Response(UpdateCartItemSerializer(item).data)
 
+    def destroy(self, request, *args, **kwargs):
+        if not self.cart_store.delete_item(
+            self.get_cart_id("cart_id"), self.get_item_id()
+        ):
+            raise NotFound()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    @action(detail=False, methods=["POST"])
+    def bulk(self, request, cart_id=None):
+        cart_id = self.get_cart_id("cart_id")
+        if not self.cart_store.cart_exists(cart_id):
+            raise NotFound()
+        serializer = self.get_serializer(data=request.data, many=True, max_length=100)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return Response(CartSerializer(self.cart_store.get_cart(cart_id)).data)
 
-class ReviewViewSet(ModelViewSet):
+
+class ReviewViewSet(ConditionalGetMixin, ModelViewSet):
     lookup_field = "id"
     serializer_class = ReviewSerializer
 
+    def list(self, request, *args, **kwargs):
+        versioned = review_cache_key(request, kwargs["product_id"])
+        response = self.not_modified(request, versioned)
+        if response is None:
+            response = super().list(request, *args, **kwargs)
+            self.set_validators(response, versioned)
+        return response
+
+    def retrieve(self, request, *args, **kwargs):
+        versioned = review_cache_key(request, kwargs["product_id"])
+        response = self.not_modified(request, versioned)
+        if response is None:
+            response = super().retrieve(request, *args, **kwargs)
+            self.set_validators(response, versioned)
+        return response
+
     def get_queryset(self):
-        product_pk = self.kwargs.get("product_pk")
-        if product_pk is None:
+        product_id = self.kwargs.get("product_id")
+        if product_id is None:
             return Review.objects.none()
-        return Review.objects.filter(product_id=product_pk)
+        return Review.objects.filter(product_id=product_id)
 
     def get_serializer_context(self):
         context = super().get_serializer_context()
-        product_pk = self.kwargs.get("product_pk")
-        if product_pk:
-            context["product_id"] = product_pk
+        product_id = self.kwargs.get("product_id")
+        if product_id:
+            context["product_id"] = product_id
         return context
 
 
@@ -101,34 +285,71 @@ class ProductImageViewSet(ModelViewSet):
     serializer_class = ProductImageSerializer
 
     def get_queryset(self):
-        product_pk = self.kwargs.get("product_pk")
-        if product_pk is None:
+        product_id = self.kwargs.get("product_id")
+        if product_id is None:
             return ProductImage.objects.none()
-        return ProductImage.objects.filter(product_id=product_pk)
+        return ProductImage.objects.filter(product_id=product_id)
 
     def get_serializer_context(self):
-        return {"product_id": self.kwargs["product_pk"]}
+        return {"product_id": self.kwargs["product_id"]}
 
 
-class ProductViewSet(ModelViewSet):
+class ProductViewSet(ConditionalGetMixin, FastReadMixin, ModelViewSet):
     # throttle_scope = "products"
     lookup_field = "id"
     permission_classes = [IsAdminOrReadOnly]
     pagination_class = ProductPagination
-    queryset = Product.objects.order_by("-last_update").prefetch_related("images").all()
+    queryset = (
+        Product.objects.with_effective_price()
+        .order_by("-last_update")
+        .prefetch_related("images")
+    )
     serializer_class = ProductSerializer
+    reader_class = ProductReader
     filter_backends = [
         DjangoFilterBackend,
-        SearchFilter,
+        ProductSearchFilter,
         OrderingFilter,
     ]
     filterset_class = ProductFilter
-    search_fields = ["title", "description"]
-    ordering_fields = ["unit_price", "last_update", "title"]
+    ordering_fields = ["unit_price", "price_with_tax", "last_update", "title"]
 
     def get_serializer_context(self):
         return {"request": self.request}
 
+    @property
+    def paginator(self):
+        # ?cursor= opts into keyset pagination for infinite-scroll clients
+        if not hasattr(self, "_paginator"):
+            cursor_param = ProductCursorPagination.cursor_query_param
+            if cursor_param in self.request.query_params:
+                self._paginator = ProductCursorPagination()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
+
+    def list(self, request, *args, **kwargs):
+        versioned = product_list_cache_key(request)
+        response = self.not_modified(request, versioned)
+        if response is not None:
+            return response
+        data = cache.get(versioned.key)
+        if data is None:
+            data = super().list(request, *args, **kwargs).data
+            cache.set(versioned.key, data, settings.STORE_PRODUCT_CACHE_TIMEOUT)
+        return self.set_validators(Response(data), versioned)
+
+    def retrieve(self, request, *args, **kwargs):
+        versioned = product_detail_cache_key(request, kwargs["id"])
+        response = self.not_modified(request, versioned)
+        if response is not None:
+            return response
+        data = cache.get(versioned.key)
+        if data is None:
+            data = super().retrieve(request, *args, **kwargs).data
+            cache.set(versioned.key, data, settings.STORE_PRODUCT_CACHE_TIMEOUT)
+        return self.set_validators(Response(data), versioned)
+
     def destroy(self, request, *args, **kwargs):
         if OrderItem.objects.filter(pk=kwargs["pk"]).count() > 0:
             return Response(
@@ -260,21 +481,36 @@ class ProductViewSet(ModelViewSet):
 #         return Response({"error": "Item Deleted"}, status=status.HTTP_204_NO_CONTENT)
 
 
-class CollectionViewSet(ModelViewSet):
-    queryset = Collection.objects.annotate(product_count=Count("product"))
+class CollectionViewSet(ConditionalGetMixin, FastReadMixin, ModelViewSet):
+    queryset = Collection.objects.all()
     serializer_class = CollectionSerializer
+    reader_class = CollectionReader
     permission_classes = [IsAdminOrReadOnly]
 
     def get_serializer_context(self):
         return {"request": self.request}
 
+    def list(self, request, *args, **kwargs):
+        local_key = collection_list_local_key(request)
+        entry = local_collections.get(local_key)
+        if entry is None:
+            generation = local_collections.generation
+            versioned = collection_list_cache_key(local_key)
+            data = cache.get(versioned.key)
+            if data is None:
+                data = super().list(request, *args, **kwargs).data
+                cache.set(versioned.key, data, settings.STORE_COLLECTION_CACHE_TIMEOUT)
+            entry = (data, versioned)
+            local_collections.set(local_key, entry, generation)
+        data, versioned = entry
+        response = self.not_modified(request, versioned)
+        if response is not None:
+            return response
+        return self.set_validators(Response(data), versioned)
+
     def destroy(self, request, *args, **kwargs):
-        collection = (
-            Collection.objects.filter(pk=kwargs["pk"])
-            .annotate(product_count=Count("product"))
-            .first()
-        )
-        if collection and collection.product_count > 0:
+        collection = Collection.objects.filter(pk=kwargs["pk"]).first()
+        if collection and collection.products_count > 0:
             return Response(
                 {"error": "collection cannot be deleted"},
                 status=status.HTTP_400_BAD_REQUEST,
@@ -432,8 +668,11 @@ class CustomerViewSet(ModelViewSet):
             return Response(serializer.data)
 
 
-class OrderViewSet(ModelViewSet):
+class OrderViewSet(FastReadMixin, ModelViewSet):
     http_methods_names = ["get", "post", "patch", "delete", "head", "options"]
+    reader_class = OrderReader
+    filter_backends = [OrderingFilter]
+    ordering_fields = ["Order_placed_at", "total_amount", "item_count"]
 
     def get_permissions(self):
         if self.request.method in ["PATCH", "DELETE"]:
@@ -442,13 +681,18 @@ class OrderViewSet(ModelViewSet):
 
     def create(self, request, *args, **kwargs):
         serializer = CreateOrderSerializer(
-            data=request.data, context={"user_id": self.request.user.id}
+            data=request.data,
+            context={
+                "user_id": self.request.user.id,
+                "customer_id": get_customer_id(request),
+            },
         )
         serializer.is_valid(raise_exception=True)
         # order is retured from custom save method in CreateOrderSerializer
         order = serializer.save()
-        serializer = OrderSerializer(order)
-        return Response(serializer.data)
+        reader = self.get_reader()
+        row = reader.values(Order.objects.filter(pk=order.pk)).get()
+        return Response(reader.one(row))
 
     def get_serializer_class(self):
         if self.request.method == "POST":
@@ -458,11 +702,69 @@ class OrderViewSet(ModelViewSet):
         return OrderSerializer
 
     def get_queryset(self):
-        user = self.request.user
-        if user.is_staff:
-            return Order.objects.all()
+        # Reads go through OrderReader; the prefetch serves OrderSerializer.
+        queryset = Order.objects.prefetch_related(
+            Prefetch(
+                "items",
+                queryset=OrderItem.objects.select_related("product").only(
+                    "id",
+                    "order_id",
+                    "quantity",
+                    "unit_price",
+                    "product__id",
+                    "product__title",
+                    "product__unit_price",
+                ),
+            )
+        )
+        if self.request.user.is_staff:
+            return queryset
 
-        customer = Customer.objects.only("id").filter(user_id=user.id).first()
-        if not customer:
+        customer_id = get_customer_id(self.request)
+        if customer_id is None:
             return Order.objects.none()
-        return Order.objects.filter(customer_id=customer.id)
+        return queryset.filter(customer_id=customer_id)
+
+
+class ExportView(APIView):
+    """
+    GET streams a dataset as CSV or JSONL while it is read from the
+    database; POST writes it to default_storage in the background, in any
+    of FILE_FORMATS, and emails the requesting admin a link when it's done.
+    """
+
+    permission_classes = [IsAdminUser]
+
+    def get_export(self, name):
+        if name not in EXPORTS:
+            raise NotFound()
+        return EXPORTS[name]
+
+    def get(self, request, name):
+        export = self.get_export(name)
+        file_format = request.query_params.get("file_format", "csv")
+        if file_format not in STREAMING_FORMATS:
+            return Response(
+                {"file_format": f"must be one of {', '.join(STREAMING_FORMATS)}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        lines, content_type = STREAMING_FORMATS[file_format]
+        content = lines(export)
+        if isinstance(request._request, ASGIRequest):
+            content = async_lines(content)
+        response = StreamingHttpResponse(content, content_type=content_type)
+        response["Content-Disposition"] = (
+            f'attachment; filename="{name}.{file_format}"'
+        )
+        return response
+
+    def post(self, request, name):
+        self.get_export(name)
+        file_format = request.data.get("file_format", "csv")
+        if file_format not in FILE_FORMATS:
+            return Response(
+                {"file_format": f"must be one of {', '.join(FILE_FORMATS)}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        result = export_to_storage.delay(name, file_format, request.user.id)
+        return Response({"task_id": result.id}, status=status.HTTP_202_ACCEPTED)
@@ -1,6 +1,8 @@
 """
 ASGI config for SnapBuy project.
 It exposes the ASGI callable as a module-level variable named ``application``.
+Served by gunicorn's uvicorn workers, so async views share the worker's event
+loop (and the connection pools of apps.core.clients).
 """
 
 import os
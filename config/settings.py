@@ -73,6 +73,7 @@ INSTALLED_APPS = DJANGO_APPS + THIRD_PARTY_APPS + LOCAL_APPS
 
 # Middleware
 MIDDLEWARE = [
+    "apps.core.middleware.MetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",  # Serve static files in production
     "corsheaders.middleware.CorsMiddleware",
@@ -90,6 +91,29 @@ if DEBUG:
         "debug_toolbar.middleware.DebugToolbarMiddleware",
     ]
 
+# Share of requests whose SQL, cache and render time MetricsMiddleware records;
+# request counts and latency are recorded for all of them
+METRICS_SAMPLE_RATE = env.float("METRICS_SAMPLE_RATE", default=0.1)
+# Bearer token required by /api/v1/metrics/; the endpoint is off when unset
+METRICS_TOKEN = env("METRICS_TOKEN", default="")
+
+# Outbound HTTP (apps.core.clients): base url per third-party service, and
+# the timeout, connection pool size and circuit breaker of their clients
+HTTP_SERVICES = {
+    "httpbin": env("HTTPBIN_URL", default="https://httpbin.org"),
+}
+HTTP_CLIENT_TIMEOUT = env.float("HTTP_CLIENT_TIMEOUT", default=5.0)
+HTTP_CLIENT_MAX_CONNECTIONS = env.int("HTTP_CLIENT_MAX_CONNECTIONS", default=20)
+# Consecutive failures that open a circuit, and seconds until it is retried
+HTTP_CIRCUIT_FAILURES = env.int("HTTP_CIRCUIT_FAILURES", default=5)
+HTTP_CIRCUIT_RESET_AFTER = env.int("HTTP_CIRCUIT_RESET_AFTER", default=30)
+
+# Admin changelists above this many rows (by planner estimate) show the
+# estimate instead of running COUNT(*), see EstimatedCountPaginator
+ADMIN_ESTIMATED_COUNT_THRESHOLD = env.int(
+    "ADMIN_ESTIMATED_COUNT_THRESHOLD", default=100_000
+)
+
 # URLs
 ROOT_URLCONF = "config.urls"
 
@@ -114,8 +138,15 @@ TEMPLATES = [
 WSGI_APPLICATION = "config.wsgi.application"
 
 # Database
+# Under ASGI each request may run on a different thread, so persistent
+# connections pile up instead of being reused; keep them off unless a WSGI
+# deployment opts in with CONN_MAX_AGE
 if env("DATABASE_URL", default=None):
-    DATABASES = {"default": dj_database_url.config(conn_max_age=600)}
+    DATABASES = {
+        "default": dj_database_url.config(
+            conn_max_age=env.int("CONN_MAX_AGE", default=0)
+        )
+    }
 else:
     DATABASES = {
         "default": {
@@ -382,13 +413,24 @@ CELERY_BEAT_SCHEDULE = {
         "task": "apps.playground.tasks.monthly_report",
         "schedule": crontab(day_of_month=1, hour=4, minute=30),
         "args": ["Your monthly report is being generated"],
-    }
+    },
+    # Retries, and events whose on_commit enqueue didn't reach the broker
+    "drain_outbox": {
+        "task": "apps.store.tasks.drain_outbox",
+        "schedule": 60.0,
+    },
+    # Promotions starting or ending, and products the signals missed
+    "refresh_stale_prices": {
+        "task": "apps.store.tasks.refresh_stale_prices",
+        "schedule": 60.0,
+    },
 }
 
 # Cache
 CACHES = {
     "default": {
-        "BACKEND": "django_redis.cache.RedisCache",
+        # django_redis, counting hits and misses for the metrics middleware
+        "BACKEND": "apps.core.metrics.InstrumentedRedisCache",
         "LOCATION": env("REDIS_URL", default="redis://127.0.0.1:6379/1"),
         "OPTIONS": {
             "CLIENT_CLASS": "django_redis.client.DefaultClient",
@@ -396,6 +438,56 @@ CACHES = {
     }
 }
 
+# Product list/detail responses are versioned, so writes invalidate them
+# immediately; the timeout only bounds how long unused entries linger.
+STORE_PRODUCT_CACHE_TIMEOUT = env.int("STORE_PRODUCT_CACHE_TIMEOUT", default=60 * 60)
+
+# Shared-cache lifetime of collection list pages; workers also keep them in
+# memory until a write is announced on the invalidation channel
+STORE_COLLECTION_CACHE_TIMEOUT = env.int(
+    "STORE_COLLECTION_CACHE_TIMEOUT", default=24 * 60 * 60
+)
+
+# Seconds browsers, nginx and the CDN may reuse a catalog response before
+# revalidating it; revalidation is a 304 built from the cache versions
+STORE_HTTP_CACHE_MAX_AGE = env.int("STORE_HTTP_CACHE_MAX_AGE", default=10)
+
+# Rows fetched per round trip of the server-side cursor behind exports
+STORE_EXPORT_CHUNK_SIZE = env.int("STORE_EXPORT_CHUNK_SIZE", default=2_000)
+
+# Background admin actions: rows per task, and how long progress is kept
+STORE_JOB_BATCH_SIZE = env.int("STORE_JOB_BATCH_SIZE", default=1_000)
+STORE_JOB_TTL = env.int("STORE_JOB_TTL", default=24 * 60 * 60)
+
+# Products repriced per query round by apps.store.pricing; a write touching
+# more than this is repriced by Celery after it commits
+STORE_PRICE_BATCH_SIZE = env.int("STORE_PRICE_BATCH_SIZE", default=1_000)
+
+# Product search backend (dotted path); picked from the database vendor if unset
+STORE_SEARCH_BACKEND = env("STORE_SEARCH_BACKEND", default=None)
+
+# Where anonymous carts live: Cart/CartItem rows (DatabaseCartStore) or
+# Redis hashes that expire STORE_CART_TTL seconds after the last write
+# (RedisCartStore) and only reach the database at checkout
+STORE_CART_BACKEND = env(
+    "STORE_CART_BACKEND", default="apps.store.carts.DatabaseCartStore"
+)
+STORE_CART_TTL = env.int("STORE_CART_TTL", default=7 * 24 * 60 * 60)
+
+# Transactional outbox (apps.store.outbox): events per drain_outbox run, how
+# long a run may take before its unfinished events are drained again, and
+# exponential retry backoff for events whose listeners failed
+STORE_OUTBOX_BATCH_SIZE = env.int("STORE_OUTBOX_BATCH_SIZE", default=100)
+STORE_OUTBOX_CLAIM_TIMEOUT = env.int("STORE_OUTBOX_CLAIM_TIMEOUT", default=10 * 60)
+STORE_OUTBOX_MAX_ATTEMPTS = env.int("STORE_OUTBOX_MAX_ATTEMPTS", default=8)
+STORE_OUTBOX_RETRY_DELAY = env.int("STORE_OUTBOX_RETRY_DELAY", default=30)
+STORE_OUTBOX_MAX_RETRY_DELAY = env.int("STORE_OUTBOX_MAX_RETRY_DELAY", default=60 * 60)
+
+# Tax applied to Product.price_with_tax: the TaxRate row for this region,
+# or the default rate when the region has none
+STORE_TAX_REGION = env("STORE_TAX_REGION", default="default")
+STORE_DEFAULT_TAX_RATE = env("STORE_DEFAULT_TAX_RATE", default="0.18")
+
 # Email
 EMAIL_BACKEND = env(
     "EMAIL_BACKEND",
@@ -0,0 +1,32 @@
+from random import randint
+
+from locust import HttpUser, between, task
+
+# Run once with STORE_CART_BACKEND=apps.store.carts.DatabaseCartStore and once
+# with apps.store.carts.RedisCartStore, and compare the database write rate
+# (e.g. pg_stat_database.xact_commit / tup_inserted) over the same duration.
+
+
+class CartUser(HttpUser):
+    wait_time = between(1, 3)
+
+    def on_start(self):
+        response = self.client.post("/api/v1/store/carts/", name="/store/carts/")
+        self.cart_id = response.json()["id"]
+
+    @task(5)
+    def add_to_cart(self):
+        self.client.post(
+            f"/api/v1/store/carts/{self.cart_id}/items/",
+            name="/store/carts/items",
+            json={"product_id": randint(1, 111), "quantity": 1},
+        )
+
+    @task(3)
+    def view_cart(self):
+        self.client.get(f"/api/v1/store/carts/{self.cart_id}/", name="/store/carts/:id")
+
+    @task(1)
+    def abandon_cart(self):
+        # Most carts are never checked out; start over with a fresh one.
+        self.on_start()